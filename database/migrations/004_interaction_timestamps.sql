@@ -0,0 +1,5 @@
+-- ML Service Database Migration
+-- Indexes interaction timestamps so incremental model updates can find recent changes
+
+CREATE INDEX idx_saved_at ON user_saved_events (saved_at);
+CREATE INDEX idx_hidden_at ON user_hidden_events (hidden_at);
@@ -0,0 +1,4 @@
+-- ML Service Database Migration
+-- Indexes event update times so the catalog's incremental refresh reads only changed rows
+
+CREATE INDEX idx_events_updated_at ON events (updated_at);
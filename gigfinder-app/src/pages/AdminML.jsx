@@ -49,8 +49,12 @@ const AdminML = () => {
   const handleRetrain = async () => {
     setRetraining(true);
     try {
-      await mlAPI.triggerRetrain();
-      showToast('Model retrained successfully!', 'success');
+      const job = await mlAPI.triggerRetrain();
+      const samples = job.result?.training_samples;
+      showToast(
+        samples != null ? `Model retrained on ${samples} samples` : 'Model retrained successfully!',
+        'success'
+      );
       // Refresh model info after retrain
       const updatedModel = await mlAPI.getModelInfo();
       setModelInfo(updatedModel);
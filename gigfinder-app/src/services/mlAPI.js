@@ -37,6 +37,12 @@ const resolveUserId = (explicitUserId) => {
   return String(resolved);
 };
 
+const RETRAIN_POLL_INTERVAL_MS = 2000;
+const RETRAIN_TIMEOUT_MS = 15 * 60 * 1000;
+const FINISHED_JOB_STATUSES = ['succeeded', 'failed'];
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const emptyRecommendations = (error = 'ml_unavailable') => ({
   recommendations: [],
   model_version: 'unavailable',
@@ -136,13 +142,35 @@ const mlAPI = {
   },
 
   /**
-   * Trigger ML model retraining (admin only)
-   * @returns {Promise<Object>} Retraining results with new metrics
+   * Trigger ML model retraining (admin only) and wait for the background job to finish
+   * @param {Object} options - Polling parameters
+   * @param {number} options.pollIntervalMs - Delay between job status checks (default 2000)
+   * @param {number} options.timeoutMs - Give up waiting after this long (default 15 minutes)
+   * @returns {Promise<Object>} Finished job { job_id, status, result: { version, training_samples, validation_metrics } }
    */
-  triggerRetrain: async () => {
+  triggerRetrain: async ({ pollIntervalMs = RETRAIN_POLL_INTERVAL_MS, timeoutMs = RETRAIN_TIMEOUT_MS } = {}) => {
     try {
+      // The service answers 202 with a job right away; training runs in the background
       const response = await apiClient.post('/v1/model/retrain');
-      return response.data;
+      let job = response.data?.job;
+      if (!job?.job_id) {
+        throw new Error('Retrain did not return a job');
+      }
+
+      const deadline = Date.now() + timeoutMs;
+      while (!FINISHED_JOB_STATUSES.includes(job.status)) {
+        if (Date.now() >= deadline) {
+          throw new Error(`Retrain job ${job.job_id} still ${job.status} after ${timeoutMs}ms`);
+        }
+        await sleep(pollIntervalMs);
+        const status = await apiClient.get(`/v1/model/jobs/${job.job_id}`);
+        job = status.data;
+      }
+
+      if (job.status === 'failed') {
+        throw new Error(job.error || `Retrain job ${job.job_id} failed`);
+      }
+      return job;
     } catch (error) {
       console.error('ML retrain error:', error);
       throw error;
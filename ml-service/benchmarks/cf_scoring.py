@@ -0,0 +1,125 @@
+"""
+Micro-benchmark for collaborative-filtering scoring
+Compares the original per-neighbour dense loop with the sparse product + argpartition path
+
+Usage (from ml-service/):
+    python -m benchmarks.cf_scoring --events 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.models.neighbours import top_k_neighbours
+from src.models.recommendation_engine import RecommendationEngine
+
+
+def legacy_cf_top_events(model: Dict, user_idx: int, limit: int) -> List:
+    """The pre-vectorisation scoring loop, kept as the baseline"""
+    neighbour_idx = model['neighbour_idx'][user_idx]
+    valid = neighbour_idx >= 0
+    similar_users_idx = neighbour_idx[valid]
+    similarity_scores = model['neighbour_scores'][user_idx][valid]
+
+    interaction_matrix = model['interaction_matrix']
+    recommended_scores = np.zeros(interaction_matrix.shape[1])
+    for sim_user_idx, sim_score in zip(similar_users_idx, similarity_scores):
+        recommended_scores += sim_score * interaction_matrix[sim_user_idx].toarray().flatten()
+
+    user_events = interaction_matrix[user_idx].toarray().flatten()
+    recommended_scores[user_events > 0] = -np.inf
+    top_event_indices = np.argsort(recommended_scores)[::-1][:limit]
+
+    event_idx_reverse = {idx: eid for eid, idx in model['event_idx'].items()}
+    return [event_idx_reverse[idx] for idx in top_event_indices if recommended_scores[idx] > 0]
+
+
+def build_model(n_users: int, n_events: int, per_user: int, k: int, seed: int) -> Dict:
+    rng = np.random.default_rng(seed)
+    nnz = n_users * per_user
+    rows = np.repeat(np.arange(n_users), per_user)
+    # Zipf-like popularity so neighbours actually overlap
+    cols = np.minimum(rng.zipf(1.3, nnz) - 1, n_events - 1)
+    data = np.where(rng.random(nnz) < 0.85, 1.0, -0.5)
+    matrix = csr_matrix((data, (rows, cols)), shape=(n_users, n_events))
+    matrix.sum_duplicates()
+
+    event_ids = np.arange(1, n_events + 1)
+    neighbour_idx, neighbour_scores = top_k_neighbours(matrix, k=k, block_rows=1024)
+    return {
+        'interaction_matrix': matrix,
+        'event_ids': event_ids,
+        'event_idx': {eid: idx for idx, eid in enumerate(event_ids)},
+        'neighbour_idx': neighbour_idx,
+        'neighbour_scores': neighbour_scores
+    }
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4)
+    }
+
+
+def time_calls(fn, user_indices: np.ndarray) -> List[float]:
+    samples = []
+    for user_idx in user_indices:
+        start = time.perf_counter()
+        fn(int(user_idx))
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run(events: List[int], users: int, per_user: int, k: int, limit: int, requests: int, seed: int) -> List[Dict]:
+    results = []
+    for n_events in events:
+        model = build_model(users, n_events, per_user, k, seed)
+        engine = RecommendationEngine()
+        engine.model = model
+
+        user_indices = np.random.default_rng(seed).integers(0, users, requests)
+        before = time_calls(lambda u: legacy_cf_top_events(model, u, limit), user_indices)
+        after = time_calls(lambda u: engine._cf_top_events(u, limit), user_indices)
+
+        result = {
+            'events': n_events,
+            'users': users,
+            'limit': limit,
+            'before': percentiles(before),
+            'after': percentiles(after)
+        }
+        results.append(result)
+        print(
+            f"{n_events:>9} events | before p50 {result['before']['p50_ms']:>9.3f}ms "
+            f"p99 {result['before']['p99_ms']:>9.3f}ms | after p50 {result['after']['p50_ms']:>7.3f}ms "
+            f"p99 {result['after']['p99_ms']:>7.3f}ms"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--interactions-per-user', type=int, default=20)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(
+        args.events, args.users, args.interactions_per_user, args.k, args.limit, args.requests, args.seed
+    )
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+End-to-end RecommendationEngine benchmark on synthetic data
+For each scale, generates (or reuses) a synthetic dataset in the SQLite stand-in
+database, then in fresh processes:
+    train    retrain_model() wall time and peak RSS, artifact size on disk
+    serve    load the artifact, catalog and popularity like a serving worker, then
+             time predict() per variant and report p50/p95/p99 and peak RSS
+Results are written as JSON; --baseline compares them with an earlier results file.
+
+Usage (from ml-service/):
+    python -m benchmarks.engine_suite --interactions 1000 100000 1000000 --json results.json
+    python -m benchmarks.engine_suite --interactions 100000 --set cf_neighbours_k=20 --baseline results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from queue import Empty
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import scipy
+
+from benchmarks import standin_db
+from benchmarks.synthetic_data import CITIES, SyntheticScale, ensure_dataset
+
+VARIANTS = ('control', 'collaborative_filtering', 'content_based', 'hybrid')
+
+# Per-metric comparisons printed against a baseline: (section, key) paths into a run
+COMPARED_METRICS = [
+    ('train', 'seconds'),
+    ('train', 'peak_rss_mb'),
+    ('artifact', 'bytes'),
+    ('serve', 'peak_rss_mb')
+] + [('predict', variant, p) for variant in VARIANTS for p in ('p50_ms', 'p95_ms', 'p99_ms')]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def apply_settings(model_dir: str, overrides: Dict[str, str]):
+    """Point the service at a scratch model directory and apply --set overrides"""
+    from src.config import settings
+
+    settings.model_dir = model_dir
+    for name, value in overrides.items():
+        current = getattr(settings, name)
+        if isinstance(current, bool):
+            value = value.lower() == 'true'
+        elif current is not None:
+            value = type(current)(value)
+        setattr(settings, name, value)
+
+
+def make_engine(db_path: str):
+    from src.db import ConnectionPool
+    from src.models.recommendation_engine import RecommendationEngine
+
+    pool = ConnectionPool(lambda: standin_db.connect(db_path), size=4)
+    return RecommendationEngine(pool)
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms)
+    return {
+        'requests': int(len(samples)),
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4)
+    }
+
+
+def train_phase(db_path: str, model_dir: str, overrides: Dict[str, str], queue):
+    """One retrain in a fresh process, so peak RSS belongs to training alone"""
+    apply_settings(model_dir, overrides)
+    engine = make_engine(db_path)
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    result = engine.retrain_model()
+    elapsed = time.perf_counter() - start
+    engine.shutdown()
+
+    queue.put({
+        'train': {
+            'seconds': round(elapsed, 3),
+            'rss_before_mb': round(rss_before, 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'training_samples': int(result['training_samples'])
+        },
+        'validation_metrics': result['validation_metrics'],
+        'artifact': {'bytes': directory_bytes(model_dir)}
+    })
+
+
+def serve_phase(
+    db_path: str,
+    model_dir: str,
+    overrides: Dict[str, str],
+    users: int,
+    requests: int,
+    limit: int,
+    warmup: int,
+    seed: int,
+    queue
+):
+    """Load the trained model like a serving worker and time predict() per variant"""
+    apply_settings(model_dir, overrides)
+    engine = make_engine(db_path)
+
+    start = time.perf_counter()
+    engine.load_model(train_if_missing=False)
+    engine.catalog.load()
+    engine.popularity.reconcile()
+    load_seconds = time.perf_counter() - start
+
+    # Same request mix for every variant: known and unknown users, with and without a city
+    rng = np.random.default_rng(seed)
+    total = warmup + requests
+    user_ids = [str(u) for u in rng.integers(1, int(users * 1.05) + 1, size=total)]
+    city_picks = rng.integers(0, len(CITIES), size=total)
+    cities = [None if r < 0.3 else CITIES[c] for r, c in zip(rng.random(total), city_picks)]
+
+    predict: Dict[str, Any] = {}
+    for variant in VARIANTS:
+        samples = []
+        empty = 0
+        for i, (user_id, city) in enumerate(zip(user_ids, cities)):
+            started = time.perf_counter()
+            recs = engine.predict(user_id, city, limit, variant)
+            if i >= warmup:
+                samples.append((time.perf_counter() - started) * 1000)
+                empty += not recs
+        predict[variant] = {**percentiles(samples), 'empty_results': empty}
+    engine.shutdown()
+
+    queue.put({
+        'serve': {'load_seconds': round(load_seconds, 3), 'peak_rss_mb': round(peak_rss_mb(), 1)},
+        'predict': predict
+    })
+
+
+def run_phase(target, *args) -> Dict[str, Any]:
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=target, args=(*args, queue))
+    process.start()
+    try:
+        while True:
+            try:
+                return queue.get(timeout=1)
+            except Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"{target.__name__} exited with code {process.exitcode}")
+    finally:
+        process.join()
+
+
+def run_scale(scale: SyntheticScale, args: argparse.Namespace, overrides: Dict[str, str]) -> Dict[str, Any]:
+    data = ensure_dataset(args.data_dir, scale, regenerate=args.regenerate)
+    model_dir = tempfile.mkdtemp(prefix='engine-bench-models-')
+    try:
+        result: Dict[str, Any] = {'scale': scale.as_dict(), 'data': data}
+        result.update(run_phase(train_phase, data['path'], model_dir, overrides))
+        result.update(run_phase(
+            serve_phase, data['path'], model_dir, overrides, scale.users,
+            args.requests, args.limit, args.warmup, args.seed
+        ))
+        return result
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _metric(run: Dict[str, Any], path: tuple) -> Optional[float]:
+    value: Any = run
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Relative change of each compared metric for runs at the same scale"""
+    previous = {json.dumps(run['scale'], sort_keys=True): run for run in baseline.get('runs', [])}
+    changes = []
+    for run in results['runs']:
+        before = previous.get(json.dumps(run['scale'], sort_keys=True))
+        if before is None:
+            continue
+        for path in COMPARED_METRICS:
+            old, new = _metric(before, path), _metric(run, path)
+            if old is None or new is None:
+                continue
+            changes.append({
+                'interactions': run['scale']['interactions'],
+                'metric': '.'.join(path),
+                'baseline': old,
+                'current': new,
+                'change_percent': round((new - old) / old * 100, 1) if old else None
+            })
+    return changes
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interactions', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--users', type=int, help='Users per dataset (default: interactions / 20)')
+    parser.add_argument('--events', type=int, help='Events per dataset (default: interactions / 200)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--requests', type=int, default=500, help='Timed predict() calls per variant')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'whatsthecraic-bench'))
+    parser.add_argument('--regenerate', action='store_true', help='Regenerate datasets even if one exists')
+    parser.add_argument(
+        '--set', action='append', default=[], metavar='NAME=VALUE',
+        help='Override a service setting, e.g. cf_similarity_workers=1 (repeatable)'
+    )
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    overrides = dict(item.split('=', 1) for item in args.set)
+    results: Dict[str, Any] = {
+        'benchmark': 'engine_suite',
+        'created_at': datetime.utcnow().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'cpu_count': os.cpu_count(),
+        'settings': overrides,
+        'requests': args.requests,
+        'limit': args.limit,
+        'runs': []
+    }
+    for interactions in args.interactions:
+        scale = SyntheticScale(interactions, args.users, args.events, seed=args.seed)
+        run = run_scale(scale, args, overrides)
+        results['runs'].append(run)
+        predict = run['predict']
+        print(
+            f"{interactions:>9} interactions | train {run['train']['seconds']:>8.2f}s "
+            f"{run['train']['peak_rss_mb']:>7.0f}MB | artifact {run['artifact']['bytes'] / 1e6:>8.2f}MB | p99 "
+            + ' '.join(f"{variant} {predict[variant]['p99_ms']:.2f}ms" for variant in VARIANTS),
+            flush=True
+        )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['comparison'] = compare(results, json.load(f))
+        for change in results['comparison']:
+            print(
+                f"{change['interactions']:>9} {change['metric']:<40} {change['baseline']:>12} -> "
+                f"{change['current']:>12} ({change['change_percent']:+}%)"
+                if change['change_percent'] is not None else
+                f"{change['interactions']:>9} {change['metric']:<40} {change['baseline']:>12} -> {change['current']:>12}"
+            )
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,88 @@
+"""
+Concurrency scaling check for the FastAPI handlers
+Drives main.app in-process with A/B assignment and prediction replaced by
+stubs that sleep (simulating DynamoDB / MySQL latency), and compares running
+them on the blocking executor with calling them inline on the event loop
+
+Usage (from ml-service/):
+    python -m benchmarks.event_loop --latency-ms 20 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+
+# Keep the service away from real AWS while importing it
+os.environ.setdefault('USE_LOCAL_DYNAMODB', 'true')
+os.environ.setdefault('ENABLE_CLOUDWATCH', 'false')
+
+import httpx  # noqa: E402
+
+from src import main  # noqa: E402
+
+
+def install_stubs(latency_s: float):
+    def assign_experiment(user_id: str) -> Dict:
+        time.sleep(latency_s)
+        return {'experiment_id': 'bench', 'variant': 'control'}
+
+    def predict(user_id, city=None, limit=20, variant='control', context=None) -> List[Dict]:
+        time.sleep(latency_s)
+        return [{'event_id': i, 'score': 1.0, 'algorithm': 'popularity'} for i in range(limit)]
+
+    main.ab_test_manager.assign_experiment = assign_experiment
+    main.recommendation_engine.predict = predict
+
+
+def run_inline():
+    """Restore the pre-executor behaviour: blocking calls run on the event loop"""
+    async def run(dependency, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+    main.blocking_executor.run = run
+
+
+async def drive(concurrency: int, requests: int) -> Dict[str, float]:
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post('/v1/recommendations', json={'user_id': str(i), 'limit': 10})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {'concurrency': concurrency, 'requests': requests, 'rps': round(requests / elapsed, 1)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Injected latency per blocking call')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--inline', action='store_true', help='Call blocking functions on the event loop')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    install_stubs(args.latency_ms / 1000)
+    if args.inline:
+        run_inline()
+
+    results = []
+    for concurrency in args.concurrency:
+        result = asyncio.run(drive(concurrency, args.requests))
+        results.append(result)
+        print(f"concurrency {result['concurrency']:>4} | {result['rps']:>8.1f} req/s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'inline': args.inline, 'latency_ms': args.latency_ms, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main_cli()
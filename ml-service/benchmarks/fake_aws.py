@@ -0,0 +1,167 @@
+"""
+In-memory stand-ins for the DynamoDB and CloudWatch clients the service uses
+Each call sleeps for an injectable latency (the network round trip to AWS) and
+then works on local dicts. Only the calls and expression forms ABTestManager and
+MetricsCollector make on the request path are implemented.
+
+Usage:
+    ab_test_manager.dynamodb = FakeDynamoDB({'assignments': ('user_id', 'experiment_id')}, latency_s=0.005)
+    metrics_collector.cloudwatch = FakeCloudWatch(latency_s=0.02)
+"""
+import copy
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Splits "a = x, b = f(c, :d) + :e" at commas outside parentheses
+_SET_CLAUSE = re.compile(r',\s*(?![^()]*\))')
+_IF_NOT_EXISTS = re.compile(r'^if_not_exists\((\w+),\s*(:\w+)\)$')
+
+
+class FakeTable:
+    """One DynamoDB table held in a dict keyed by its key attributes"""
+
+    def __init__(self, name: str, key_names: tuple, latency_s: float = 0.0):
+        self.name = name
+        self.key_names = key_names
+        self.latency_s = latency_s
+        self.items: Dict[tuple, Dict[str, Any]] = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _key(self, item: Dict[str, Any]) -> tuple:
+        return tuple(item[name] for name in self.key_names)
+
+    def load(self):
+        self._round_trip()
+
+    def get_item(self, Key: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            item = self.items.get(self._key(Key))
+            return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            self.items[self._key(Item)] = copy.deepcopy(Item)
+        return {}
+
+    def update_item(
+        self,
+        Key: Dict[str, Any],
+        UpdateExpression: str,
+        ExpressionAttributeValues: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Supports SET clauses of the form `a = :v`, `a = b + :v` and `a = if_not_exists(b, :d) + :v`"""
+        self._round_trip()
+        values = ExpressionAttributeValues or {}
+        expression = UpdateExpression.strip()
+        if not expression.upper().startswith('SET '):
+            raise NotImplementedError(f"Unsupported update expression: {UpdateExpression}")
+
+        with self._lock:
+            item = self.items.setdefault(self._key(Key), dict(Key))
+            for clause in _SET_CLAUSE.split(expression[4:]):
+                name, _, value_expression = (part.strip() for part in clause.partition('='))
+                terms = [term.strip() for term in value_expression.split('+')]
+                total = None
+                for term in terms:
+                    match = _IF_NOT_EXISTS.match(term)
+                    if match:
+                        value = item.get(match.group(1), values[match.group(2)])
+                    elif term.startswith(':'):
+                        value = values[term]
+                    else:
+                        value = item[term]
+                    total = value if total is None else total + value
+                item[name] = total
+        return {}
+
+    def scan(self, **kwargs) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            items = [copy.deepcopy(item) for item in self.items.values()]
+        return {'Items': items, 'Count': len(items)}
+
+    def batch_writer(self):
+        return FakeBatchWriter(self)
+
+
+class FakeBatchWriter:
+    """Collects puts and writes them in 25-item round trips, as BatchWriteItem does"""
+
+    def __init__(self, table: FakeTable):
+        self.table = table
+        self.pending: List[Dict[str, Any]] = []
+
+    def put_item(self, Item: Dict[str, Any]):
+        self.pending.append(copy.deepcopy(Item))
+        if len(self.pending) >= 25:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        self.table._round_trip()
+        with self.table._lock:
+            for item in self.pending:
+                self.table.items[self.table._key(item)] = item
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._flush()
+        return False
+
+
+class FakeDynamoDB:
+    """Stands in for boto3.resource('dynamodb'); key_names maps table name to its (hash, range) key"""
+
+    def __init__(self, key_names: Dict[str, tuple], latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.tables = {name: FakeTable(name, keys, latency_s) for name, keys in key_names.items()}
+
+    def Table(self, name: str) -> FakeTable:
+        return self.tables[name]
+
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            with table._lock:
+                table.calls += 1
+                found = (table.items.get(table._key(key)) for key in request['Keys'])
+                responses[name] = [copy.deepcopy(item) for item in found if item is not None]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def call_counts(self) -> Dict[str, int]:
+        return {name: table.calls for name, table in self.tables.items()}
+
+
+class FakeCloudWatch:
+    """Stands in for boto3.client('cloudwatch'); counts what would have been published"""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.datums = 0
+
+    def put_metric_data(self, Namespace: str, MetricData: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self.calls += 1
+        self.datums += len(MetricData)
+        return {}
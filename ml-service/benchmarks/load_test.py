@@ -0,0 +1,402 @@
+"""
+Load test for the FastAPI endpoints, in one process
+Drives main.app with a weighted request mix over /v1/recommendations, /v1/feedback
+and /health (optionally /v1/recommendations/batch) at several concurrency levels,
+through httpx's ASGI transport or a uvicorn server on a local port. MySQL is the
+SQLite stand-in loaded with synthetic data; DynamoDB and CloudWatch are in-memory
+fakes. Each of the three sleeps for an injectable latency per call. Throughput and
+latency percentiles are reported per endpoint and concurrency level, so regressions
+in the middleware, A/B assignment or serialisation path show up before deployment.
+--baseline compares the results with an earlier results file.
+
+Usage (from ml-service/):
+    python -m benchmarks.load_test --concurrency 1 8 32 128 --requests 2000 --json load.json
+    python -m benchmarks.load_test --transport uvicorn --mix recommendations=0.7,feedback=0.25,health=0.05
+    python -m benchmarks.load_test --dynamodb-ms 10 --mysql-ms 2 --baseline load.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Keep the service away from real AWS while importing it; the fakes are attached afterwards
+os.environ.setdefault('USE_LOCAL_DYNAMODB', 'true')
+os.environ.setdefault('ENABLE_CLOUDWATCH', 'false')
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from benchmarks import standin_db  # noqa: E402
+from benchmarks.engine_suite import apply_settings, git_commit  # noqa: E402
+from benchmarks.fake_aws import FakeCloudWatch, FakeDynamoDB  # noqa: E402
+from benchmarks.synthetic_data import CITIES, GENRES, SyntheticScale, ensure_dataset  # noqa: E402
+
+ENDPOINTS = ('recommendations', 'feedback', 'health', 'batch')
+DEFAULT_MIX = 'recommendations=0.8,feedback=0.15,health=0.05'
+FEEDBACK_ACTIONS = ['save', 'hide', 'click', 'skip']
+FEEDBACK_ACTION_WEIGHTS = [0.4, 0.15, 0.35, 0.1]
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'recommendations=0.8,feedback=0.2' -> normalised weights per endpoint"""
+    mix: Dict[str, float] = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in mix; expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Request mix weights must add up to more than zero")
+    return {name: weight / total for name, weight in mix.items() if weight > 0}
+
+
+def bearer_token(user_id: str) -> str:
+    """Unsigned JWT carrying the user id; the service reads the payload without verifying it"""
+    def encode(data: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    return f"Bearer {encode({'alg': 'none', 'typ': 'JWT'})}.{encode({'sub': user_id})}.signature"
+
+
+def build_plan(
+    count: int,
+    mix: Dict[str, float],
+    users: int,
+    events: int,
+    limit: int,
+    batch_users: int,
+    jwt_fraction: float,
+    seed: int
+) -> List[tuple]:
+    """Deterministic list of (endpoint, method, path, body, headers) requests"""
+    rng = np.random.default_rng(seed)
+    names = list(mix)
+    picks = rng.choice(len(names), size=count, p=[mix[name] for name in names])
+    # A few unknown users (ids past the dataset) exercise the cold-start path
+    max_user = int(users * 1.05) + 1
+
+    def user_id() -> str:
+        return str(int(rng.integers(1, max_user)))
+
+    def city() -> Optional[str]:
+        return None if rng.random() < 0.3 else CITIES[int(rng.integers(0, len(CITIES)))]
+
+    plan = []
+    for pick in picks:
+        endpoint = names[pick]
+        headers: Dict[str, str] = {}
+        if endpoint == 'health':
+            plan.append((endpoint, 'GET', '/health', None, headers))
+            continue
+
+        if endpoint == 'batch':
+            body = {
+                'users': [{'user_id': user_id()} for _ in range(batch_users)],
+                'city': city(),
+                'limit': limit
+            }
+            plan.append((endpoint, 'POST', '/v1/recommendations/batch', body, headers))
+            continue
+
+        uid = user_id()
+        if rng.random() < jwt_fraction:
+            headers['Authorization'] = bearer_token(uid)
+            body = {}
+        else:
+            body = {'user_id': uid}
+
+        if endpoint == 'recommendations':
+            body.update({'city': city(), 'limit': limit})
+            if rng.random() < 0.2:
+                body['context'] = {'spotify_genres': [GENRES[int(rng.integers(0, len(GENRES)))]]}
+            plan.append((endpoint, 'POST', '/v1/recommendations', body, headers))
+        else:
+            action = FEEDBACK_ACTIONS[int(rng.choice(len(FEEDBACK_ACTIONS), p=FEEDBACK_ACTION_WEIGHTS))]
+            body.update({'event_id': str(int(rng.integers(1, events + 1))), 'action': action})
+            plan.append((endpoint, 'POST', '/v1/feedback', body, headers))
+    return plan
+
+
+def install_fakes(main, db_path: str, mysql_s: float, dynamodb_s: float, cloudwatch_s: float) -> Dict[str, Any]:
+    """Point the service's MySQL pool, DynamoDB tables and CloudWatch client at local stand-ins"""
+    from src.config import settings
+
+    # Catalog, popularity and feedback writer share the engine's pool
+    main.recommendation_engine.db_pool.connect_fn = lambda: standin_db.connect(db_path, mysql_s)
+
+    dynamodb = FakeDynamoDB({
+        settings.dynamodb_table_experiments: ('experiment_id',),
+        settings.dynamodb_table_assignments: ('user_id', 'experiment_id')
+    }, dynamodb_s)
+    manager = main.ab_test_manager
+    manager.dynamodb = dynamodb
+    manager.experiments_table = dynamodb.Table(settings.dynamodb_table_experiments)
+    manager.assignments_table = dynamodb.Table(settings.dynamodb_table_assignments)
+    # The experiments table holds the default experiment, as it does once deployed
+    manager._load_default_experiment()
+    manager.experiments_table.put_item(Item=manager.experiments[settings.default_experiment_id])
+
+    cloudwatch = FakeCloudWatch(cloudwatch_s)
+    main.metrics_collector.cloudwatch = cloudwatch
+    return {'dynamodb': dynamodb, 'cloudwatch': cloudwatch}
+
+
+def summarise(latencies_ms: List[float], statuses: List[int]) -> Dict[str, Any]:
+    samples = np.asarray(latencies_ms)
+    codes: Dict[str, int] = {}
+    for status in statuses:
+        codes[str(status)] = codes.get(str(status), 0) + 1
+    summary: Dict[str, Any] = {
+        'requests': int(len(samples)),
+        'errors': int(sum(1 for status in statuses if status == 0 or status >= 400)),
+        'status_codes': codes
+    }
+    if len(samples):
+        summary['mean_ms'] = round(float(samples.mean()), 3)
+        for p in PERCENTILES:
+            summary[f"p{p:g}_ms"] = round(float(np.percentile(samples, p)), 3)
+        summary['max_ms'] = round(float(samples.max()), 3)
+    return summary
+
+
+async def send(client: httpx.AsyncClient, plan: List[tuple], concurrency: int) -> List[tuple]:
+    """Closed loop: concurrency clients each send their next request when the last one returns"""
+    results: List[tuple] = []
+    pending = iter(plan)
+
+    async def client_loop():
+        for endpoint, method, path, body, headers in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            results.append((endpoint, status, (time.perf_counter() - started) * 1000))
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return results
+
+
+async def run_level(client: httpx.AsyncClient, plan: List[tuple], warmup: int, concurrency: int) -> Dict[str, Any]:
+    await send(client, plan[:warmup], concurrency)
+
+    start = time.perf_counter()
+    results = await send(client, plan[warmup:], concurrency)
+    elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for endpoint in dict.fromkeys(r[0] for r in results):
+        rows = [r for r in results if r[0] == endpoint]
+        endpoints[endpoint] = summarise([r[2] for r in rows], [r[1] for r in rows])
+    overall = summarise([r[2] for r in results], [r[1] for r in results])
+    return {
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(results) / elapsed, 1),
+        'overall': overall,
+        'endpoints': endpoints
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(app, port: int):
+    """uvicorn on a daemon thread; returns once startup (including any training) has finished"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False))
+    thread = threading.Thread(target=server.run, name='load-test-uvicorn', daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn exited during startup")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run_levels(main, args: argparse.Namespace, plans: Dict[int, List[tuple]]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    timeout = httpx.Timeout(args.timeout)
+    server = thread = None
+
+    start = time.perf_counter()
+    if args.transport == 'asgi':
+        # httpx's ASGI transport does not send lifespan events, so run them here
+        await main.startup_event()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://load-test', timeout=timeout)
+    else:
+        port = free_port()
+        server, thread = await asyncio.to_thread(start_uvicorn, main.app, port)
+        client = httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=timeout)
+    startup_seconds = time.perf_counter() - start
+
+    levels = []
+    try:
+        async with client:
+            for concurrency in args.concurrency:
+                level = await run_level(client, plans[concurrency], args.warmup, concurrency)
+                levels.append(level)
+                print_level(level)
+    finally:
+        if args.transport == 'asgi':
+            await main.shutdown_event()
+        else:
+            server.should_exit = True
+            await asyncio.to_thread(thread.join, 30)
+
+    return {'startup_seconds': round(startup_seconds, 3), 'levels': levels}
+
+
+def print_level(level: Dict[str, Any]):
+    columns = ' | '.join(
+        f"{endpoint} p50 {summary['p50_ms']:.2f} p99 {summary['p99_ms']:.2f}ms"
+        for endpoint, summary in level['endpoints'].items() if summary['requests']
+    )
+    print(
+        f"concurrency {level['concurrency']:>4} | {level['rps']:>8.1f} req/s | "
+        f"errors {level['overall']['errors']:>4} | {columns}",
+        flush=True
+    )
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Relative change in throughput and p50/p99 per endpoint at matching concurrency"""
+    previous = {level['concurrency']: level for level in baseline.get('levels', [])}
+    changes = []
+    for level in results['levels']:
+        before = previous.get(level['concurrency'])
+        if before is None:
+            continue
+        pairs = [('rps', before['rps'], level['rps'])]
+        for endpoint, summary in level['endpoints'].items():
+            old = before['endpoints'].get(endpoint, {})
+            for key in ('p50_ms', 'p99_ms'):
+                if key in old and key in summary:
+                    pairs.append((f"{endpoint}.{key}", old[key], summary[key]))
+        for metric, old, new in pairs:
+            changes.append({
+                'concurrency': level['concurrency'],
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change_percent': round((new - old) / old * 100, 1) if old else None
+            })
+    return changes
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transport', choices=['asgi', 'uvicorn'], default='asgi')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--requests', type=int, default=1000, help='Timed requests per concurrency level')
+    parser.add_argument('--warmup', type=int, default=50, help='Untimed requests before each level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Endpoint weights, e.g. {DEFAULT_MIX}")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--batch-users', type=int, default=50, help='Users per /v1/recommendations/batch call')
+    parser.add_argument('--jwt-fraction', type=float, default=0.5, help='Share of requests identifying the user by JWT')
+    parser.add_argument('--mysql-ms', type=float, default=1.0, help='Injected latency per MySQL statement')
+    parser.add_argument('--dynamodb-ms', type=float, default=5.0, help='Injected latency per DynamoDB call')
+    parser.add_argument('--cloudwatch-ms', type=float, default=20.0, help='Injected latency per PutMetricData call')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Client timeout per request, in seconds')
+    parser.add_argument('--interactions', type=int, default=10_000, help='Synthetic dataset size')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'whatsthecraic-bench'))
+    parser.add_argument(
+        '--set', action='append', default=[], metavar='NAME=VALUE',
+        help='Override a service setting before the app is imported, e.g. result_cache_max_entries=0 (repeatable)'
+    )
+    parser.add_argument('--log-level', default='WARNING', help='Service log level while under load')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    overrides = dict(item.split('=', 1) for item in args.set)
+    scale = SyntheticScale(args.interactions, seed=args.seed)
+    data = ensure_dataset(args.data_dir, scale)
+    plans = {
+        concurrency: build_plan(
+            args.warmup + args.requests, mix, scale.users, scale.events, args.limit,
+            args.batch_users, args.jwt_fraction, args.seed + i
+        )
+        for i, concurrency in enumerate(args.concurrency)
+    }
+
+    model_dir = tempfile.mkdtemp(prefix='load-test-models-')
+    try:
+        apply_settings(model_dir, overrides)
+        from src import main
+
+        logging.getLogger().setLevel(args.log_level.upper())
+        fakes = install_fakes(
+            main, data['path'], args.mysql_ms / 1000, args.dynamodb_ms / 1000, args.cloudwatch_ms / 1000
+        )
+        run = asyncio.run(run_levels(main, args, plans))
+        feedback_rows = standin_db.table_counts(data['path'])['ml_feedback']
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    results: Dict[str, Any] = {
+        'benchmark': 'load_test',
+        'created_at': datetime.utcnow().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'transport': args.transport,
+        'mix': mix,
+        'latency_ms': {'mysql': args.mysql_ms, 'dynamodb': args.dynamodb_ms, 'cloudwatch': args.cloudwatch_ms},
+        'settings': overrides,
+        'scale': scale.as_dict(),
+        'data': data,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        **run,
+        'fakes': {
+            'dynamodb_calls': fakes['dynamodb'].call_counts(),
+            'cloudwatch_calls': fakes['cloudwatch'].calls,
+            'cloudwatch_datums': fakes['cloudwatch'].datums,
+            'ml_feedback_rows': feedback_rows
+        }
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('transport', 'mix', 'latency_ms', 'settings', 'scale'):
+            if baseline.get(key) != results[key]:
+                print(f"note: baseline {key} differs ({baseline.get(key)} vs {results[key]})")
+        results['comparison'] = compare(results, baseline)
+        for change in results['comparison']:
+            suffix = f" ({change['change_percent']:+}%)" if change['change_percent'] is not None else ''
+            print(
+                f"concurrency {change['concurrency']:>4} {change['metric']:<28} "
+                f"{change['baseline']:>10} -> {change['current']:>10}{suffix}"
+            )
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main_cli()
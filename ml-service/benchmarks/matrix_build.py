@@ -0,0 +1,146 @@
+"""
+User-item matrix construction: per-row Python vs vectorised builder
+Generates synthetic (user, event, score, time) interactions with repeated pairs and
+builds the interaction matrix with each method in a fresh process, reporting time and
+peak RSS. The builder runs are checked against a pandas drop_duplicates reference.
+
+Methods:
+    legacy             dict + list comprehensions over the frame, duplicates summed by scipy
+    pandas_reference   sort by time, drop_duplicates(keep='last'), then the legacy mapping
+    builder_frame      InteractionMatrixBuilder.add on the whole frame
+    builder_chunked    InteractionMatrixBuilder.add in --chunk-rows chunks, as the streaming path does
+
+Usage (from ml-service/):
+    python -m benchmarks.matrix_build --rows 10000000 --users 500000 --events 50000
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from src.models.interactions import InteractionMatrixBuilder
+
+METHODS = ('legacy', 'pandas_reference', 'builder_frame', 'builder_chunked')
+
+
+def synthetic_interactions(rows: int, users: int, events: int, seed: int) -> pd.DataFrame:
+    """Skewed event popularity so popular events collect repeated saves and hides"""
+    rng = np.random.default_rng(seed)
+    popularity = rng.zipf(1.3, size=events).astype(np.float64)
+    popularity /= popularity.sum()
+    start = np.datetime64('2025-01-01T00:00:00', 's')
+    return pd.DataFrame({
+        'user_id': rng.integers(1, users + 1, size=rows),
+        'event_id': rng.choice(events, size=rows, p=popularity) + 1,
+        'interaction_score': np.where(rng.random(rows) < 0.8, 1.0, -0.5),
+        'created_at': start + rng.integers(0, 365 * 86400, size=rows).astype('timedelta64[s]')
+    })
+
+
+def legacy_build(df: pd.DataFrame) -> csr_matrix:
+    """The original build_user_item_matrix body"""
+    user_ids = df['user_id'].unique()
+    event_ids = df['event_id'].unique()
+    user_idx = {uid: idx for idx, uid in enumerate(user_ids)}
+    event_idx = {eid: idx for idx, eid in enumerate(event_ids)}
+    rows = [user_idx[uid] for uid in df['user_id']]
+    cols = [event_idx[eid] for eid in df['event_id']]
+    return csr_matrix((df['interaction_score'].values, (rows, cols)), shape=(len(user_ids), len(event_ids)))
+
+
+def reference_build(df: pd.DataFrame) -> csr_matrix:
+    """Latest interaction per pair; ids keep first-appearance order like the builder"""
+    user_ids = df['user_id'].unique()
+    event_ids = df['event_id'].unique()
+    latest = (
+        df.assign(_order=np.arange(len(df)))
+        .sort_values(['created_at', '_order'], kind='stable')
+        .drop_duplicates(['user_id', 'event_id'], keep='last')
+    )
+    rows = pd.Index(user_ids).get_indexer(latest['user_id'])
+    cols = pd.Index(event_ids).get_indexer(latest['event_id'])
+    return csr_matrix((latest['interaction_score'].values, (rows, cols)), shape=(len(user_ids), len(event_ids)))
+
+
+def builder_build(df: pd.DataFrame, chunk_rows: int) -> csr_matrix:
+    builder = InteractionMatrixBuilder()
+    step = chunk_rows or len(df)
+    for start in range(0, len(df), step):
+        chunk = df.iloc[start:start + step]
+        builder.add(chunk['user_id'], chunk['event_id'], chunk['interaction_score'], chunk['created_at'])
+    return builder.build('latest')[0]
+
+
+def digest(matrix: csr_matrix) -> str:
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    h = hashlib.sha1()
+    h.update(np.asarray(matrix.shape, dtype=np.int64).tobytes())
+    h.update(matrix.indptr.astype(np.int64).tobytes())
+    h.update(matrix.indices.astype(np.int64).tobytes())
+    h.update(matrix.data.astype(np.float64).tobytes())
+    return h.hexdigest()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_once(method: str, args: argparse.Namespace, queue):
+    """One measured build in a fresh process, so peak RSS belongs to this method alone"""
+    df = synthetic_interactions(args.rows, args.users, args.events, args.seed)
+    data_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if method == 'legacy':
+        matrix = legacy_build(df)
+    elif method == 'pandas_reference':
+        matrix = reference_build(df)
+    else:
+        matrix = builder_build(df, args.chunk_rows if method == 'builder_chunked' else 0)
+    elapsed = time.perf_counter() - start
+    queue.put({
+        'method': method,
+        'seconds': round(elapsed, 3),
+        'rss_with_data_mb': round(data_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'nnz': int(matrix.nnz),
+        'digest': digest(matrix)
+    })
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=500_000)
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--chunk-rows', type=int, default=50_000)
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=list(METHODS))
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for method in args.methods:
+        queue = context.Queue()
+        process = context.Process(target=run_once, args=(method, args, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+        print(json.dumps(results[-1]))
+
+    reference = next((r['digest'] for r in results if r['method'] == 'pandas_reference'), None)
+    for result in results:
+        if result['method'].startswith('builder') and reference is not None:
+            result['matches_reference'] = result['digest'] == reference
+
+    print(json.dumps({'rows': args.rows, 'users': args.users, 'events': args.events, 'runs': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,94 @@
+"""
+Top-K neighbour computation: process scaling and memory ceiling
+Builds a synthetic user-item matrix and times top_k_neighbours for each worker
+count and memory ceiling, checking every run against the single-process result
+
+Usage (from ml-service/):
+    python -m benchmarks.similarity --users 50000 --events 20000 --per-user 30 --workers 1 2 4 --memory-mb 256
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.models.neighbours import block_rows_for_memory, resolve_workers, top_k_neighbours
+
+
+def synthetic_matrix(users: int, events: int, per_user: int, seed: int) -> csr_matrix:
+    """Users interact with per_user events drawn from a skewed popularity distribution"""
+    rng = np.random.default_rng(seed)
+    popularity = rng.zipf(1.3, size=events).astype(np.float64)
+    popularity /= popularity.sum()
+    rows = np.repeat(np.arange(users), per_user)
+    cols = rng.choice(events, size=users * per_user, p=popularity)
+    data = np.where(rng.random(users * per_user) < 0.8, 1.0, -0.5)
+    matrix = csr_matrix((data, (rows, cols)), shape=(users, events))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set of this process and of its largest finished child, in MB"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def run_once(matrix: csr_matrix, k: int, block_rows: int, workers: int, memory_mb: float, queue):
+    """One measured run in a fresh process, so peak RSS belongs to this configuration alone"""
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    indices, scores = top_k_neighbours(matrix, k=k, block_rows=block_rows, workers=workers, memory_mb=memory_mb)
+    queue.put((time.perf_counter() - start, baseline_rss, peak_rss_mb(), indices, scores))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--per-user', type=int, default=30)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--block-rows', type=int, default=1024)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 0])
+    parser.add_argument('--memory-mb', type=float, nargs='+', default=[512])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    matrix = synthetic_matrix(args.users, args.events, args.per_user, args.seed)
+    baseline = None
+    results = []
+    for memory_mb in args.memory_mb:
+        for workers in args.workers:
+            n_workers = resolve_workers(workers)
+            context = multiprocessing.get_context('spawn')
+            queue = context.Queue()
+            process = context.Process(
+                target=run_once, args=(matrix, args.k, args.block_rows, workers, memory_mb, queue)
+            )
+            process.start()
+            elapsed, start_rss, end_rss, indices, scores = queue.get()
+            process.join()
+            if baseline is None:
+                baseline = (indices, scores)
+            results.append({
+                'workers': n_workers,
+                'memory_mb': memory_mb,
+                'block_rows': block_rows_for_memory(args.users, args.block_rows, memory_mb, n_workers),
+                'seconds': round(elapsed, 3),
+                'rss_before_mb': round(start_rss, 1),
+                'peak_rss_mb': round(end_rss, 1),
+                'matches_first_run': bool(
+                    np.array_equal(indices, baseline[0]) and np.allclose(scores, baseline[1])
+                )
+            })
+            print(json.dumps(results[-1]))
+
+    print(json.dumps({'users': args.users, 'events': args.events, 'nnz': int(matrix.nnz), 'runs': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,234 @@
+"""
+SQLite stand-in for the service's MySQL database
+Speaks the small part of the pymysql API the service uses (dict and unbuffered
+tuple cursors, %s parameters, NOW(), executemany, ping/rollback) over a local
+SQLite file, so the engine can be trained and served without a MySQL server.
+The schema mirrors the columns the ML service reads and writes. An optional
+per-statement latency stands in for the network round trip to MySQL.
+
+Usage:
+    pool = ConnectionPool(lambda: standin_db.connect(path))
+"""
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pymysql
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    city TEXT,
+    start_time TEXT,
+    price_min REAL,
+    genres TEXT,
+    venue_name TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS user_saved_events (
+    user_id INTEGER NOT NULL,
+    event_id INTEGER NOT NULL,
+    saved_at TEXT DEFAULT (NOW()),
+    PRIMARY KEY (user_id, event_id)
+);
+CREATE TABLE IF NOT EXISTS user_hidden_events (
+    user_id INTEGER NOT NULL,
+    event_id INTEGER NOT NULL,
+    hidden_at TEXT DEFAULT (NOW()),
+    PRIMARY KEY (user_id, event_id)
+);
+CREATE TABLE IF NOT EXISTS user_preferences (
+    user_id INTEGER PRIMARY KEY,
+    preferred_genres TEXT,
+    preferred_artists TEXT,
+    preferred_cities TEXT,
+    budget_max REAL
+);
+CREATE TABLE IF NOT EXISTS ml_feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    context TEXT,
+    created_at TEXT DEFAULT (NOW())
+);
+"""
+
+# Created after a bulk load; the timestamp ones match migrations 004 and 005
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_events_start_time ON events (start_time);
+CREATE INDEX IF NOT EXISTS idx_events_updated_at ON events (updated_at);
+CREATE INDEX IF NOT EXISTS idx_saved_event ON user_saved_events (event_id);
+CREATE INDEX IF NOT EXISTS idx_saved_at ON user_saved_events (saved_at);
+CREATE INDEX IF NOT EXISTS idx_hidden_event ON user_hidden_events (event_id);
+CREATE INDEX IF NOT EXISTS idx_hidden_at ON user_hidden_events (hidden_at);
+CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON ml_feedback (created_at);
+"""
+
+# Columns returned as datetime, as pymysql does for DATETIME/TIMESTAMP columns
+DATETIME_COLUMNS = {
+    'now', 'date', 'start_time', 'created_at', 'updated_at', 'saved_at', 'hidden_at'
+}
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_datetime(value: datetime) -> str:
+    """Timestamps are stored as MySQL-style text so they compare correctly as strings"""
+    return value.strftime(DATETIME_FORMAT)
+
+
+def _now() -> str:
+    # MySQL's NOW() is in the session time zone, which defaults to the server's local time
+    return format_datetime(datetime.now())
+
+
+def _translate(query: str) -> str:
+    return query.replace('%s', '?')
+
+
+def _parameters(params: Optional[Sequence[Any]]) -> tuple:
+    return tuple(format_datetime(p) if isinstance(p, datetime) else p for p in (params or ()))
+
+
+def _parse_datetime(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+class StandInCursor:
+    """DB-API cursor returning dict rows (DictCursor) or tuples (SSCursor / plain Cursor)"""
+
+    def __init__(self, raw: sqlite3.Cursor, dict_rows: bool, latency_s: float = 0.0):
+        self._raw = raw
+        self._dict_rows = dict_rows
+        self._latency_s = latency_s
+        self._columns: List[str] = []
+        self._convert: List[int] = []
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._raw.rowcount
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self._raw.lastrowid
+
+    def execute(self, query: str, params: Optional[Sequence[Any]] = None) -> int:
+        if self._latency_s:
+            time.sleep(self._latency_s)
+        self._raw.execute(_translate(query), _parameters(params))
+        description = self._raw.description or ()
+        self._columns = [column[0] for column in description]
+        self._convert = [i for i, name in enumerate(self._columns) if name.lower() in DATETIME_COLUMNS]
+        return self._raw.rowcount
+
+    def executemany(self, query: str, seq_of_params: Iterable[Sequence[Any]]) -> int:
+        if self._latency_s:
+            time.sleep(self._latency_s)
+        self._raw.executemany(_translate(query), (_parameters(params) for params in seq_of_params))
+        self._columns, self._convert = [], []
+        return self._raw.rowcount
+
+    def _row(self, raw: Optional[tuple]) -> Any:
+        if raw is None:
+            return None
+        if self._convert:
+            raw = list(raw)
+            for i in self._convert:
+                raw[i] = _parse_datetime(raw[i])
+        if self._dict_rows:
+            return dict(zip(self._columns, raw))
+        return tuple(raw)
+
+    def fetchone(self) -> Any:
+        return self._row(self._raw.fetchone())
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        return [self._row(raw) for raw in self._raw.fetchmany(size)]
+
+    def fetchall(self) -> List[Any]:
+        return [self._row(raw) for raw in self._raw.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._raw.close()
+
+
+class StandInConnection:
+    """One SQLite connection behaving like a pymysql connection opened with DictCursor"""
+
+    def __init__(self, path: str, latency_s: float = 0.0):
+        self._latency_s = latency_s
+        # The pool hands a connection to one thread at a time, but not always the same one
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.create_function('NOW', 0, _now)
+
+    def cursor(self, cursor_class: Optional[type] = None) -> StandInCursor:
+        dict_rows = cursor_class is None or issubclass(cursor_class, pymysql.cursors.DictCursorMixin)
+        return StandInCursor(self._db.cursor(), dict_rows, self._latency_s)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect: bool = False):
+        if self._latency_s:
+            time.sleep(self._latency_s)
+        self._db.execute('SELECT 1')
+
+    def close(self):
+        self._db.close()
+
+
+def connect(path: str, latency_s: float = 0.0) -> StandInConnection:
+    return StandInConnection(path, latency_s)
+
+
+def create_schema(path: str):
+    """Create the tables in a new (or existing) database file"""
+    db = sqlite3.connect(path)
+    try:
+        db.create_function('NOW', 0, _now)
+        # WAL lets serving reads run while feedback is being written
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(SCHEMA)
+        db.commit()
+    finally:
+        db.close()
+
+
+def create_indexes(path: str):
+    db = sqlite3.connect(path)
+    try:
+        db.executescript(INDEXES)
+        db.execute('ANALYZE')
+        db.commit()
+    finally:
+        db.close()
+
+
+def table_counts(path: str) -> Dict[str, int]:
+    db = sqlite3.connect(path)
+    try:
+        return {
+            table: db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('events', 'user_saved_events', 'user_hidden_events', 'user_preferences', 'ml_feedback')
+        }
+    finally:
+        db.close()
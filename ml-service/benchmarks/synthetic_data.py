@@ -0,0 +1,246 @@
+"""
+Deterministic synthetic data for the stand-in database
+Users, events, saves, hides and stated preferences at a chosen scale. Event
+popularity and user activity are skewed (a few events and users collect most
+interactions), each (user, event) pair is saved or hidden at most once per table,
+and interaction times are spread over the past year. The same seed and scale give
+the same rows; times are relative to the day the data is generated.
+
+Usage (from ml-service/):
+    python -m benchmarks.synthetic_data --interactions 100000 --path /tmp/bench.sqlite
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from benchmarks import standin_db
+
+CITIES = ['Dublin', 'Cork', 'Galway', 'Limerick', 'Belfast', 'Waterford', 'Kilkenny', 'Sligo']
+# Share of events per city, Dublin-heavy like the real catalog
+CITY_WEIGHTS = [0.45, 0.15, 0.12, 0.08, 0.08, 0.05, 0.04, 0.03]
+GENRES = [
+    'techno', 'house', 'drum and bass', 'jazz', 'indie rock', 'hip hop', 'trad', 'folk',
+    'metal', 'punk', 'electronic', 'soul', 'reggae', 'pop', 'classical', 'disco'
+]
+
+# Rows per executemany batch while loading
+INSERT_BATCH_ROWS = 100_000
+
+
+class SyntheticScale:
+    """Row counts for one generated dataset; users and events default to a ratio of interactions"""
+
+    def __init__(
+        self,
+        interactions: int,
+        users: Optional[int] = None,
+        events: Optional[int] = None,
+        hide_fraction: float = 0.2,
+        preference_fraction: float = 0.3,
+        upcoming_fraction: float = 0.4,
+        artists: Optional[int] = None,
+        seed: int = 7
+    ):
+        self.interactions = int(interactions)
+        self.users = int(users or max(100, self.interactions // 20))
+        self.events = int(events or max(50, self.interactions // 200))
+        self.hide_fraction = hide_fraction
+        self.preference_fraction = preference_fraction
+        self.upcoming_fraction = upcoming_fraction
+        self.artists = int(artists or max(20, self.events // 10))
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    def key(self) -> str:
+        """File name stem identifying this dataset"""
+        return (
+            f"synthetic_i{self.interactions}_u{self.users}_e{self.events}_a{self.artists}"
+            f"_h{self.hide_fraction:g}_p{self.preference_fraction:g}_f{self.upcoming_fraction:g}_s{self.seed}"
+        )
+
+
+def _skewed_weights(rng: np.random.Generator, n: int, exponent: float) -> np.ndarray:
+    """Power-law weights in a random order, so popularity is not tied to id"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _unique_pairs(
+    rng: np.random.Generator,
+    count: int,
+    user_weights: np.ndarray,
+    event_weights: np.ndarray
+) -> tuple:
+    """count distinct (user, event) pairs drawn from the skewed distributions, in draw order"""
+    n_events = len(event_weights)
+    count = min(count, len(user_weights) * n_events)
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < count:
+        draw = int((count - len(keys)) * 1.3) + 16
+        users = rng.choice(len(user_weights), size=draw, p=user_weights)
+        events = rng.choice(n_events, size=draw, p=event_weights)
+        keys = np.concatenate([keys, users.astype(np.int64) * n_events + events])
+        _, first = np.unique(keys, return_index=True)
+        keys = keys[np.sort(first)]
+    keys = keys[:count]
+    return keys // n_events + 1, keys % n_events + 1
+
+
+def _timestamps(anchor: np.datetime64, seconds_before: np.ndarray) -> np.ndarray:
+    """MySQL-style 'YYYY-MM-DD HH:MM:SS' text for anchor minus each offset"""
+    text = (anchor - seconds_before.astype('timedelta64[s]')).astype('datetime64[s]').astype(str)
+    return np.char.replace(text, 'T', ' ')
+
+
+def _insert(db: sqlite3.Connection, query: str, columns: list):
+    count = len(columns[0])
+    for start in range(0, count, INSERT_BATCH_ROWS):
+        stop = start + INSERT_BATCH_ROWS
+        db.executemany(query, zip(*(column[start:stop].tolist() for column in columns)))
+
+
+def _json_lists(rng: np.random.Generator, pool: list, count: int, max_items: int) -> np.ndarray:
+    sizes = rng.integers(1, max_items + 1, size=count)
+    picks = rng.integers(0, len(pool), size=(count, max_items))
+    return np.array([json.dumps([pool[i] for i in row[:size]]) for row, size in zip(picks, sizes)], dtype=object)
+
+
+def generate(path: str, scale: SyntheticScale) -> Dict[str, Any]:
+    """Write a fresh dataset to path; returns its row counts and generation time"""
+    started = time.perf_counter()
+    rng = np.random.default_rng(scale.seed)
+    # Whole seconds at the start of today, so the same seed gives the same rows all day
+    anchor = np.datetime64(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0), 's')
+    day = 86400
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    standin_db.create_schema(path)
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA synchronous=OFF')
+
+    # Events: a share upcoming (what serving ranks), the rest in the past year
+    n_events = scale.events
+    event_ids = np.arange(1, n_events + 1)
+    artist_names = np.array([f"Artist {i}" for i in range(scale.artists)], dtype=object)
+    headliners = artist_names[rng.integers(0, scale.artists, size=n_events)]
+    support = artist_names[rng.integers(0, scale.artists, size=n_events)]
+    with_support = rng.random(n_events) < 0.3
+    titles = np.where(with_support, headliners + ' with ' + support, headliners)
+    upcoming = rng.random(n_events) < scale.upcoming_fraction
+    start_offsets = np.where(
+        upcoming, -rng.integers(day, 120 * day, size=n_events), rng.integers(day, 365 * day, size=n_events)
+    )
+    prices = np.where(rng.random(n_events) < 0.2, np.nan, np.round(rng.uniform(5, 80, size=n_events), 2))
+    created = _timestamps(anchor, rng.integers(30 * day, 400 * day, size=n_events))
+    _insert(
+        db,
+        'INSERT INTO events (id, title, city, start_time, price_min, genres, venue_name, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [
+            event_ids,
+            titles,
+            np.array(CITIES, dtype=object)[rng.choice(len(CITIES), size=n_events, p=CITY_WEIGHTS)],
+            _timestamps(anchor, start_offsets),
+            np.array([None if np.isnan(p) else float(p) for p in prices], dtype=object),
+            _json_lists(rng, GENRES, n_events, 2),
+            np.array([f"Venue {i}" for i in rng.integers(0, max(10, n_events // 20), size=n_events)], dtype=object),
+            created,
+            created
+        ]
+    )
+
+    # Saves and hides: skewed users and events; a pair can be both saved and hidden
+    user_weights = _skewed_weights(rng, scale.users, 0.6)
+    event_weights = _skewed_weights(rng, n_events, 0.9)
+    n_hides = int(round(scale.interactions * scale.hide_fraction))
+    n_saves = scale.interactions - n_hides
+    counts = {}
+    for table, column, count in (
+        ('user_saved_events', 'saved_at', n_saves),
+        ('user_hidden_events', 'hidden_at', n_hides)
+    ):
+        users, events = _unique_pairs(rng, count, user_weights, event_weights)
+        times = _timestamps(anchor, rng.integers(60, 365 * day, size=len(users)))
+        _insert(db, f'INSERT INTO {table} (user_id, event_id, {column}) VALUES (?, ?, ?)', [users, events, times])
+        counts[table] = len(users)
+
+    # Stated preferences for a share of users
+    n_prefs = int(round(scale.users * scale.preference_fraction))
+    pref_users = np.sort(rng.choice(scale.users, size=n_prefs, replace=False)) + 1
+    _insert(
+        db,
+        'INSERT INTO user_preferences (user_id, preferred_genres, preferred_artists, preferred_cities, budget_max) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [
+            pref_users,
+            _json_lists(rng, GENRES, n_prefs, 3),
+            _json_lists(rng, list(artist_names), n_prefs, 3),
+            _json_lists(rng, CITIES, n_prefs, 2),
+            np.round(rng.uniform(20, 150, size=n_prefs), 0)
+        ]
+    )
+    db.commit()
+    db.close()
+    standin_db.create_indexes(path)
+
+    return {
+        'path': path,
+        'anchor': str(anchor),
+        'users': scale.users,
+        'events': n_events,
+        'upcoming_events': int(upcoming.sum()),
+        'saves': counts['user_saved_events'],
+        'hides': counts['user_hidden_events'],
+        'preferences': n_prefs,
+        'generate_seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def ensure_dataset(data_dir: str, scale: SyntheticScale, regenerate: bool = False) -> Dict[str, Any]:
+    """Reuse a dataset generated today for this scale, otherwise generate it"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, scale.key() + '.sqlite')
+    info_path = path + '.json'
+    today = str(np.datetime64(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0), 's'))
+
+    if not regenerate and os.path.exists(path) and os.path.exists(info_path):
+        with open(info_path) as f:
+            info = json.load(f)
+        if info.get('anchor') == today:
+            info['reused'] = True
+            return info
+
+    info = generate(path, scale)
+    with open(info_path, 'w') as f:
+        json.dump(info, f, indent=2)
+    info['reused'] = False
+    return info
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interactions', type=int, default=100_000)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--events', type=int)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--path', required=True)
+    args = parser.parse_args()
+
+    info = generate(args.path, SyntheticScale(args.interactions, args.users, args.events, seed=args.seed))
+    info['tables'] = standin_db.table_counts(args.path)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -4,15 +4,23 @@ Uses on-demand pricing ~$1-2/month for low traffic
 """
 import logging
 import hashlib
+import random
+import time
 from typing import Dict, List, Optional
 from datetime import datetime
 import boto3
 from botocore.exceptions import ClientError
 
+from . import tracing
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# BatchGetItem retries for throttled (unprocessed) keys back off exponentially with
+# jitter; keys still unread after the last attempt are hash-assigned instead
+BATCH_GET_MAX_ATTEMPTS = 4
+BATCH_GET_BACKOFF_SECONDS = 0.05
+
 class ABTestManager:
     """Manage A/B experiments using DynamoDB"""
 
@@ -148,12 +156,13 @@ class ABTestManager:
             # Check if user already assigned
             if self.assignments_table:
                 try:
-                    response = self.assignments_table.get_item(
-                        Key={
-                            'user_id': user_id,
-                            'experiment_id': experiment_id
-                        }
-                    )
+                    with tracing.span('ab_lookup'):
+                        response = self.assignments_table.get_item(
+                            Key={
+                                'user_id': user_id,
+                                'experiment_id': experiment_id
+                            }
+                        )
                     if 'Item' in response:
                         return {
                             'experiment_id': experiment_id,
@@ -168,14 +177,15 @@ class ABTestManager:
             # Store assignment
             if self.assignments_table:
                 try:
-                    self.assignments_table.put_item(
-                        Item={
-                            'user_id': user_id,
-                            'experiment_id': experiment_id,
-                            'variant': variant,
-                            'assigned_at': datetime.utcnow().isoformat()
-                        }
-                    )
+                    with tracing.span('ab_store'):
+                        self.assignments_table.put_item(
+                            Item={
+                                'user_id': user_id,
+                                'experiment_id': experiment_id,
+                                'variant': variant,
+                                'assigned_at': datetime.utcnow().isoformat()
+                            }
+                        )
                 except Exception as e:
                     logger.error(f"Error storing assignment: {e}")
 
@@ -188,6 +198,83 @@ class ABTestManager:
             logger.error(f"Error assigning experiment: {e}")
             return {}
 
+    def assign_experiments(self, user_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Assign many users at once
+        Existing assignments are read with BatchGetItem and new ones written with a batch writer
+        """
+        try:
+            experiment_id = settings.default_experiment_id
+            experiment = self.experiments.get(experiment_id)
+
+            if not experiment:
+                logger.warning(f"Experiment {experiment_id} not found")
+                return {user_id: {} for user_id in user_ids}
+
+            unique_ids = list(dict.fromkeys(user_ids))
+            assignments: Dict[str, Dict] = {}
+            # Users whose stored assignment could not be read: hash-assigned, but not written back
+            unread = set()
+
+            # Check which users are already assigned (BatchGetItem takes up to 100 keys)
+            if self.assignments_table:
+                table_name = self.assignments_table.name
+                for start in range(0, len(unique_ids), 100):
+                    keys = [
+                        {'user_id': user_id, 'experiment_id': experiment_id}
+                        for user_id in unique_ids[start:start + 100]
+                    ]
+                    request = {table_name: {'Keys': keys, 'ProjectionExpression': 'user_id, variant'}}
+                    try:
+                        for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+                            if attempt:
+                                time.sleep(random.uniform(0, BATCH_GET_BACKOFF_SECONDS * 2 ** attempt))
+                            response = self.dynamodb.batch_get_item(RequestItems=request)
+                            for item in response.get('Responses', {}).get(table_name, []):
+                                assignments[item['user_id']] = {
+                                    'experiment_id': experiment_id,
+                                    'variant': item['variant']
+                                }
+                            request = response.get('UnprocessedKeys') or None
+                            if not request:
+                                break
+                    except ClientError as e:
+                        logger.error(f"Error reading batch assignments: {e}")
+                    if request:
+                        unprocessed = request.get(table_name, {}).get('Keys', [])
+                        logger.warning(f"{len(unprocessed)} assignments unread after retries, hash-assigning")
+                        unread.update(key['user_id'] for key in unprocessed)
+
+            # Assign the rest using consistent hashing
+            new_assignments = []
+            for user_id in unique_ids:
+                if user_id not in assignments:
+                    variant = self._hash_assign_variant(user_id, experiment['variants'])
+                    assignments[user_id] = {'experiment_id': experiment_id, 'variant': variant}
+                    if user_id not in unread:
+                        new_assignments.append(user_id)
+
+            # Store new assignments
+            if self.assignments_table and new_assignments:
+                try:
+                    assigned_at = datetime.utcnow().isoformat()
+                    with self.assignments_table.batch_writer() as batch:
+                        for user_id in new_assignments:
+                            batch.put_item(Item={
+                                'user_id': user_id,
+                                'experiment_id': experiment_id,
+                                'variant': assignments[user_id]['variant'],
+                                'assigned_at': assigned_at
+                            })
+                except Exception as e:
+                    logger.error(f"Error storing batch assignments: {e}")
+
+            return assignments
+
+        except Exception as e:
+            logger.error(f"Error assigning experiments: {e}")
+            return {user_id: {} for user_id in user_ids}
+
     def _hash_assign_variant(self, user_id: str, variants: List[Dict]) -> str:
         """
         Use consistent hashing to assign variant
@@ -0,0 +1,239 @@
+"""
+Two-tier recommendation result cache
+An in-process LRU sits in front of optional Redis so repeat requests skip
+scoring entirely; Redis lets several workers share results
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+# (user_id, field) - field identifies city/variant/limit/context/model/catalog within the user's entries
+CacheKey = Tuple[str, str]
+
+
+def context_fingerprint(context: Optional[Dict[str, Any]]) -> str:
+    """Stable short hash of a request context; empty contexts share one fingerprint"""
+    if not context:
+        return '-'
+    encoded = json.dumps(context, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def make_key(
+    user_id: str,
+    city: Optional[str],
+    variant: str,
+    limit: int,
+    context: Optional[Dict[str, Any]],
+    fingerprint: str
+) -> CacheKey:
+    """Build the cache key for one recommendation request; fingerprint identifies the model and catalog"""
+    city_key = (city or '').strip().lower()
+    field = f"{city_key}|{variant}|{limit}|{context_fingerprint(context)}|{fingerprint}"
+    return str(user_id), field
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL and per-user invalidation"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[CacheKey, Tuple[float, Any]]' = OrderedDict()
+        self._user_fields: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: CacheKey, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._user_fields.setdefault(key[0], set()).add(key[1])
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for field in self._user_fields.pop(str(user_id), set()):
+                self._entries.pop((str(user_id), field), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_fields.clear()
+
+    def _remove(self, key: CacheKey):
+        self._entries.pop(key, None)
+        fields = self._user_fields.get(key[0])
+        if fields is not None:
+            fields.discard(key[1])
+            if not fields:
+                del self._user_fields[key[0]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RecommendationCache:
+    """
+    Result cache keyed by (user_id, city, variant, limit, context, model and catalog snapshot)
+    Redis stores one hash per user so feedback can drop all of a user's entries with one DEL
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None, redis_client=None):
+        self.ttl_seconds = ttl_seconds or settings.cache_ttl_seconds
+        self.local = LRUCache(max_entries or settings.result_cache_max_entries, self.ttl_seconds)
+        self.redis = redis_client
+
+        if self.redis is None and settings.redis_enabled and settings.redis_host:
+            if redis is None:
+                logger.warning("REDIS_ENABLED is set but the redis package is not installed")
+            else:
+                try:
+                    self.redis = redis.Redis(
+                        host=settings.redis_host,
+                        port=settings.redis_port,
+                        socket_timeout=0.5,
+                        socket_connect_timeout=0.5
+                    )
+                    logger.info(f"Redis result cache enabled at {settings.redis_host}:{settings.redis_port}")
+                except Exception as e:
+                    logger.warning(f"Redis initialization failed: {e}. Using in-process cache only.")
+                    self.redis = None
+
+        # Stats for monitoring
+        self._stats_lock = threading.Lock()
+        self.hits = {'local': 0, 'redis': 0}
+        self.misses = {'local': 0, 'redis': 0}
+        self.redis_errors = 0
+
+    @property
+    def remote_enabled(self) -> bool:
+        return self.redis is not None
+
+    @staticmethod
+    def _redis_key(user_id: str) -> str:
+        return f"rec:{user_id}"
+
+    def _count(self, counter: Dict[str, int], tier: str, n: int = 1):
+        with self._stats_lock:
+            counter[tier] += n
+
+    def get_local(self, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        """In-process lookup; never blocks on I/O"""
+        value = self.local.get(key)
+        self._count(self.hits if value is not None else self.misses, 'local')
+        return value
+
+    def get_remote(self, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        """Redis lookup for a local miss; hits are promoted to the local tier"""
+        return self.get_remote_many([key])[0]
+
+    def get_remote_many(self, keys: List[CacheKey]) -> List[Optional[List[Dict[str, Any]]]]:
+        """Pipelined Redis lookups for several local misses"""
+        if self.redis is None or not keys:
+            return [None] * len(keys)
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id, field in keys:
+                pipe.hget(self._redis_key(user_id), field)
+            raw_values = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis cache lookup failed: {e}")
+            with self._stats_lock:
+                self.redis_errors += 1
+            return [None] * len(keys)
+
+        results = []
+        for key, raw in zip(keys, raw_values):
+            value = None
+            if raw is not None:
+                try:
+                    value = json.loads(raw)
+                    self.local.set(key, value)
+                except ValueError:
+                    value = None
+            self._count(self.hits if value is not None else self.misses, 'redis')
+            results.append(value)
+        return results
+
+    def set(self, key: CacheKey, recommendations: List[Dict[str, Any]]):
+        """Store locally; use store_remote to write through to Redis"""
+        self.local.set(key, recommendations)
+
+    def store_remote(self, items: List[Tuple[CacheKey, List[Dict[str, Any]]]]):
+        """Write results to Redis, refreshing each user hash's TTL"""
+        if self.redis is None or not items:
+            return
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for (user_id, field), recommendations in items:
+                redis_key = self._redis_key(user_id)
+                pipe.hset(redis_key, field, json.dumps(recommendations, default=str))
+                pipe.expire(redis_key, self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis cache store failed: {e}")
+            with self._stats_lock:
+                self.redis_errors += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached result for a user (called after feedback)"""
+        self.local.invalidate_user(user_id)
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(self._redis_key(str(user_id)))
+        except Exception as e:
+            logger.warning(f"Redis cache invalidation failed for user {user_id}: {e}")
+            with self._stats_lock:
+                self.redis_errors += 1
+
+    def clear_local(self):
+        """
+        Drop in-process results (called after a model reload)
+        Redis entries carry the model and catalog fingerprint in their field, so stale ones are never read again
+        """
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = {
+                'entries': len(self.local),
+                'max_entries': self.local.max_entries,
+                'redis_enabled': self.redis is not None,
+                'redis_errors': self.redis_errors
+            }
+            for tier in ('local', 'redis'):
+                lookups = self.hits[tier] + self.misses[tier]
+                stats[f'{tier}_hits'] = self.hits[tier]
+                stats[f'{tier}_misses'] = self.misses[tier]
+                stats[f'{tier}_hit_ratio'] = self.hits[tier] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,385 @@
+"""
+In-memory catalog of upcoming events
+Column-oriented snapshot refreshed incrementally in the background,
+so recommendation requests never query the events table
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .config import settings
+from .tokens import split_tokens, words
+
+logger = logging.getLogger(__name__)
+
+# Context genre tokens remembered per snapshot before the match cache is reset
+GENRE_MATCH_CACHE_SIZE = 10000
+
+EVENT_COLUMNS_QUERY = """
+SELECT id, title, genres, city, start_time, price_min, venue_name,
+       COALESCE(updated_at, created_at) AS updated_at
+FROM events
+"""
+
+
+def normalize_city(city: Any) -> str:
+    """Case/whitespace-insensitive city key"""
+    return str(city or '').lower().strip()
+
+
+class CatalogColumns:
+    """
+    Immutable column snapshot of the catalog
+    Readers grab one reference and never see a partially applied refresh
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.event_id = np.array([r['id'] for r in rows], dtype=object)
+        self.title = np.array([r['title'] for r in rows], dtype=object)
+        self.genre = np.array([r['genres'] for r in rows], dtype=object)
+        self.city = np.array([r['city'] for r in rows], dtype=object)
+        self.city_key = np.array([normalize_city(r['city']) for r in rows], dtype=object)
+        self.venue_name = np.array([r['venue_name'] for r in rows], dtype=object)
+        self.start_time = np.array([r['start_time'] for r in rows], dtype='datetime64[s]')
+        self.date = np.array(
+            [r['start_time'].isoformat() if r['start_time'] else None for r in rows], dtype=object
+        )
+        # Keep the existing API semantics: a missing or zero price is reported as None
+        self.price = np.array(
+            [float(r['price_min']) if r['price_min'] else np.nan for r in rows], dtype=np.float64
+        )
+
+        self.index: Dict[Any, int] = {eid: pos for pos, eid in enumerate(self.event_id.tolist())}
+
+        # Interned genre and title-word ids per event (CSR layout), so context boosting is array work
+        self.genre_vocab, self.genre_indptr, self.genre_ids = self._intern_tokens(
+            [r['genres'] for r in rows], split_tokens
+        )
+        self.word_vocab, self.word_indptr, self.word_ids = self._intern_tokens(
+            [r['title'] for r in rows], words
+        )
+        self._genre_matches: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def _intern_tokens(values: List[Any], tokenize: Callable[[Any], List[str]]) -> tuple:
+        """(vocabulary, indptr, token ids) per value; identical raw values are tokenised once"""
+        vocabulary: Dict[str, int] = {}
+        parsed: Dict[Any, List[int]] = {}
+        indptr = [0]
+        ids: List[int] = []
+        for value in values:
+            key = value if isinstance(value, (str, type(None))) else repr(value)
+            value_ids = parsed.get(key)
+            if value_ids is None:
+                value_ids = sorted({vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(value)})
+                parsed[key] = value_ids
+            ids.extend(value_ids)
+            indptr.append(len(ids))
+        return vocabulary, np.array(indptr, dtype=np.int64), np.array(ids, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.event_id)
+
+    def position(self, event_id: Any) -> Optional[int]:
+        """Catalog row for an event id; accepts the numeric ids as strings too"""
+        pos = self.index.get(event_id)
+        if pos is None and isinstance(event_id, str) and event_id.isdigit():
+            pos = self.index.get(int(event_id))
+        return pos
+
+    def genre_token_ids(self, token: str) -> np.ndarray:
+        """Genre vocabulary ids that contain, or are contained in, a context genre token"""
+        ids = self._genre_matches.get(token)
+        if ids is None:
+            ids = np.array(
+                [gid for genre, gid in self.genre_vocab.items() if token in genre or genre in token],
+                dtype=np.int64
+            )
+            if len(self._genre_matches) >= GENRE_MATCH_CACHE_SIZE:
+                self._genre_matches = {}
+            self._genre_matches[token] = ids
+        return ids
+
+    @staticmethod
+    def _gather(indptr: np.ndarray, ids: np.ndarray, positions: np.ndarray) -> tuple:
+        """Token ids of the events at positions, flattened, with the owning row of each"""
+        starts = indptr[positions]
+        lengths = indptr[positions + 1] - starts
+        owners = np.repeat(np.arange(len(positions)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return ids[np.repeat(starts, lengths) + offsets], owners
+
+    def context_match_counts(
+        self,
+        positions: np.ndarray,
+        genre_tokens: List[str],
+        artist_tokens: List[str]
+    ) -> tuple:
+        """
+        Per event at positions: how many context genre tokens overlap one of its genres,
+        and how many context artists have every word in its title
+        """
+        n = len(positions)
+        genre_counts = np.zeros(n, dtype=np.int64)
+        artist_counts = np.zeros(n, dtype=np.int64)
+        if n == 0:
+            return genre_counts, artist_counts
+
+        if genre_tokens and self.genre_vocab:
+            # (genre vocabulary x context token) overlap table, then OR it over each event's genres
+            overlap = np.zeros((len(self.genre_vocab), len(genre_tokens)), dtype=bool)
+            for t, token in enumerate(genre_tokens):
+                overlap[self.genre_token_ids(token), t] = True
+            event_genres, owners = self._gather(self.genre_indptr, self.genre_ids, positions)
+            hits = np.zeros((n, len(genre_tokens)), dtype=bool)
+            np.logical_or.at(hits, owners, overlap[event_genres])
+            genre_counts = hits.sum(axis=1)
+
+        if artist_tokens and self.word_vocab:
+            # Compact (context word x artist) table; an artist matches when all its words are in the title
+            word_slot: Dict[int, int] = {}
+            pairs: List[tuple] = []
+            lengths: List[int] = []
+            for token in artist_tokens:
+                token_words = {self.word_vocab.get(word) for word in words(token)}
+                if not token_words or None in token_words:
+                    # A word no title uses means the artist cannot match anything
+                    continue
+                for word_id in token_words:
+                    pairs.append((word_slot.setdefault(word_id, len(word_slot)), len(lengths)))
+                lengths.append(len(token_words))
+
+            if lengths:
+                table = np.zeros((len(word_slot), len(lengths)), dtype=np.int64)
+                slots, columns = zip(*pairs)
+                table[list(slots), list(columns)] = 1
+
+                slot_of = np.full(len(self.word_vocab), -1, dtype=np.int64)
+                slot_of[list(word_slot)] = list(word_slot.values())
+                title_words, owners = self._gather(self.word_indptr, self.word_ids, positions)
+                title_slots = slot_of[title_words]
+                used = title_slots >= 0
+
+                matched_words = np.zeros((n, len(lengths)), dtype=np.int64)
+                np.add.at(matched_words, owners[used], table[title_slots[used]])
+                artist_counts = (matched_words == np.array(lengths)).sum(axis=1)
+
+        return genre_counts, artist_counts
+
+
+class EventCatalog:
+    """
+    Upcoming events held in memory for the request path
+    Loads once, then fetches only rows whose updated_at moved since the last sync
+    """
+
+    def __init__(
+        self,
+        db_pool,
+        refresh_seconds: Optional[float] = None,
+        full_reload_seconds: Optional[float] = None
+    ):
+        self.db_pool = db_pool
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else settings.catalog_refresh_seconds
+        self.full_reload_seconds = (
+            full_reload_seconds if full_reload_seconds is not None else settings.catalog_full_reload_seconds
+        )
+
+        self._columns: Optional[CatalogColumns] = None
+        # Raw rows keyed by event id; the merge target for incremental refreshes
+        self._rows: Dict[Any, Dict[str, Any]] = {}
+        self._watermark = None
+        self._last_full_load = 0.0
+        # Offset between the database clock and ours, so "upcoming" matches NOW() semantics
+        self._clock_offset = np.timedelta64(0, 's')
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[CatalogColumns], None]] = []
+        self.version = 0
+        # Same on every process that has loaded the same rows, unlike version; part of result cache keys
+        self.fingerprint = 'empty'
+
+    def is_loaded(self) -> bool:
+        return self._columns is not None
+
+    @property
+    def columns(self) -> Optional[CatalogColumns]:
+        return self._columns
+
+    def add_listener(self, listener: Callable[[CatalogColumns], None]):
+        """Call listener(columns) after every new snapshot is published"""
+        self._listeners.append(listener)
+
+    def now(self) -> np.datetime64:
+        """Current time on the database clock"""
+        return np.datetime64(datetime.now(), 's') + self._clock_offset
+
+    def load(self):
+        """Full (re)load of upcoming events"""
+        with self._refresh_lock:
+            conn = self.db_pool.connection()
+            try:
+                cursor = conn.cursor()
+                self._sync_clock(cursor)
+                cursor.execute(EVENT_COLUMNS_QUERY + " WHERE start_time >= NOW()")
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+
+            self._rows = {row['id']: row for row in rows}
+            self._watermark = None
+            self._publish(CatalogColumns(rows), rows)
+            self._last_full_load = time.monotonic()
+            logger.info(f"Event catalog loaded: {len(rows)} upcoming events")
+
+    def refresh(self):
+        """Apply rows changed since the last sync; falls back to a full load when due"""
+        if (
+            self._columns is None
+            or self._watermark is None
+            or time.monotonic() - self._last_full_load >= self.full_reload_seconds
+        ):
+            self.load()
+            return
+
+        with self._refresh_lock:
+            conn = self.db_pool.connection()
+            try:
+                cursor = conn.cursor()
+                self._sync_clock(cursor)
+                cursor.execute(EVENT_COLUMNS_QUERY + " WHERE updated_at >= %s", (self._watermark,))
+                changed = cursor.fetchall()
+            finally:
+                conn.close()
+
+            merged = dict(self._rows)
+            for row in changed:
+                merged[row['id']] = row
+
+            # Drop events that have started (or were moved into the past)
+            now = self.now()
+            self._rows = {
+                eid: row for eid, row in merged.items()
+                if row['start_time'] is not None and np.datetime64(row['start_time'], 's') >= now
+            }
+            upcoming = list(self._rows.values())
+            self._publish(CatalogColumns(upcoming), changed)
+            logger.debug(f"Event catalog refreshed: {len(changed)} changed, {len(upcoming)} upcoming")
+
+    def _sync_clock(self, cursor):
+        cursor.execute("SELECT NOW() AS now")
+        db_now = cursor.fetchone()['now']
+        if db_now is not None:
+            self._clock_offset = np.datetime64(db_now, 's') - np.datetime64(datetime.now(), 's')
+
+    def _publish(self, columns: CatalogColumns, changed_rows: Iterable[Dict[str, Any]]):
+        for row in changed_rows:
+            updated_at = row.get('updated_at')
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+        self._columns = columns
+        self.version += 1
+        # Edited events move the watermark; started or past events shrink the snapshot
+        self.fingerprint = f"{len(columns)}:{self._watermark}"
+
+        for listener in self._listeners:
+            try:
+                listener(columns)
+            except Exception as e:
+                logger.error(f"Event catalog listener failed: {e}")
+
+    def start_refresh(self):
+        """Load the catalog and keep it fresh from a daemon thread"""
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Initial event catalog load failed: {e}")
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name='event-catalog-refresh', daemon=True)
+        self._thread.start()
+
+    def stop_refresh(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Event catalog refresh failed: {e}")
+
+    def _upcoming_positions(self, cols: CatalogColumns, city: Optional[str]) -> np.ndarray:
+        mask = cols.start_time >= self.now()
+        if city:
+            mask &= cols.city_key == normalize_city(city)
+        return np.flatnonzero(mask)
+
+    def soonest(self, city: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """Upcoming events ordered by start time"""
+        cols = self._columns
+        if cols is None or limit <= 0:
+            return []
+
+        positions = self._upcoming_positions(cols, city)
+        if len(positions) > limit:
+            positions = positions[np.argpartition(cols.start_time[positions], limit - 1)[:limit]]
+        top = positions[np.argsort(cols.start_time[positions], kind='stable')]
+        return self.materialize(cols, top, 'content_based', np.full(len(top), 0.5))
+
+    def details(self, event_ids: List[Any], city: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Upcoming events for the given ids, in the order the ids were given"""
+        cols = self._columns
+        if cols is None or not event_ids:
+            return []
+
+        positions = [cols.position(eid) for eid in event_ids]
+        positions = np.array([p for p in positions if p is not None], dtype=np.int64)
+        if len(positions) == 0:
+            return []
+
+        mask = cols.start_time[positions] >= self.now()
+        if city:
+            mask &= cols.city_key[positions] == normalize_city(city)
+        return self.materialize(cols, positions[mask], 'collaborative_filtering')
+
+    @staticmethod
+    def materialize(
+        cols: CatalogColumns,
+        positions: np.ndarray,
+        algorithm: str,
+        scores: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """Build API row dicts for the selected catalog positions"""
+        prices = cols.price[positions]
+        rows = []
+        for i, (eid, title, genre, city, date, price, venue) in enumerate(zip(
+            cols.event_id[positions].tolist(), cols.title[positions].tolist(),
+            cols.genre[positions].tolist(), cols.city[positions].tolist(),
+            cols.date[positions].tolist(), prices.tolist(), cols.venue_name[positions].tolist()
+        )):
+            row = {
+                'event_id': eid,
+                'title': title,
+                'artist_name': title,
+                'genre': genre,
+                'city': city,
+                'date': date,
+                'price': None if np.isnan(price) else price,
+                'venue_name': venue
+            }
+            if scores is not None:
+                row['score'] = float(scores[i])
+            row['algorithm'] = algorithm
+            rows.append(row)
+        return rows
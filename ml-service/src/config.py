@@ -19,12 +19,79 @@ class Settings(BaseSettings):
     db_password: str = os.getenv("DB_PASSWORD", "app")
     db_name: str = os.getenv("DB_NAME", "gigsdb")
 
+    # Database connection pool
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_pool_timeout_seconds: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+    db_pool_idle_timeout_seconds: float = float(os.getenv("DB_POOL_IDLE_TIMEOUT_SECONDS", "300"))
+    db_pool_recycle_seconds: float = float(os.getenv("DB_POOL_RECYCLE_SECONDS", "3600"))
+
+    # Blocking-call executor: total threads and per-dependency concurrency limits
+    executor_max_workers: int = int(os.getenv("EXECUTOR_MAX_WORKERS", "32"))
+    db_concurrency_limit: int = int(os.getenv("DB_CONCURRENCY_LIMIT", os.getenv("DB_POOL_SIZE", "5")))
+    dynamodb_concurrency_limit: int = int(os.getenv("DYNAMODB_CONCURRENCY_LIMIT", "16"))
+    model_concurrency_limit: int = int(os.getenv("MODEL_CONCURRENCY_LIMIT", "4"))
+    redis_concurrency_limit: int = int(os.getenv("REDIS_CONCURRENCY_LIMIT", "16"))
+
+    # In-memory event catalog
+    catalog_refresh_seconds: float = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+    catalog_full_reload_seconds: float = float(os.getenv("CATALOG_FULL_RELOAD_SECONDS", "3600"))
+    popularity_reconcile_seconds: float = float(os.getenv("POPULARITY_RECONCILE_SECONDS", "300"))
+    # (user, event) saves remembered so a repeat save does not bump live popularity twice
+    popularity_recent_saves: int = int(os.getenv("POPULARITY_RECENT_SAVES", "100000"))
+
+    # Feedback write-behind: rows are buffered and inserted FEEDBACK_BATCH_SIZE at a time, at
+    # least every FEEDBACK_FLUSH_SECONDS; /v1/feedback answers 503 once FEEDBACK_MAX_PENDING wait
+    feedback_write_behind: bool = os.getenv("FEEDBACK_WRITE_BEHIND", "true").lower() == "true"
+    feedback_batch_size: int = int(os.getenv("FEEDBACK_BATCH_SIZE", "500"))
+    feedback_flush_seconds: float = float(os.getenv("FEEDBACK_FLUSH_SECONDS", "1"))
+    feedback_max_pending: int = int(os.getenv("FEEDBACK_MAX_PENDING", "20000"))
+
     # Model configuration
     model_dir: str = "/app/models"
     model_version: str = "v1.0.0"
     min_training_samples: int = int(os.getenv("MIN_TRAINING_SAMPLES", "10"))
     retrain_threshold_days: int = 7
 
+    # Model artifact: "mmap" writes raw arrays + a JSON manifest that load_model maps read-only,
+    # "joblib" a single pickle; mmap keeps the last MODEL_ARTIFACT_KEEP versions
+    model_artifact_format: str = os.getenv("MODEL_ARTIFACT_FORMAT", "mmap")
+    model_artifact_keep: int = int(os.getenv("MODEL_ARTIFACT_KEEP", "3"))
+
+    # Process role: "standalone" serves and trains in one process; with `python -m src.serve`
+    # a "trainer" process trains and publishes while SERVE_WORKERS "worker" processes only serve
+    service_role: str = os.getenv("SERVICE_ROLE", "standalone")
+    serve_workers: int = int(os.getenv("SERVE_WORKERS", "2"))
+    model_watch_seconds: float = float(os.getenv("MODEL_WATCH_SECONDS", "5"))
+    trainer_poll_seconds: float = float(os.getenv("TRAINER_POLL_SECONDS", "2"))
+
+    # Training extraction: "stream" reads interactions in chunks via a server-side cursor, "frame" loads them at once
+    training_extraction_mode: str = os.getenv("TRAINING_EXTRACTION_MODE", "stream")
+    training_chunk_rows: int = int(os.getenv("TRAINING_CHUNK_ROWS", "50000"))
+    # Repeated (user, event) interactions: "latest" keeps the most recent score,
+    # "decayed_sum" sums scores weighted by 0.5 ** (age / half-life)
+    interaction_aggregation: str = os.getenv("INTERACTION_AGGREGATION", "latest")
+    interaction_half_life_days: float = float(os.getenv("INTERACTION_HALF_LIFE_DAYS", "30"))
+
+    # Collaborative filtering similarity: "topk" keeps K neighbours per user, "dense" the full matrix
+    cf_similarity_mode: str = os.getenv("CF_SIMILARITY_MODE", "topk")
+    cf_neighbours_k: int = int(os.getenv("CF_NEIGHBOURS_K", "10"))
+    cf_similarity_block_rows: int = int(os.getenv("CF_SIMILARITY_BLOCK_ROWS", "1024"))
+    # Top-K blocks run on this many processes (0 = all cores within the container's CPU quota);
+    # fewer rows than CF_SIMILARITY_PARALLEL_MIN_ROWS stay in-process. Blocks shrink to keep
+    # their combined scratch under the memory ceiling (0 = no ceiling)
+    cf_similarity_workers: int = int(os.getenv("CF_SIMILARITY_WORKERS", "1"))
+    cf_similarity_parallel_min_rows: int = int(os.getenv("CF_SIMILARITY_PARALLEL_MIN_ROWS", "20000"))
+    cf_similarity_memory_mb: float = float(os.getenv("CF_SIMILARITY_MEMORY_MB", "512"))
+    # Saves/hides since the published model are overlaid on up to this many users' rows
+    # (0 disables), keeping at most USER_OVERLAY_MAX_EVENTS recent interactions per user
+    user_overlay_max_users: int = int(os.getenv("USER_OVERLAY_MAX_USERS", "10000"))
+    user_overlay_max_events: int = int(os.getenv("USER_OVERLAY_MAX_EVENTS", "200"))
+    # Offline evaluation at retrain: hold out the newest EVAL_HOLDOUT_FRACTION of interactions and
+    # score every variant at EVAL_K; runs on the CF_SIMILARITY_* workers and memory ceiling
+    eval_enabled: bool = os.getenv("EVAL_ENABLED", "true").lower() == "true"
+    eval_holdout_fraction: float = float(os.getenv("EVAL_HOLDOUT_FRACTION", "0.1"))
+    eval_k: int = int(os.getenv("EVAL_K", "10"))
+
     # AWS DynamoDB for A/B testing (on-demand pricing)
     aws_region: str = os.getenv("AWS_REGION", "eu-west-1")
     dynamodb_table_experiments: str = "whatsthecraic-experiments"
@@ -34,12 +101,24 @@ class Settings(BaseSettings):
     # CloudWatch metrics
     cloudwatch_namespace: str = "WhatsTheCraic/ML"
     enable_cloudwatch: bool = os.getenv("ENABLE_CLOUDWATCH", "true").lower() == "true"
+    cloudwatch_queue_size: int = int(os.getenv("CLOUDWATCH_QUEUE_SIZE", "10000"))
+    cloudwatch_flush_seconds: float = float(os.getenv("CLOUDWATCH_FLUSH_SECONDS", "5"))
+
+    # Per-stage timing of recommendation requests, kept as (stage, variant) histograms on /metrics;
+    # a request carrying TRACING_DEBUG_HEADER also gets the breakdown in a Server-Timing header
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    tracing_debug_header: str = os.getenv("TRACING_DEBUG_HEADER", "X-Debug-Timing")
 
     # Recommendation settings
     default_recommendation_count: int = 20
     max_recommendation_count: int = 100
+    max_batch_users: int = int(os.getenv("MAX_BATCH_USERS", "5000"))
     min_similarity_score: float = 0.1
 
+    # Candidate generators (hybrid arm runs CF and content retrieval concurrently)
+    generator_workers: int = int(os.getenv("GENERATOR_WORKERS", "8"))
+    generator_timeout_ms: float = float(os.getenv("GENERATOR_TIMEOUT_MS", "250"))
+
     # A/B testing
     default_experiment_id: str = "rec_algorithm_v1"
     control_variant: str = "control"
@@ -49,7 +128,8 @@ class Settings(BaseSettings):
     redis_host: str = os.getenv("REDIS_HOST", "")
     redis_port: int = int(os.getenv("REDIS_PORT", "6379"))
     redis_enabled: bool = os.getenv("REDIS_ENABLED", "false").lower() == "true"
-    cache_ttl_seconds: int = 3600
+    cache_ttl_seconds: int = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+    result_cache_max_entries: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
 
     class Config:
         env_file = ".env"
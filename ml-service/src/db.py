@@ -0,0 +1,241 @@
+"""
+Bounded MySQL connection pool shared by the recommendation engine
+Avoids a TCP + auth handshake per query on the request path
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import pymysql
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Connections idle for longer than this are pinged before being handed out
+PING_AFTER_IDLE_SECONDS = 30.0
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PoolClosedError(Exception):
+    """Raised when a connection is requested after close_all()"""
+
+
+def connect_mysql():
+    """Open a new MySQL connection using service settings"""
+    return pymysql.connect(
+        host=settings.db_host,
+        port=settings.db_port,
+        user=settings.db_user,
+        password=settings.db_password,
+        database=settings.db_name,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+class PooledConnection:
+    """
+    Connection checked out of a ConnectionPool
+    Behaves like the underlying DB-API connection; close() returns it to the pool
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Return the connection to the pool (idempotent)"""
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def invalidate(self):
+        """Discard the underlying connection instead of returning it to the pool"""
+        if self._released:
+            return
+        self._released = True
+        self._pool._discard(self._raw)
+
+
+class ConnectionPool:
+    """
+    Thread-safe, bounded pool of DB-API connections
+    Idle connections are closed after idle_timeout, recycled after recycle_seconds
+    and pinged before reuse when they have been idle for a while
+    """
+
+    def __init__(
+        self,
+        connect_fn: Optional[Callable[[], Any]] = None,
+        size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        recycle_seconds: Optional[float] = None,
+        checkout_timeout: Optional[float] = None
+    ):
+        self.connect_fn = connect_fn or connect_mysql
+        self.size = max(1, size if size is not None else settings.db_pool_size)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.db_pool_idle_timeout_seconds
+        self.recycle_seconds = recycle_seconds if recycle_seconds is not None else settings.db_pool_recycle_seconds
+        self.checkout_timeout = checkout_timeout if checkout_timeout is not None else settings.db_pool_timeout_seconds
+
+        self._cond = threading.Condition()
+        # Idle entries are (raw_connection, created_at, last_used_at); LIFO keeps hot connections warm
+        self._idle: deque = deque()
+        self._open_count = 0
+        self._closed = False
+
+        # Stats exposed through MetricsCollector
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connections_created = 0
+        self.connections_discarded = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def connection(self) -> PooledConnection:
+        """Check out a healthy connection, waiting up to checkout_timeout for a free slot"""
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+
+        while True:
+            candidate = None
+            open_new = False
+
+            with self._cond:
+                while not self._closed and not self._idle and self._open_count >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"(pool size {self.size})"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._closed:
+                    raise PoolClosedError("Connection pool is closed")
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    self._open_count += 1
+                    open_new = True
+
+            if open_new:
+                try:
+                    raw = self.connect_fn()
+                except Exception:
+                    with self._cond:
+                        self._open_count -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+                with self._cond:
+                    self.connections_created += 1
+                    closed = self._closed
+                if closed:
+                    self._discard(raw)
+                    raise PoolClosedError("Connection pool is closed")
+                return self._checked_out(raw, created_at, start)
+
+            raw, created_at, last_used = candidate
+            if self._is_usable(raw, created_at, last_used):
+                return self._checked_out(raw, created_at, start)
+
+            self._discard(raw)
+
+    def _checked_out(self, raw, created_at: float, start: float) -> PooledConnection:
+        wait_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            if wait_ms > self.max_wait_ms:
+                self.max_wait_ms = wait_ms
+        return PooledConnection(self, raw, created_at)
+
+    def _is_usable(self, raw, created_at: float, last_used: float) -> bool:
+        now = time.monotonic()
+        if self.recycle_seconds and now - created_at > self.recycle_seconds:
+            return False
+        if self.idle_timeout and now - last_used > self.idle_timeout:
+            return False
+        if now - last_used > PING_AFTER_IDLE_SECONDS:
+            try:
+                raw.ping(reconnect=False)
+            except Exception as e:
+                logger.warning(f"Discarding stale database connection: {e}")
+                return False
+        return True
+
+    def _release(self, raw, created_at: float):
+        # End any open transaction so the next borrower gets a fresh snapshot
+        try:
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+
+        with self._cond:
+            if not self._closed:
+                self._idle.append((raw, created_at, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(raw)
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open_count -= 1
+            self.connections_discarded += 1
+            self._cond.notify()
+
+    def close_all(self):
+        """
+        Close every idle connection and refuse further checkouts
+        Checked-out connections are closed instead of pooled when they are released
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            # Wake waiting checkouts so they fail instead of timing out
+            self._cond.notify_all()
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage for metrics"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self.size,
+                'open': self._open_count,
+                'idle': idle,
+                'in_use': self._open_count - idle,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connections_created': self.connections_created,
+                'connections_discarded': self.connections_discarded,
+                'total_wait_ms': self.total_wait_ms,
+                'max_wait_ms': self.max_wait_ms,
+                'avg_wait_ms': self.total_wait_ms / max(self.checkouts, 1)
+            }
@@ -0,0 +1,91 @@
+"""
+Bounded executor for blocking work called from async request handlers
+pymysql, boto3 and model scoring are synchronous; running them here keeps the
+event loop free, and per-dependency limits stop one slow backend from taking
+every worker thread
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from . import tracing
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingExecutor:
+    """Thread pool with a concurrency limit per downstream dependency"""
+
+    def __init__(self, max_workers: Optional[int] = None, limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers or settings.executor_max_workers
+        self.limits = limits or {
+            'db': settings.db_concurrency_limit,
+            'dynamodb': settings.dynamodb_concurrency_limit,
+            'redis': settings.redis_concurrency_limit,
+            'model': settings.model_concurrency_limit,
+            'training': 1
+        }
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='blocking')
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Stats for monitoring
+        self.in_flight: Dict[str, int] = {name: 0 for name in self.limits}
+        self.waiting: Dict[str, int] = {name: 0 for name in self.limits}
+        self.completed: Dict[str, int] = {name: 0 for name in self.limits}
+
+    def _semaphore(self, dependency: str) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; start afresh if the loop changed
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._semaphores = {}
+            self._loop = loop
+
+        semaphore = self._semaphores.get(dependency)
+        if semaphore is None:
+            limit = self.limits.get(dependency, self.max_workers)
+            semaphore = asyncio.Semaphore(max(1, limit))
+            self._semaphores[dependency] = semaphore
+            self.in_flight.setdefault(dependency, 0)
+            self.waiting.setdefault(dependency, 0)
+            self.completed.setdefault(dependency, 0)
+        return semaphore
+
+    async def run(self, dependency: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool once a slot for the dependency is free"""
+        semaphore = self._semaphore(dependency)
+        loop = asyncio.get_running_loop()
+
+        self.waiting[dependency] += 1
+        try:
+            with tracing.span(f'{dependency}_wait'):
+                await semaphore.acquire()
+        finally:
+            self.waiting[dependency] -= 1
+
+        self.in_flight[dependency] += 1
+        try:
+            # Spans opened by fn land in the caller's trace
+            return await loop.run_in_executor(self._pool, tracing.bind(functools.partial(fn, *args, **kwargs)))
+        finally:
+            self.in_flight[dependency] -= 1
+            self.completed[dependency] += 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-dependency in-flight, waiting and completed call counts"""
+        return {
+            name: {
+                'limit': self.limits.get(name, self.max_workers),
+                'in_flight': self.in_flight.get(name, 0),
+                'waiting': self.waiting.get(name, 0),
+                'completed': self.completed.get(name, 0)
+            }
+            for name in sorted(set(self.limits) | set(self._semaphores))
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
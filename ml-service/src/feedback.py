@@ -0,0 +1,144 @@
+"""
+Write-behind buffer for ml_feedback inserts
+/v1/feedback only appends to a bounded in-memory buffer; one flusher thread writes
+the buffer as multi-row INSERTs when a batch fills or the flush interval passes.
+A full buffer rejects new feedback instead of growing, and shutdown flushes what is left.
+"""
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# created_at defaults to the database's time at flush, so rows never land behind an update
+# watermark; only %s placeholders in VALUES let pymysql batch executemany into one statement
+INSERT_FEEDBACK = """
+INSERT INTO ml_feedback (user_id, event_id, action, context)
+VALUES (%s, %s, %s, %s)
+"""
+
+FeedbackRow = Tuple[str, str, str, str]
+
+
+class FeedbackBacklogFull(Exception):
+    """The buffer is at FEEDBACK_MAX_PENDING; the caller should retry later"""
+
+
+def encode_context(context: Optional[Dict[str, Any]]) -> str:
+    """Feedback context as JSON; values JSON cannot represent are stored as strings"""
+    return json.dumps(context or {}, default=str, separators=(',', ':'))
+
+
+class FeedbackWriter:
+    """Bounded feedback buffer flushed to MySQL in batches by a background thread"""
+
+    def __init__(
+        self,
+        db_pool,
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        flush_seconds: Optional[float] = None
+    ):
+        self.db_pool = db_pool
+        self.batch_size = max(1, batch_size or settings.feedback_batch_size)
+        self.max_pending = max(self.batch_size, max_pending or settings.feedback_max_pending)
+        self.flush_seconds = flush_seconds if flush_seconds is not None else settings.feedback_flush_seconds
+
+        self._pending: Deque[FeedbackRow] = deque()
+        self._lock = threading.Lock()
+        # Serialises flushes between the flusher thread and an explicit flush()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Stats for monitoring
+        self.written = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def submit(self, user_id: str, event_id: str, action: str, context: Optional[Dict[str, Any]] = None):
+        """Buffer one feedback row; raises FeedbackBacklogFull when the buffer is full"""
+        row = (str(user_id), str(event_id), action, encode_context(context))
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise FeedbackBacklogFull(f"{len(self._pending)} feedback rows waiting to be written")
+            self._pending.append(row)
+            full_batch = len(self._pending) >= self.batch_size
+        if full_batch:
+            self._wake.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name='feedback-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write everything still buffered"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        if self._pending:
+            logger.error(f"{len(self._pending)} feedback rows could not be written before shutdown")
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered rows in batches; returns how many were written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logger.error(f"Error writing {len(batch)} feedback rows: {e}")
+                    self.failed_flushes += 1
+                    # Back to the front for the next flush; submit() keeps the buffer bounded
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                    return written
+                written += len(batch)
+                self.written += len(batch)
+                self.flushes += 1
+
+    def _write(self, batch):
+        conn = self.db_pool.connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(INSERT_FEEDBACK, batch)
+            conn.commit()
+        except Exception:
+            # The connection may be broken; do not hand it back to the pool
+            conn.invalidate()
+            raise
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': len(self._pending),
+            'max_pending': self.max_pending,
+            'written': self.written,
+            'rejected': self.rejected,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes
+        }
@@ -0,0 +1,223 @@
+"""
+Background model jobs (full retrain, incremental update)
+Jobs run on the executor's single 'training' slot so requests return immediately;
+callers poll the job for its status and result. In multi-process serving the jobs
+are files that the trainer process picks up instead (FileModelJobs).
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import settings
+from .executor import BlockingExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+def jobs_root() -> str:
+    """Where FileModelJobs keeps job status files"""
+    return os.path.join(settings.model_dir, 'jobs')
+
+
+class ModelJob:
+    """Status of one background training run"""
+
+    def __init__(self, kind: str):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.created_at = datetime.utcnow().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ModelJob':
+        job = cls(data['kind'])
+        for key in ('job_id', 'status', 'created_at', 'started_at', 'finished_at', 'result', 'error'):
+            setattr(job, key, data.get(key))
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class ModelJobs:
+    """
+    Single-flight job runner: while a job of a kind is queued or running, submitting
+    that kind again returns the in-flight job instead of starting another
+    """
+
+    def __init__(self, executor: BlockingExecutor, history: int = 20):
+        self.executor = executor
+        self.history = history
+        self._jobs: 'OrderedDict[str, ModelJob]' = OrderedDict()
+        self._active: Dict[str, ModelJob] = {}
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[], Dict[str, Any]],
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> tuple:
+        """Start a job unless one of the same kind is in flight; returns (job, started)"""
+        active = self._active.get(kind)
+        if active is not None and not active.done:
+            return active, False
+
+        job = ModelJob(kind)
+        self._active[kind] = job
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.history:
+            self._jobs.popitem(last=False)
+
+        job.task = asyncio.get_running_loop().create_task(self._run(job, fn, on_success))
+        return job, True
+
+    async def _run(
+        self,
+        job: ModelJob,
+        fn: Callable[[], Dict[str, Any]],
+        on_success: Optional[Callable[[Dict[str, Any]], None]]
+    ):
+        def run():
+            # Marked running only once the training slot is ours
+            job.status = RUNNING
+            job.started_at = datetime.utcnow().isoformat()
+            return fn()
+
+        try:
+            job.result = await self.executor.run('training', run)
+            if on_success is not None:
+                on_success(job.result)
+            job.status = SUCCEEDED
+            logger.info(f"Model job {job.kind} {job.job_id} succeeded")
+        except Exception as e:
+            logger.error(f"Model job {job.kind} {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+
+    async def wait(self, job: ModelJob) -> ModelJob:
+        """Wait for a job without cancelling it if the waiter goes away"""
+        if job.task is not None:
+            await asyncio.shield(job.task)
+        return job
+
+    def get(self, job_id: str) -> Optional[ModelJob]:
+        return self._jobs.get(job_id)
+
+    def recent(self) -> List[ModelJob]:
+        """Most recent jobs first"""
+        return list(reversed(self._jobs.values()))
+
+
+class FileModelJobs:
+    """
+    Jobs shared between serving workers and the trainer process through status files
+    Workers submit by writing a queued job; the trainer runs queued jobs and rewrites
+    their status. Each kind is single-flight: submitting while one is queued or running
+    returns that job, and the trainer folds several queued jobs of one kind into one run.
+    """
+
+    def __init__(self, root: str, history: int = 20):
+        self.root = root
+        self.history = history
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def save(self, job: ModelJob):
+        """Atomically rewrite a job's status file"""
+        tmp = os.path.join(self.root, f".{job.job_id}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(job.to_dict(), f, default=str)
+        os.replace(tmp, self._path(job.job_id))
+
+    def get(self, job_id: str) -> Optional[ModelJob]:
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return ModelJob.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def recent(self) -> List[ModelJob]:
+        """Most recent jobs first"""
+        jobs = []
+        for path in glob.glob(os.path.join(self.root, '*.json')):
+            job = self.get(os.path.basename(path)[:-len('.json')])
+            if job is not None:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def submit(self, kind: str, fn: Optional[Callable] = None, on_success: Optional[Callable] = None) -> tuple:
+        """Queue a job for the trainer; fn and on_success are unused (the trainer owns the work)"""
+        for job in self.recent():
+            if job.kind == kind and not job.done:
+                return job, False
+
+        job = ModelJob(kind)
+        self.save(job)
+        return job, True
+
+    async def wait(self, job: ModelJob, poll_seconds: float = 0.5) -> ModelJob:
+        while not job.done:
+            await asyncio.sleep(poll_seconds)
+            job = self.get(job.job_id) or job
+        return job
+
+    def queued(self) -> Dict[str, List[ModelJob]]:
+        """Queued jobs by kind, oldest first (trainer side)"""
+        by_kind: Dict[str, List[ModelJob]] = {}
+        for job in reversed(self.recent()):
+            if job.status == QUEUED:
+                by_kind.setdefault(job.kind, []).append(job)
+        return by_kind
+
+    def fail_interrupted(self):
+        """Mark jobs left running by a trainer that died as failed (trainer startup)"""
+        for job in self.recent():
+            if job.status == RUNNING:
+                job.status = FAILED
+                job.error = 'Trainer restarted before the job finished'
+                job.finished_at = datetime.utcnow().isoformat()
+                self.save(job)
+
+    def prune(self):
+        """Drop the status files of finished jobs beyond the history limit"""
+        finished = [job for job in self.recent() if job.done]
+        for job in finished[self.history:]:
+            try:
+                os.remove(self._path(job.job_id))
+            except FileNotFoundError:
+                pass
@@ -3,7 +3,7 @@ ML Recommendation Service for WhatsTheCraic
 Cost-effective ML service running on EC2 with scikit-learn
 Features: Collaborative filtering, A/B testing, model monitoring
 """
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -17,6 +17,11 @@ import json
 from .models.recommendation_engine import RecommendationEngine
 from .ab_testing import ABTestManager
 from .monitoring import MetricsCollector
+from .executor import BlockingExecutor
+from .cache import RecommendationCache, make_key
+from .jobs import FileModelJobs, ModelJobs, FAILED, jobs_root
+from .feedback import FeedbackBacklogFull
+from . import tracing
 from .config import settings
 
 # Configure logging
@@ -43,9 +48,27 @@ app.add_middleware(
 )
 
 # Initialize ML components
-recommendation_engine = RecommendationEngine()
-ab_test_manager = ABTestManager()
 metrics_collector = MetricsCollector()
+recommendation_engine = RecommendationEngine(metrics_collector=metrics_collector)
+ab_test_manager = ABTestManager()
+metrics_collector.attach_db_pool(recommendation_engine.db_pool)
+
+# Blocking DB, AWS and model calls run here so they never stall the event loop
+blocking_executor = BlockingExecutor()
+metrics_collector.attach_executor(blocking_executor)
+
+# Recent results per (user, city, variant, limit, context, model); Redis tier is optional
+result_cache = RecommendationCache()
+metrics_collector.attach_result_cache(result_cache)
+metrics_collector.attach_feedback_writer(recommendation_engine.feedback)
+
+# Retrains and incremental updates run in the background, one of each kind at a time;
+# serving workers of `python -m src.serve` hand them to the trainer process instead
+is_worker = settings.service_role == 'worker'
+model_jobs = FileModelJobs(jobs_root()) if is_worker else ModelJobs(blocking_executor)
+
+# Requests timed stage by stage (see tracing.py)
+TRACED_PATHS = {'/v1/recommendations'}
 
 def decode_jwt_payload(token: str) -> Optional[Dict[str, Any]]:
     """Decode JWT payload without signature verification."""
@@ -95,6 +118,27 @@ class RecommendationResponse(BaseModel):
     ab_experiment: Optional[str] = None
     latency_ms: float
 
+class BatchRecommendationItem(BaseModel):
+    user_id: str
+    city: Optional[str] = None
+    limit: Optional[int] = None
+    context: Optional[Dict[str, Any]] = None
+
+class BatchRecommendationRequest(BaseModel):
+    users: List[BatchRecommendationItem]
+    city: Optional[str] = None  # Default for users without their own city
+    limit: int = 20
+
+class BatchRecommendationResult(BaseModel):
+    user_id: str
+    recommendations: List[Dict[str, Any]]
+    ab_experiment: Optional[str] = None
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[BatchRecommendationResult]
+    model_version: str
+    latency_ms: float
+
 class FeedbackRequest(BaseModel):
     user_id: Optional[str] = None
     event_id: str
@@ -114,7 +158,27 @@ class ModelMetrics(BaseModel):
 async def log_requests(request, call_next):
     start_time = time.time()
 
-    response = await call_next(request)
+    # The debug header asks for the stage breakdown back in a Server-Timing header
+    debug_timing = request.headers.get(settings.tracing_debug_header, '').lower() not in ('', '0', 'false')
+    trace = token = None
+    if request.url.path in TRACED_PATHS and (settings.tracing_enabled or debug_timing):
+        trace, token = tracing.start()
+    try:
+        response = await call_next(request)
+    finally:
+        if token is not None:
+            tracing.finish(token)
+
+    if trace is not None:
+        now = time.perf_counter()
+        breakdown = trace.breakdown()
+        if trace.handler_done is not None:
+            breakdown['serialisation'] = (now - trace.handler_done) * 1000
+        breakdown['total'] = (now - trace.started) * 1000
+        if settings.tracing_enabled:
+            metrics_collector.record_trace(trace.variant, breakdown)
+        if debug_timing:
+            response.headers['Server-Timing'] = tracing.server_timing(breakdown)
 
     duration_ms = (time.time() - start_time) * 1000
     metrics_collector.record_request(
@@ -138,9 +202,24 @@ async def startup_event():
     logger.info("Starting ML Recommendation Service...")
 
     try:
-        # Load recommendation model
-        recommendation_engine.load_model()
+        # Load recommendation model; workers never train, they wait for the trainer to publish
+        recommendation_engine.load_model(train_if_missing=not is_worker)
         logger.info(f"Loaded model version: {recommendation_engine.model_version}")
+        if is_worker:
+            recommendation_engine.start_model_watch()
+
+        # Load upcoming events into memory and keep them fresh in the background
+        recommendation_engine.catalog.start_refresh()
+        logger.info("Event catalog initialized")
+
+        # Per-city popularity rankings, reconciled with MySQL in the background
+        recommendation_engine.popularity.start_reconcile()
+        logger.info("Popularity index initialized")
+
+        # Feedback is buffered and inserted in batches off the request path
+        if settings.feedback_write_behind:
+            recommendation_engine.feedback.start()
+            logger.info("Feedback writer started")
 
         # Initialize A/B testing
         ab_test_manager.load_experiments()
@@ -154,6 +233,19 @@ async def startup_event():
         logger.error(f"Error during startup: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work and release pooled database connections on shutdown"""
+    recommendation_engine.stop_model_watch()
+    recommendation_engine.catalog.stop_refresh()
+    recommendation_engine.popularity.stop_reconcile()
+    # Write buffered feedback while the pool is still open
+    recommendation_engine.feedback.stop()
+    recommendation_engine.shutdown()
+    metrics_collector.shutdown()
+    blocking_executor.shutdown()
+    recommendation_engine.db_pool.close_all()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -189,26 +281,49 @@ async def get_recommendations(
 
     try:
         # A/B test assignment
-        experiment = ab_test_manager.assign_experiment(resolved_user_id)
-
-        # Get recommendations based on experiment variant
-        recommendations = recommendation_engine.predict(
-            user_id=resolved_user_id,
-            city=request.city,
-            limit=request.limit,
-            variant=experiment.get('variant', 'control'),
-            context=request.context
-        )
+        with tracing.span('ab_assignment'):
+            experiment = await blocking_executor.run('dynamodb', ab_test_manager.assign_experiment, resolved_user_id)
+        variant = experiment.get('variant', 'control')
+        tracing.set_variant(variant)
+
+        with tracing.span('cache_lookup'):
+            cache_key = make_key(
+                resolved_user_id, request.city, variant, request.limit, request.context,
+                recommendation_engine.cache_fingerprint
+            )
+            recommendations = result_cache.get_local(cache_key)
+            if recommendations is None and result_cache.remote_enabled:
+                recommendations = await blocking_executor.run('redis', result_cache.get_remote, cache_key)
+
+        if recommendations is None:
+            # Get recommendations based on experiment variant
+            with tracing.span('predict'):
+                recommendations, degraded = await blocking_executor.run(
+                    'model',
+                    recommendation_engine.predict_with_status,
+                    user_id=resolved_user_id,
+                    city=request.city,
+                    limit=request.limit,
+                    variant=variant,
+                    context=request.context
+                )
+            # A dropped generator or the fallback is a one-off; caching it would serve it for the whole TTL
+            if not degraded:
+                with tracing.span('cache_store'):
+                    result_cache.set(cache_key, recommendations)
+                    if result_cache.remote_enabled:
+                        await blocking_executor.run('redis', result_cache.store_remote, [(cache_key, recommendations)])
 
         # Record prediction
         latency_ms = (time.time() - start_time) * 1000
         metrics_collector.record_prediction(
             user_id=resolved_user_id,
-            variant=experiment.get('variant', 'control'),
+            variant=variant,
             latency_ms=latency_ms,
             num_recommendations=len(recommendations)
         )
 
+        tracing.handler_done()
         return RecommendationResponse(
             user_id=resolved_user_id,
             recommendations=recommendations,
@@ -222,6 +337,94 @@ async def get_recommendations(
         metrics_collector.record_error('recommendation_error')
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/v1/recommendations/batch", response_model=BatchRecommendationResponse)
+async def get_batch_recommendations(request: BatchRecommendationRequest):
+    """
+    Get recommendations for many users in one call (digest emails, homepage pre-warming)
+    Each user keeps their own A/B assignment and context boosting
+    """
+    start_time = time.time()
+
+    if len(request.users) > settings.max_batch_users:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.max_batch_users} users per batch"
+        )
+
+    try:
+        # A/B test assignment for every user
+        assignments = await blocking_executor.run(
+            'dynamodb', ab_test_manager.assign_experiments, [item.user_id for item in request.users]
+        )
+
+        batch = []
+        for item in request.users:
+            experiment = assignments.get(item.user_id, {})
+            batch.append({
+                'user_id': item.user_id,
+                'city': item.city if item.city is not None else request.city,
+                'limit': item.limit if item.limit is not None else request.limit,
+                'variant': experiment.get('variant', 'control'),
+                'context': item.context
+            })
+
+        # Serve what we can from the cache and only score the misses
+        fingerprint = recommendation_engine.cache_fingerprint
+        keys = [
+            make_key(entry['user_id'], entry['city'], entry['variant'], entry['limit'], entry['context'], fingerprint)
+            for entry in batch
+        ]
+        recommendations = [result_cache.get_local(key) for key in keys]
+
+        missing = [i for i, recs in enumerate(recommendations) if recs is None]
+        if missing and result_cache.remote_enabled:
+            remote = await blocking_executor.run('redis', result_cache.get_remote_many, [keys[i] for i in missing])
+            for i, recs in zip(missing, remote):
+                recommendations[i] = recs
+            missing = [i for i in missing if recommendations[i] is None]
+
+        if missing:
+            scored, degraded = await blocking_executor.run(
+                'model', recommendation_engine.predict_batch_with_status, [batch[i] for i in missing]
+            )
+            for i, recs in zip(missing, scored):
+                recommendations[i] = recs
+                if not degraded:
+                    result_cache.set(keys[i], recs)
+            if result_cache.remote_enabled and not degraded:
+                await blocking_executor.run(
+                    'redis', result_cache.store_remote, [(keys[i], recommendations[i]) for i in missing]
+                )
+
+        # Record predictions
+        latency_ms = (time.time() - start_time) * 1000
+        variant_counts: Dict[str, int] = {}
+        for entry in batch:
+            variant_counts[entry['variant']] = variant_counts.get(entry['variant'], 0) + 1
+        metrics_collector.record_batch_prediction(
+            num_users=len(batch),
+            variant_counts=variant_counts,
+            latency_ms=latency_ms
+        )
+
+        return BatchRecommendationResponse(
+            results=[
+                BatchRecommendationResult(
+                    user_id=entry['user_id'],
+                    recommendations=recs,
+                    ab_experiment=assignments.get(entry['user_id'], {}).get('experiment_id')
+                )
+                for entry, recs in zip(batch, recommendations)
+            ],
+            model_version=recommendation_engine.model_version,
+            latency_ms=latency_ms
+        )
+
+    except Exception as e:
+        logger.error(f"Error getting batch recommendations: {e}")
+        metrics_collector.record_error('batch_recommendation_error')
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/v1/feedback")
 async def record_feedback(
     request: FeedbackRequest,
@@ -237,21 +440,44 @@ async def record_feedback(
         if not resolved_user_id:
             raise HTTPException(status_code=400, detail="user_id is required")
 
-        recommendation_engine.record_feedback(
-            user_id=resolved_user_id,
-            event_id=request.event_id,
-            action=request.action,
-            context=request.context
-        )
+        if settings.feedback_write_behind:
+            recommendation_engine.feedback.submit(
+                resolved_user_id, request.event_id, request.action, request.context
+            )
+        else:
+            await blocking_executor.run(
+                'db',
+                recommendation_engine.record_feedback,
+                user_id=resolved_user_id,
+                event_id=request.event_id,
+                action=request.action,
+                context=request.context
+            )
+
+        # Saves move the event up its city's popularity ranking straight away; a repeat save
+        # adds no user_saved_events row, so it must not add to the count either
+        if request.action == 'save' and recommendation_engine.is_new_save(resolved_user_id, request.event_id):
+            recommendation_engine.popularity.record_save(request.event_id, resolved_user_id)
+
+        # Saves and hides reach this user's CF neighbours before the next retrain
+        recommendation_engine.apply_feedback(resolved_user_id, request.event_id, request.action)
 
         # Track A/B test conversion
         if request.action in ['save', 'click']:
-            ab_test_manager.record_conversion(
+            await blocking_executor.run(
+                'dynamodb',
+                ab_test_manager.record_conversion,
                 user_id=resolved_user_id,
                 event_id=request.event_id,
                 action=request.action
             )
 
+        # Feedback changes what this user should see next
+        if result_cache.remote_enabled:
+            await blocking_executor.run('redis', result_cache.invalidate_user, resolved_user_id)
+        else:
+            result_cache.invalidate_user(resolved_user_id)
+
         metrics_collector.record_feedback(request.action)
 
         return {
@@ -259,6 +485,16 @@ async def record_feedback(
             "message": "Feedback recorded"
         }
 
+    except HTTPException:
+        raise
+    except FeedbackBacklogFull as e:
+        logger.warning(f"Feedback rejected, write buffer full: {e}")
+        metrics_collector.record_error('feedback_backlog_full')
+        raise HTTPException(
+            status_code=503,
+            detail="Feedback backlog full, retry later",
+            headers={"Retry-After": str(max(1, int(settings.feedback_flush_seconds)))}
+        )
     except Exception as e:
         logger.error(f"Error recording feedback: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -267,7 +503,7 @@ async def record_feedback(
 async def get_model_info():
     """Get current model metrics and performance"""
     try:
-        metrics = recommendation_engine.get_model_metrics()
+        metrics = await blocking_executor.run('model', recommendation_engine.get_model_metrics)
         request_metrics = metrics_collector.get_summary()
 
         return ModelMetrics(
@@ -283,32 +519,59 @@ async def get_model_info():
         logger.error(f"Error getting model info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_model_job(kind: str, fn, wait: bool, response: Response) -> Dict[str, Any]:
+    """Start (or join) a background model job; optionally wait for it to finish"""
+    job, started = model_jobs.submit(kind, fn, on_success=lambda _result: result_cache.clear_local())
+
+    if not wait:
+        response.status_code = 202
+        return {
+            "status": "accepted" if started else "running",
+            "job": job.to_dict(),
+            "status_url": f"/v1/model/jobs/{job.job_id}"
+        }
+
+    # Waiting only parks this request; the training itself runs on the executor
+    job = await model_jobs.wait(job)
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+
+    return {
+        "status": "success",
+        "job_id": job.job_id,
+        "model_version": recommendation_engine.model_version,
+        "metrics": job.result
+    }
+
 @app.post("/v1/model/retrain")
-async def trigger_retrain():
+async def trigger_retrain(response: Response, wait: bool = False):
     """
-    Trigger model retraining
-    Usually called by scheduled cron job
+    Trigger model retraining in the background
+    Usually called by scheduled cron job; poll the returned job or pass wait=true
     """
-    try:
-        logger.info("Starting model retraining...")
+    logger.info("Starting model retraining...")
+    return await run_model_job('retrain', recommendation_engine.retrain_model, wait, response)
 
-        # Train new model
-        metrics = recommendation_engine.retrain_model()
-
-        # Reload model
-        recommendation_engine.load_model()
+@app.post("/v1/model/update")
+async def trigger_update(response: Response, wait: bool = False):
+    """
+    Fold saves and hides since the last training into the current model
+    Cheap enough to run every few minutes; falls back to a full retrain when one is due
+    """
+    return await run_model_job('update', recommendation_engine.update_model, wait, response)
 
-        logger.info(f"Model retrained successfully. New version: {recommendation_engine.model_version}")
+@app.get("/v1/model/jobs")
+async def list_model_jobs():
+    """Recent retrain and update jobs, newest first"""
+    return {"jobs": [job.to_dict() for job in model_jobs.recent()]}
 
-        return {
-            "status": "success",
-            "model_version": recommendation_engine.model_version,
-            "metrics": metrics
-        }
-
-    except Exception as e:
-        logger.error(f"Error retraining model: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/v1/model/jobs/{job_id}")
+async def get_model_job(job_id: str):
+    """Status and result of one retrain or update job"""
+    job = model_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 @app.get("/v1/experiments")
 async def list_experiments():
@@ -327,7 +590,7 @@ async def list_experiments():
 async def get_experiment_results(experiment_id: str):
     """Get A/B test results for an experiment"""
     try:
-        results = ab_test_manager.get_experiment_results(experiment_id)
+        results = await blocking_executor.run('dynamodb', ab_test_manager.get_experiment_results, experiment_id)
         return results
     except Exception as e:
         logger.error(f"Error getting experiment results: {e}")
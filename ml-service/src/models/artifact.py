@@ -0,0 +1,209 @@
+"""
+Memory-mapped model artifacts
+Each array is written raw to its own file and described in a small JSON manifest.
+Loading maps the files read-only instead of unpickling, so load time does not grow
+with the model and every worker process shares the same pages through the OS page cache.
+
+Layout under <root>:
+    CURRENT                      name of the published version directory
+    <stamp>-<version>/manifest.json
+    <stamp>-<version>/<array>.bin
+"""
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .content_model import ContentModel
+from .ids import IdIndex, id_array
+from .snapshot import ModelSnapshot
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+
+
+def current_version(root: str) -> Optional[str]:
+    """Name of the published version directory, or None when nothing is published"""
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_artifact(root: str, snapshot: ModelSnapshot, keep: int = 3) -> str:
+    """
+    Write a snapshot as a new version directory and point CURRENT at it
+    The directory is renamed into place and CURRENT replaced atomically, so readers
+    see either the old version or the complete new one
+    """
+    model = snapshot.model
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    name = f"{stamp}-{snapshot.version}"
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".staging-{name}")
+    os.makedirs(staging)
+
+    arrays: Dict[str, Dict[str, Any]] = {}
+
+    def put(key: str, values: np.ndarray):
+        values = np.ascontiguousarray(values)
+        values.tofile(os.path.join(staging, f"{key}.bin"))
+        arrays[key] = {'dtype': values.dtype.str, 'shape': list(values.shape)}
+
+    def put_csr(prefix: str, matrix: csr_matrix):
+        matrix = matrix.tocsr()
+        put(f"{prefix}.data", matrix.data)
+        put(f"{prefix}.indices", matrix.indices)
+        put(f"{prefix}.indptr", matrix.indptr)
+        return list(matrix.shape)
+
+    def put_ids(prefix: str, ids: Any):
+        ids = id_array(ids)
+        index = IdIndex.from_ids(ids)
+        put(f"{prefix}.ids", ids)
+        put(f"{prefix}.sorted", index.sorted_ids)
+        put(f"{prefix}.order", index.order)
+
+    shapes = {'interaction_matrix': put_csr('interaction_matrix', model['interaction_matrix'])}
+    put_ids('users', model['user_ids'])
+    put_ids('events', model['event_ids'])
+
+    if 'neighbour_idx' in model:
+        put('neighbour_idx', model['neighbour_idx'])
+        put('neighbour_scores', model['neighbour_scores'])
+    else:
+        shapes['user_similarity'] = put_csr('user_similarity', model['user_similarity'])
+
+    content = model.get('content')
+    content_manifest = None
+    if content is not None:
+        shapes['content.profiles'] = put_csr('content.profiles', content.profiles)
+        put_ids('content.users', content.user_ids)
+        vocabulary = [None] * len(content.vocabulary)
+        for token, col in content.vocabulary.items():
+            vocabulary[col] = token
+        content_manifest = {'vocabulary': vocabulary, 'artists': list(content.artists)}
+
+    watermark = model.get('watermark')
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': snapshot.version,
+        'last_trained': snapshot.last_trained,
+        'last_updated': snapshot.last_updated,
+        'validation_metrics': snapshot.validation_metrics,
+        'similarity_mode': model.get('similarity_mode'),
+        'watermark': watermark.isoformat() if isinstance(watermark, datetime) else watermark,
+        'shapes': shapes,
+        'content': content_manifest,
+        'arrays': arrays
+    }
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, default=str)
+
+    os.rename(staging, os.path.join(root, name))
+    pointer = os.path.join(root, f".{CURRENT}.tmp")
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(root, CURRENT))
+
+    _prune(root, keep, name)
+    logger.info(f"Model artifact published: {name}")
+    return name
+
+
+def _prune(root: str, keep: int, current: str):
+    """Drop old versions; processes still mapping them keep their pages until they reload"""
+    versions = sorted(d for d in os.listdir(root) if not d.startswith('.') and d != CURRENT)
+    for name in versions[:-max(1, keep)]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def load_artifact(root: str, name: Optional[str] = None) -> Optional[ModelSnapshot]:
+    """Map a version (default: CURRENT) read-only; None when nothing is published"""
+    name = name or current_version(root)
+    if name is None:
+        return None
+
+    path = os.path.join(root, name)
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format {manifest.get('format_version')} in {name}")
+
+    specs = manifest['arrays']
+    shapes = manifest['shapes']
+
+    def get(key: str) -> np.ndarray:
+        spec = specs[key]
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        if int(np.prod(shape)) == 0:
+            # Empty files cannot be mapped
+            return np.empty(shape, dtype=dtype)
+        # Plain ndarray view of the mapping: same pages, without np.memmap's per-operation overhead
+        return np.asarray(np.memmap(os.path.join(path, f"{key}.bin"), dtype=dtype, mode='r', shape=shape))
+
+    def get_csr(prefix: str) -> csr_matrix:
+        return csr_matrix(
+            (get(f"{prefix}.data"), get(f"{prefix}.indices"), get(f"{prefix}.indptr")),
+            shape=tuple(shapes[prefix]),
+            copy=False
+        )
+
+    def get_ids(prefix: str) -> tuple:
+        return get(f"{prefix}.ids"), IdIndex(get(f"{prefix}.sorted"), get(f"{prefix}.order"))
+
+    user_ids, user_idx = get_ids('users')
+    event_ids, event_idx = get_ids('events')
+    model: Dict[str, Any] = {
+        'similarity_mode': manifest.get('similarity_mode'),
+        'interaction_matrix': get_csr('interaction_matrix'),
+        'user_idx': user_idx,
+        'event_idx': event_idx,
+        'user_ids': user_ids,
+        'event_ids': event_ids,
+        'watermark': _parse_timestamp(manifest.get('watermark')),
+        'content': None
+    }
+    if 'neighbour_idx' in specs:
+        model['neighbour_idx'] = get('neighbour_idx')
+        model['neighbour_scores'] = get('neighbour_scores')
+    else:
+        model['user_similarity'] = get_csr('user_similarity')
+
+    content = manifest.get('content')
+    if content is not None:
+        content_user_ids, content_user_idx = get_ids('content.users')
+        model['content'] = ContentModel(
+            {token: col for col, token in enumerate(content['vocabulary'])},
+            content['artists'],
+            content_user_ids,
+            get_csr('content.profiles'),
+            user_idx=content_user_idx
+        )
+
+    return ModelSnapshot(
+        model,
+        manifest['version'],
+        manifest.get('last_trained'),
+        manifest.get('last_updated'),
+        manifest.get('validation_metrics')
+    )
+
+
+def _parse_timestamp(value: Optional[str]) -> Any:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return value
@@ -0,0 +1,53 @@
+"""
+Servable CF candidates per city
+Maps every model event column to its row in the catalog snapshot and a city code,
+so collaborative filtering can drop events a request cannot show (not upcoming,
+or in another city) before picking its top K rather than after. Built for one
+(model, catalog snapshot) pair and replaced when either changes.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..catalog import CatalogColumns, normalize_city
+from .ids import IdIndex
+
+
+class CandidateMask:
+    """Catalog row and city code per model event column; -1 where the event is not in the catalog"""
+
+    def __init__(self, event_index: IdIndex, event_ids: np.ndarray, cols: CatalogColumns):
+        self.event_ids = event_ids
+        self.cols = cols
+
+        n_events = len(event_ids)
+        columns = event_index.lookup(cols.event_id)
+        found = np.flatnonzero((columns >= 0) & (columns < n_events))
+
+        city_keys, city_code = np.unique(cols.city_key.astype(str), return_inverse=True)
+        self.city_codes: Dict[str, int] = {key: code for code, key in enumerate(city_keys.tolist())}
+
+        self.catalog_position = np.full(n_events, -1, dtype=np.int64)
+        self.catalog_position[columns[found]] = found
+        self.city_code = np.full(n_events, -1, dtype=np.int32)
+        self.city_code[columns[found]] = city_code[found]
+
+    def matches(self, model: Dict[str, Any], cols: Optional[CatalogColumns]) -> bool:
+        return self.event_ids is model['event_ids'] and self.cols is cols
+
+    def keep(self, candidates: np.ndarray, city: Optional[str], now: np.datetime64) -> np.ndarray:
+        """Which candidate columns are upcoming catalog events in the city (any city when None)"""
+        keep = self.catalog_position[candidates] >= 0
+        if city:
+            code = self.city_codes.get(normalize_city(city))
+            if code is None:
+                return np.zeros(len(candidates), dtype=bool)
+            keep &= self.city_code[candidates] == code
+        # Events that started since the catalog snapshot was taken are still in it
+        kept = np.flatnonzero(keep)
+        keep[kept] = self.cols.start_time[self.catalog_position[candidates[kept]]] >= now
+        return keep
+
+    def positions(self, columns: np.ndarray) -> np.ndarray:
+        """Catalog rows of model event columns that keep() accepted"""
+        return self.catalog_position[columns]
@@ -0,0 +1,185 @@
+"""
+Content-based model over genre and artist tokens
+Events are sparse token vectors; users are profiles built from their stated
+preferences plus the events they saved (and, negatively, hid)
+"""
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from ..tokens import normalize_token, split_tokens
+from .ids import IdIndex
+from .neighbours import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+GENRE_PREFIX = 'genre:'
+ARTIST_PREFIX = 'artist:'
+
+# Weight of each stated preference relative to one saved event
+PREFERENCE_WEIGHT = 1.0
+
+
+class ContentModel:
+    """
+    Token vocabulary, artist matcher and L2-normalised user profiles
+    Event vectors are built on demand for whatever catalog snapshot is being scored
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        artists: List[str],
+        user_ids: Sequence[Any],
+        profiles: csr_matrix,
+        user_idx: Optional[IdIndex] = None
+    ):
+        self.vocabulary = vocabulary
+        self.artists = artists
+        self.user_ids = user_ids
+        self.user_idx = user_idx if user_idx is not None else IdIndex.from_ids(user_ids)
+        self.profiles = profiles
+        self._artist_pattern = self._compile_artists(artists)
+
+    @staticmethod
+    def _compile_artists(artists: List[str]):
+        if not artists:
+            return None
+        # Longest names first so "the xx" wins over "xx"
+        alternatives = '|'.join(re.escape(name) for name in sorted(artists, key=len, reverse=True))
+        return re.compile(rf'(?<!\w)(?:{alternatives})(?!\w)')
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_artist_pattern'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._artist_pattern = self._compile_artists(self.artists)
+
+    @property
+    def num_users(self) -> int:
+        return len(self.user_ids)
+
+    def event_tokens(self, genre: Any, title: Any) -> List[str]:
+        """Genre tokens, the title as an artist token, and any known artist named in the title"""
+        tokens = [GENRE_PREFIX + token for token in split_tokens(genre)]
+        title_text = normalize_token(title)
+        if title_text:
+            tokens.append(ARTIST_PREFIX + title_text)
+            if self._artist_pattern is not None:
+                tokens.extend(ARTIST_PREFIX + match for match in self._artist_pattern.findall(title_text))
+        return tokens
+
+    def event_matrix(self, genres: Sequence[Any], titles: Sequence[Any]) -> csr_matrix:
+        """(n_events x vocabulary) binary token matrix with L2-normalised rows"""
+        return self._token_matrix(self.event_tokens(genre, title) for genre, title in zip(genres, titles))
+
+    def _token_matrix(self, token_lists: Iterable[List[str]]) -> csr_matrix:
+        rows: List[int] = []
+        cols: List[int] = []
+        n_rows = 0
+        for row, tokens in enumerate(token_lists):
+            n_rows = row + 1
+            for col in {self.vocabulary.get(token) for token in tokens}:
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+
+        matrix = csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(n_rows, len(self.vocabulary))
+        )
+        return normalize_rows(matrix)
+
+    def user_row(self, user_id: Any) -> Optional[int]:
+        """Profile row for a user; API user ids arrive as strings, database ids are ints"""
+        row = self.user_idx.get(user_id)
+        if row is None and isinstance(user_id, str) and user_id.isdigit():
+            row = self.user_idx.get(int(user_id))
+        return row
+
+    @classmethod
+    def train(
+        cls,
+        events: pd.DataFrame,
+        interactions: pd.DataFrame,
+        preferences: pd.DataFrame
+    ) -> 'ContentModel':
+        """
+        Build the vocabulary and user profiles
+        events: event_id, title, genre; interactions: user_id, event_id, interaction_score;
+        preferences: user_id, preferred_genres, preferred_artists
+        """
+        events = events.drop_duplicates('event_id')
+        pref_genres = {
+            row.user_id: split_tokens(row.preferred_genres) for row in preferences.itertuples(index=False)
+        }
+        pref_artists = {
+            row.user_id: split_tokens(row.preferred_artists) for row in preferences.itertuples(index=False)
+        }
+        artists = sorted({name for names in pref_artists.values() for name in names})
+
+        # Tokenise events with a vocabulary-free model first, then fix the vocabulary
+        tokenizer = cls({}, artists, [], csr_matrix((0, 0)))
+        event_tokens = {
+            row.event_id: tokenizer.event_tokens(row.genre, row.title) for row in events.itertuples(index=False)
+        }
+
+        vocabulary: Dict[str, int] = {}
+
+        def add(tokens: Iterable[str]):
+            for token in tokens:
+                if token not in vocabulary:
+                    vocabulary[token] = len(vocabulary)
+
+        for tokens in event_tokens.values():
+            add(tokens)
+        for user_id in pref_genres:
+            add(GENRE_PREFIX + token for token in pref_genres[user_id])
+            add(ARTIST_PREFIX + token for token in pref_artists[user_id])
+
+        model = cls(vocabulary, artists, [], csr_matrix((0, len(vocabulary))))
+        event_ids = list(event_tokens)
+        event_row = {eid: row for row, eid in enumerate(event_ids)}
+        event_vectors = model._token_matrix(event_tokens[eid] for eid in event_ids)
+
+        user_ids = list(dict.fromkeys(list(interactions['user_id']) + list(pref_genres)))
+        user_idx = {uid: idx for idx, uid in enumerate(user_ids)}
+
+        # History: each interaction adds its score times the event's vector
+        known = interactions[interactions['event_id'].isin(event_row)]
+        history = csr_matrix(
+            (
+                known['interaction_score'].astype(np.float64).values,
+                ([user_idx[uid] for uid in known['user_id']], [event_row[eid] for eid in known['event_id']])
+            ),
+            shape=(len(user_ids), len(event_ids))
+        ) @ event_vectors
+
+        # Stated preferences
+        rows: List[int] = []
+        cols: List[int] = []
+        for user_id in pref_genres:
+            tokens = [GENRE_PREFIX + t for t in pref_genres[user_id]] + [ARTIST_PREFIX + t for t in pref_artists[user_id]]
+            for col in {vocabulary[token] for token in tokens}:
+                rows.append(user_idx[user_id])
+                cols.append(col)
+        stated = csr_matrix(
+            (np.full(len(rows), PREFERENCE_WEIGHT), (rows, cols)),
+            shape=(len(user_ids), len(vocabulary))
+        )
+
+        profiles = normalize_rows(csr_matrix(history + stated))
+        profiles.eliminate_zeros()
+
+        logger.info(
+            f"Content model trained: {len(user_ids)} profiles, {len(vocabulary)} tokens, "
+            f"{len(artists)} preferred artists"
+        )
+        return cls(vocabulary, artists, user_ids, profiles.tocsr())
@@ -0,0 +1,354 @@
+"""
+Offline ranking evaluation run at retrain time
+The newest interactions are held out by time, every variant is refit on the older
+ones, and each ranks the whole event set for every user with held-out saves.
+Users are scored in row blocks sized to a memory ceiling and spread over a process
+pool like the neighbour search; each block finds its users' held-out-free neighbours,
+ranks every variant and sums the metrics with vectorised numpy.
+
+Offline stand-ins for serving behaviour: candidates are all events in the model
+(not just upcoming ones in a city), events the user interacted with before the
+cutoff are excluded, and users without CF history or a content profile are ranked
+by popularity.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .content_model import ContentModel
+from .interactions import MISSING_TIMESTAMP
+from .neighbours import (
+    BLOCK_BYTES_PER_CELL, block_rows_for_memory, normalize_rows, resolve_workers, top_k_rows
+)
+
+logger = logging.getLogger(__name__)
+
+# Serving names: "control" is the popularity arm
+VARIANTS = ('control', 'collaborative_filtering', 'content_based', 'hybrid')
+
+# Hybrid weights, as in RecommendationEngine._merge_hybrid
+HYBRID_CF_WEIGHT = 0.6
+HYBRID_CONTENT_WEIGHT = 0.4
+
+# Scratch bytes per (user, event) cell when a block's scores are ranked densely: the
+# scores, argpartition output and tie mask; sparse blocks stay below this
+EVAL_BYTES_PER_CELL = 40
+
+# Score blocks denser than this are ranked as dense arrays, sparser ones entry by entry
+DENSE_SCORE_FRACTION = 0.1
+
+# Per-process state for pool workers, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def time_split(
+    matrix: csr_matrix,
+    pair_times: np.ndarray,
+    holdout_fraction: float
+) -> Optional[Tuple[csr_matrix, csr_matrix, int]]:
+    """
+    Split interactions at the time that leaves holdout_fraction of dated ones after it
+    Returns (train, relevant, cutoff): train has everything before the cutoff, relevant the
+    held-out saves; None when there are no dated interactions to split on
+    """
+    dated = pair_times != MISSING_TIMESTAMP
+    if not dated.any() or holdout_fraction <= 0:
+        return None
+    cutoff = int(np.quantile(pair_times[dated], 1.0 - holdout_fraction))
+    held_out = dated & (pair_times >= cutoff)
+
+    coo = matrix.tocoo()
+    keep = ~held_out
+    train = csr_matrix((coo.data[keep], (coo.row[keep], coo.col[keep])), shape=matrix.shape)
+    positive = held_out & (coo.data > 0)
+    relevant = csr_matrix(
+        (np.ones(int(positive.sum()), dtype=np.float32), (coo.row[positive], coo.col[positive])), shape=matrix.shape
+    )
+    return train, relevant, cutoff
+
+
+def neighbour_weights(neighbour_idx: np.ndarray, neighbour_scores: np.ndarray, n_users: int) -> csr_matrix:
+    """(rows x n_users) sparse matrix of each row's neighbour similarities"""
+    n_rows, k = neighbour_idx.shape
+    valid = neighbour_idx >= 0
+    rows = np.repeat(np.arange(n_rows), k).reshape(n_rows, k)[valid]
+    return csr_matrix(
+        (neighbour_scores[valid].astype(np.float64), (rows, neighbour_idx[valid])), shape=(n_rows, n_users)
+    )
+
+
+def content_matrices(
+    content: ContentModel,
+    user_ids: Sequence[Any],
+    event_ids: Sequence[Any],
+    events: Dict[Any, Tuple[Any, Any]]
+) -> Tuple[csr_matrix, csr_matrix]:
+    """
+    (users x vocabulary) profiles and (vocabulary x events) tokens in the matrix's row/column order
+    events maps event_id -> (genre, title); users without a profile and unknown events stay empty
+    """
+    profile_rows = np.array([
+        -1 if content.user_row(user_id) is None else content.user_row(user_id) for user_id in user_ids
+    ], dtype=np.int64)
+    has_profile = profile_rows >= 0
+    selector = csr_matrix(
+        (np.ones(int(has_profile.sum())), (np.flatnonzero(has_profile), profile_rows[has_profile])),
+        shape=(len(user_ids), content.num_users)
+    )
+    profiles = (selector @ content.profiles).tocsr()
+
+    details = [events.get(event_id, (None, None)) for event_id in event_ids]
+    event_tokens = content.event_matrix([genre for genre, _ in details], [title for _, title in details])
+    return profiles, event_tokens.T.tocsr()
+
+
+def _init_worker(state: Dict[str, Any]):
+    _worker.clear()
+    _worker.update(state)
+
+
+def _worker_block(bounds: Tuple[int, int]) -> Dict[str, Any]:
+    return evaluate_block(_worker, *bounds)
+
+
+def _pair_keys(rows: np.ndarray, cols: np.ndarray, n_events: int) -> np.ndarray:
+    return rows.astype(np.int64) * n_events + cols
+
+
+def _top_k(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, ...]:
+    """
+    Best k entries of each row of a sparse score block as (rows, cols, scores, ranks)
+    Ties go to the lowest column, as in RecommendationEngine._top_k
+    """
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    positions = np.arange(len(rows))
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+    ranks = positions - np.maximum.accumulate(np.where(first, positions, 0))
+    keep = ranks < k
+    return rows[keep], cols[keep], scores[keep], ranks[keep]
+
+
+def _top_k_dense(scores: np.ndarray, k: int) -> Tuple[np.ndarray, ...]:
+    """_top_k for a dense score block; only positive scores are kept"""
+    n_rows, n_events = scores.shape
+    kk = min(k, n_events)
+    top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+
+    # argpartition picks arbitrarily among ties at the kth score; redo the rows where that
+    # choice matters, filling up to kk with their lowest-column ties
+    kth = top_scores.min(axis=1, keepdims=True)
+    ties = scores == kth
+    ambiguous = np.flatnonzero((kth[:, 0] > 0) & (ties.sum(axis=1) > (top_scores == kth).sum(axis=1)))
+    if len(ambiguous):
+        ties = ties[ambiguous]
+        above = scores[ambiguous] > kth[ambiguous]
+        room = kk - above.sum(axis=1, keepdims=True)
+        selected = above | (ties & (np.cumsum(ties, axis=1) <= room))
+        top[ambiguous] = np.nonzero(selected)[1].reshape(len(ambiguous), kk)
+        top_scores[ambiguous] = np.take_along_axis(scores[ambiguous], top[ambiguous], axis=1)
+
+    # Best first, lowest column first among equal scores
+    order = np.argsort(top, axis=1)
+    top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    keep = top_scores > 0
+    rows = np.broadcast_to(np.arange(n_rows)[:, None], top.shape)
+    ranks = np.broadcast_to(np.arange(kk), top.shape)
+    return rows[keep], top[keep], top_scores[keep], ranks[keep]
+
+
+def _ranked(block: csr_matrix, seen: csr_matrix, seen_keys: np.ndarray, k: int) -> Tuple[np.ndarray, ...]:
+    """Top k positive scores per row of a score block, leaving out events the user has interacted with"""
+    n_rows, n_events = block.shape
+    if block.nnz > DENSE_SCORE_FRACTION * n_rows * n_events:
+        scores = block.toarray()
+        coo = seen.tocoo()
+        scores[coo.row, coo.col] = 0.0
+        return _top_k_dense(scores, k)
+
+    block = block.tocoo()
+    rows, cols, scores = block.row, block.col, block.data
+    keep = (scores > 0) & ~np.isin(_pair_keys(rows, cols, n_events), seen_keys)
+    return _top_k(rows[keep], cols[keep], scores[keep], k)
+
+
+def _popular_top_k(state: Dict[str, Any], seen: csr_matrix, seen_keys: np.ndarray, k: int) -> Tuple[np.ndarray, ...]:
+    """Each row's k most popular events it has not interacted with, from one global ranking"""
+    n_rows, n_events = seen.shape
+    # A user can skip at most as many popular events as they have interacted with
+    head = state['popular_order'][:k + int(seen.getnnz(axis=1).max(initial=0))]
+    rows = np.repeat(np.arange(n_rows), len(head))
+    cols = np.tile(head, n_rows)
+    valid = ~np.isin(_pair_keys(rows, cols, n_events), seen_keys).reshape(n_rows, len(head))
+    ranks = np.cumsum(valid, axis=1) - 1
+    keep = (valid & (ranks < k)).ravel()
+    return rows[keep], cols[keep], state['popularity'][cols[keep]], ranks.ravel()[keep]
+
+
+def _with_fallback(
+    ranked: Tuple[np.ndarray, ...],
+    popular: Tuple[np.ndarray, ...],
+    fallback_rows: np.ndarray
+) -> Tuple[np.ndarray, ...]:
+    """Swap in the popularity list for rows flagged in fallback_rows"""
+    keep = ~fallback_rows[ranked[0]]
+    take = fallback_rows[popular[0]]
+    return tuple(np.concatenate([mine[keep], theirs[take]]) for mine, theirs in zip(ranked, popular))
+
+
+def evaluate_block(state: Dict[str, Any], start: int, stop: int) -> Dict[str, Any]:
+    """
+    Metric sums for evaluation users [start, stop) of every variant
+    Sparse score blocks are ranked entry by entry, dense ones with argpartition
+    Returns {variant: (precision, recall, ndcg sums, recommended event columns)}
+    """
+    users = state['users'][start:stop]
+    train, k = state['train'], state['k']
+    n_events = train.shape[1]
+
+    seen = train[users]
+    coo = seen.tocoo()
+    seen_keys = _pair_keys(coo.row, coo.col, n_events)
+    relevant = state['relevant'][users]
+    n_relevant = relevant.getnnz(axis=1)
+    coo = relevant.tocoo()
+    relevant_keys = _pair_keys(coo.row, coo.col, n_events)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+
+    popular = _popular_top_k(state, seen, seen_keys, k)
+    ranked: Dict[str, Tuple[np.ndarray, ...]] = {'control': popular}
+
+    # Neighbours from the training part only, so held-out saves cannot leak into CF
+    neighbour_idx, neighbour_scores = top_k_rows(
+        state['normalized'], state['normalized_t'], users, state['neighbours_k']
+    )
+    weights = neighbour_weights(neighbour_idx, neighbour_scores, train.shape[0])
+    cold = seen.getnnz(axis=1) == 0
+    cf = _ranked(weights @ train, seen, seen_keys, k)
+    ranked['collaborative_filtering'] = _with_fallback(cf, popular, cold)
+
+    if state['profiles'] is not None:
+        profiles = state['profiles'][users]
+        content = _ranked(profiles @ state['event_tokens'], seen, seen_keys, k)
+        ranked['content_based'] = _with_fallback(content, popular, profiles.getnnz(axis=1) == 0)
+    else:
+        ranked['content_based'] = popular
+
+    # Served hybrid merges the two top lists, not the full score vectors
+    cf, content = ranked['collaborative_filtering'], ranked['content_based']
+    merged = csr_matrix(
+        (
+            np.concatenate([HYBRID_CF_WEIGHT * cf[2], HYBRID_CONTENT_WEIGHT * content[2]]),
+            (np.concatenate([cf[0], content[0]]), np.concatenate([cf[1], content[1]]))
+        ),
+        shape=seen.shape
+    ).tocoo()
+    ranked['hybrid'] = _top_k(merged.row, merged.col, merged.data, k)
+
+    results: Dict[str, Any] = {}
+    for variant in VARIANTS:
+        rows, cols, _, ranks = ranked[variant]
+        hit = np.isin(_pair_keys(rows, cols, n_events), relevant_keys)
+        hits = np.bincount(rows[hit], minlength=len(users))
+        gains = np.bincount(rows[hit], weights=discounts[ranks[hit]], minlength=len(users))
+        results[variant] = (
+            float(hits.sum() / k),
+            float((hits / n_relevant).sum()),
+            float((gains / ideal).sum()),
+            np.unique(cols)
+        )
+    return results
+
+
+def evaluate(
+    train: csr_matrix,
+    relevant: csr_matrix,
+    profiles: Optional[csr_matrix],
+    event_tokens: Optional[csr_matrix],
+    k: int,
+    neighbours_k: int,
+    block_rows: int,
+    workers: int = 1,
+    memory_mb: float = 0,
+    min_parallel_rows: int = 0
+) -> Dict[str, float]:
+    """
+    precision@k, recall@k, NDCG@k and catalog coverage per variant over every user with
+    held-out saves; flat {"<variant>_<metric>_at_<k>": value} so they sit in validation_metrics
+    CF neighbours (neighbours_k per user) are recomputed from train for those users only
+    """
+    users = np.flatnonzero(relevant.getnnz(axis=1) > 0)
+    n_events = train.shape[1]
+    metrics: Dict[str, float] = {
+        'eval_users': int(len(users)),
+        'eval_holdout_saves': int(relevant.nnz),
+        'eval_k': int(k)
+    }
+    if len(users) == 0 or n_events == 0:
+        return metrics
+
+    popularity = np.asarray((train > 0).sum(axis=0), dtype=np.float64).ravel()
+    popular_order = np.lexsort((np.arange(n_events), -popularity))
+    popular_order = popular_order[popularity[popular_order] > 0]
+
+    train = train.tocsr()
+    normalized = normalize_rows(train)
+    state = {
+        'users': users,
+        'train': train,
+        'normalized': normalized,
+        'normalized_t': normalized.T.tocsr(),
+        'neighbours_k': neighbours_k,
+        'relevant': relevant.tocsr(),
+        'k': k,
+        'popularity': popularity,
+        'popular_order': popular_order,
+        'profiles': profiles,
+        'event_tokens': event_tokens
+    }
+
+    workers = resolve_workers(workers, len(users), min_parallel_rows)
+    # A block holds its users' similarities to every user and, when dense, their scores for every event
+    block_rows = min(
+        block_rows_for_memory(train.shape[0], block_rows, memory_mb, workers, BLOCK_BYTES_PER_CELL),
+        block_rows_for_memory(n_events, block_rows, memory_mb, workers, EVAL_BYTES_PER_CELL)
+    )
+    bounds = [(start, min(start + block_rows, len(users))) for start in range(0, len(users), block_rows)]
+    workers = min(workers, len(bounds))
+
+    if workers <= 1:
+        blocks = [evaluate_block(state, start, stop) for start, stop in bounds]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(state,)
+        ) as pool:
+            blocks = list(pool.map(_worker_block, bounds))
+
+    for variant in VARIANTS:
+        precision = sum(block[variant][0] for block in blocks)
+        recall = sum(block[variant][1] for block in blocks)
+        ndcg = sum(block[variant][2] for block in blocks)
+        recommended = np.unique(np.concatenate([block[variant][3] for block in blocks]))
+        metrics[f'{variant}_precision_at_{k}'] = precision / len(users)
+        metrics[f'{variant}_recall_at_{k}'] = recall / len(users)
+        metrics[f'{variant}_ndcg_at_{k}'] = ndcg / len(users)
+        metrics[f'{variant}_coverage'] = len(recommended) / n_events
+
+    logger.info(
+        f"Evaluated {len(VARIANTS)} variants on {len(users)} users at k={k} "
+        f"in blocks of {block_rows} on {workers} process(es)"
+    )
+    return metrics
@@ -0,0 +1,93 @@
+"""
+Id -> row lookups over plain arrays
+Replaces per-model Python dicts so the lookup structure itself can be memory-mapped
+"""
+from typing import Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+def id_array(ids: Any) -> np.ndarray:
+    """Ids as int64 when they are all integers, otherwise as fixed-width strings"""
+    arr = np.asarray(ids)
+    if arr.dtype.kind in 'iu':
+        return arr.astype(np.int64, copy=False)
+    if arr.dtype == object and all(isinstance(v, (int, np.integer)) for v in arr.tolist()):
+        return arr.astype(np.int64)
+    return arr.astype(str)
+
+
+class IdIndex:
+    """
+    Read-only mapping from id to its position in an id array
+    Lookups binary-search a sorted copy of the ids; `order` maps sorted slots back to positions
+    """
+
+    def __init__(self, sorted_ids: np.ndarray, order: np.ndarray):
+        self.sorted_ids = sorted_ids
+        self.order = order
+
+    @classmethod
+    def from_ids(cls, ids: Any) -> 'IdIndex':
+        ids = id_array(ids)
+        order = np.argsort(ids, kind='stable')
+        return cls(ids[order], order.astype(np.int64))
+
+    def _key(self, key: Any) -> Optional[Any]:
+        """Coerce a lookup key to the id dtype; None when it cannot be an id of this index"""
+        if self.sorted_ids.dtype.kind == 'U':
+            key = str(key)
+            # Longer keys would be silently truncated to the array's width
+            return key if len(key) <= self.sorted_ids.dtype.itemsize // 4 else None
+        if isinstance(key, (bool, float, np.floating)):
+            return None
+        try:
+            return np.int64(key)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    def get(self, key: Any, default: Optional[int] = None) -> Optional[int]:
+        value = self._key(key)
+        if value is None:
+            return default
+        slot = int(np.searchsorted(self.sorted_ids, value))
+        if slot < len(self.sorted_ids) and self.sorted_ids[slot] == value:
+            return int(self.order[slot])
+        return default
+
+    def lookup(self, keys: Any) -> np.ndarray:
+        """Positions of many ids at once; -1 for ids not in the index"""
+        keys = id_array(keys)
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        if self.sorted_ids.dtype.kind == 'U':
+            keys = keys.astype(str)
+        elif keys.dtype.kind == 'U':
+            # Only digit strings can match integer ids
+            numeric = np.char.isdigit(keys)
+            found = self.lookup(keys[numeric].astype(np.int64)) if numeric.any() else positions[:0]
+            positions[numeric] = found
+            return positions
+        if not len(self.sorted_ids) or not len(keys):
+            return positions
+        slots = np.minimum(np.searchsorted(self.sorted_ids, keys), len(self.sorted_ids) - 1)
+        hit = self.sorted_ids[slots] == keys
+        positions[hit] = self.order[slots[hit]]
+        return positions
+
+    def __getitem__(self, key: Any) -> int:
+        position = self.get(key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self.sorted_ids)
+
+    def keys(self) -> Iterator[Any]:
+        return iter(self.sorted_ids.tolist())
+
+    def items(self) -> Iterator[Tuple[Any, int]]:
+        return zip(self.sorted_ids.tolist(), self.order.tolist())
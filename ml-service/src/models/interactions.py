@@ -0,0 +1,245 @@
+"""
+Incremental construction of the user-item interaction matrix
+Rows arrive in chunks; each chunk becomes a COO block of (user, event, score, time)
+so training never holds the raw result set in memory. Ids are interned with
+categorical codes, and repeated (user, event) pairs are collapsed by an explicit rule.
+"""
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+logger = logging.getLogger(__name__)
+
+# Epoch seconds used for interactions without a timestamp: older than anything real
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+AGGREGATIONS = ('latest', 'decayed_sum')
+
+
+def _as_array(values: Iterable[Any]) -> np.ndarray:
+    if isinstance(values, pd.Series):
+        return values.to_numpy()
+    if isinstance(values, np.ndarray):
+        return values
+    return np.asarray(list(values))
+
+
+def to_epoch_seconds(values: Iterable[Any]) -> np.ndarray:
+    """Datetimes (or ISO strings) as int64 epoch seconds; missing values become MISSING_TIMESTAMP"""
+    values = _as_array(values)
+    if values.dtype.kind != 'M':
+        values = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce').to_numpy()
+    seconds = values.astype('datetime64[s]').astype(np.int64)
+    seconds[np.isnat(values)] = MISSING_TIMESTAMP
+    return seconds
+
+
+def epoch_seconds(value: Any) -> Optional[int]:
+    """A single datetime as epoch seconds, None when missing or unparseable"""
+    if value is None:
+        return None
+    seconds = int(to_epoch_seconds([value])[0])
+    return None if seconds == MISSING_TIMESTAMP else seconds
+
+
+def aggregate_interactions(
+    rows: np.ndarray,
+    cols: np.ndarray,
+    data: np.ndarray,
+    timestamps: np.ndarray,
+    n_cols: int,
+    aggregation: str,
+    half_life_days: float,
+    now: Optional[int] = None
+) -> tuple:
+    """
+    Collapse repeated (user, event) pairs, e.g. a user who saved and later hid an event
+    latest: the most recent interaction's score wins; undated rows count as oldest and
+            ties go to the row read last
+    decayed_sum: each score is weighted by 0.5 ** (age / half-life) and the weights of a
+                 pair are summed; undated rows are not decayed
+    Returns (rows, cols, data, times) with one entry per pair, sorted by (row, col);
+    times is the pair's most recent interaction
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown interaction aggregation {aggregation!r}; expected one of {AGGREGATIONS}")
+    if len(rows) == 0:
+        return rows, cols, data, timestamps
+
+    # One sort groups the rows of each pair; everything after it is a linear pass
+    keys = rows.astype(np.int64) * max(1, n_cols) + cols
+    order = np.argsort(keys)
+    keys = keys[order]
+    first = np.empty(len(keys), dtype=bool)
+    first[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=first[1:])
+    starts = np.flatnonzero(first)
+    del keys, first
+
+    if aggregation == 'decayed_sum':
+        # time.time() is UTC epoch seconds, the same reading to_epoch_seconds gives DB datetimes
+        now = now if now is not None else int(time.time())
+        dated = timestamps != MISSING_TIMESTAMP
+        age_days = np.zeros(len(data), dtype=np.float64)
+        age_days[dated] = np.maximum(now - timestamps[dated], 0) / 86400.0
+        weighted = data * np.power(0.5, age_days / max(half_life_days, 1e-9))
+        pairs = order[starts]
+        return (
+            rows[pairs], cols[pairs], np.add.reduceat(weighted[order], starts),
+            np.maximum.reduceat(timestamps[order], starts)
+        )
+
+    # Latest time per pair, then the row read last among those at that time
+    sorted_times = timestamps[order]
+    latest = np.repeat(np.maximum.reduceat(sorted_times, starts), np.diff(np.append(starts, len(order))))
+    candidates = np.where(sorted_times == latest, order, -1)
+    del sorted_times, latest
+    last = np.maximum.reduceat(candidates, starts)
+    return rows[last], cols[last], data[last], timestamps[last]
+
+
+class IdInterner:
+    """
+    Dense codes for ids in first-seen order
+    Integer ids are found by binary search over a sorted array, so a chunk costs a few
+    numpy passes however many distinct ids it has; other ids fall back to a dict
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._sorted = np.empty(0, dtype=np.int64)
+        self._sorted_codes = np.empty(0, dtype=np.int32)
+        self._index: Optional[Dict[Any, int]] = None
+        self._ids: List[np.ndarray] = []
+
+    def intern(self, values: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize(values)
+        uniques = np.asarray(uniques)
+        if self._index is None and uniques.dtype.kind in 'iu':
+            mapping = self._intern_integers(uniques.astype(np.int64))
+        else:
+            mapping = self._intern_objects(uniques)
+        return mapping[codes]
+
+    def _intern_integers(self, uniques: np.ndarray) -> np.ndarray:
+        # Sorted needles keep the binary searches cache-friendly and give the insert points
+        order = np.argsort(uniques)
+        values = uniques[order]
+        slots = np.searchsorted(self._sorted, values)
+        known = slots < len(self._sorted)
+        known[known] = self._sorted[slots[known]] == values[known]
+
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        mapping[order[known]] = self._sorted_codes[slots[known]]
+        new = ~known
+        if new.any():
+            first_seen = np.sort(order[new])
+            mapping[first_seen] = np.arange(self.size, self.size + len(first_seen), dtype=np.int32)
+            self._sorted = np.insert(self._sorted, slots[new], values[new])
+            self._sorted_codes = np.insert(self._sorted_codes, slots[new], mapping[order[new]])
+            self._ids.append(uniques[first_seen])
+            self.size += len(first_seen)
+        return mapping
+
+    def _intern_objects(self, uniques: np.ndarray) -> np.ndarray:
+        if self._index is None:
+            self._index = self.index()
+        new = [value for value in uniques.tolist() if value not in self._index]
+        for value in new:
+            self._index[value] = len(self._index)
+        if new:
+            self._ids.append(np.array(new, dtype=object))
+            self.size += len(new)
+        return np.fromiter((self._index[value] for value in uniques.tolist()), dtype=np.int32, count=len(uniques))
+
+    def ids(self) -> np.ndarray:
+        """Ids in code order"""
+        if not self._ids:
+            return np.empty(0, dtype=np.int64)
+        ids = np.concatenate(self._ids)
+        # Object ids become a plain str/int array, as np.array would build from the values
+        return np.array(ids.tolist()) if ids.dtype == object else ids
+
+    def index(self) -> Dict[Any, int]:
+        """id -> code"""
+        if self._index is not None:
+            return dict(self._index)
+        return dict(zip(self.ids().tolist(), range(self.size)))
+
+
+class InteractionMatrixBuilder:
+    """Interns user/event ids to matrix indices and accumulates COO blocks"""
+
+    def __init__(self):
+        self.users = IdInterner()
+        self.events = IdInterner()
+        self.num_rows = 0
+        self._rows: List[np.ndarray] = []
+        self._cols: List[np.ndarray] = []
+        self._data: List[np.ndarray] = []
+        self._times: List[np.ndarray] = []
+        # After build(): each stored interaction's epoch seconds, aligned with matrix.data
+        self.pair_times: Optional[np.ndarray] = None
+
+    def add(
+        self,
+        user_ids: Iterable[Any],
+        event_ids: Iterable[Any],
+        scores: Iterable[Any],
+        timestamps: Optional[Iterable[Any]] = None
+    ):
+        """Append one chunk of interactions"""
+        user_ids = _as_array(user_ids)
+        count = len(user_ids)
+        if count == 0:
+            return
+
+        self._rows.append(self.users.intern(user_ids))
+        self._cols.append(self.events.intern(_as_array(event_ids)))
+        # MySQL returns literal scores as Decimal; store compact floats
+        self._data.append(_as_array(scores).astype(np.float32))
+        self._times.append(
+            np.full(count, MISSING_TIMESTAMP, dtype=np.int64) if timestamps is None else to_epoch_seconds(timestamps)
+        )
+        self.num_rows += count
+
+    def add_rows(self, rows: List[tuple]):
+        """Append (user_id, event_id, score[, timestamp]) tuples as fetched from a cursor"""
+        if rows:
+            columns = list(zip(*rows))
+            self.add(columns[0], columns[1], columns[2], columns[3] if len(columns) > 3 else None)
+
+    def build(
+        self,
+        aggregation: str = 'latest',
+        half_life_days: float = 30.0,
+        now: Optional[Any] = None
+    ) -> tuple:
+        """(matrix, user_idx, event_idx, user_ids, event_ids) with repeated pairs aggregated"""
+        shape = (self.users.size, self.events.size)
+        if self.num_rows:
+            rows = np.concatenate(self._rows)
+            cols = np.concatenate(self._cols)
+            data = np.concatenate(self._data).astype(np.float64)
+            times = np.concatenate(self._times)
+        else:
+            rows = cols = np.empty(0, dtype=np.int32)
+            data = np.empty(0, dtype=np.float64)
+            times = np.empty(0, dtype=np.int64)
+        self._rows, self._cols, self._data, self._times = [], [], [], []
+
+        rows, cols, data, self.pair_times = aggregate_interactions(
+            rows, cols, data, times, shape[1], aggregation, half_life_days, epoch_seconds(now)
+        )
+        if len(data) < self.num_rows:
+            logger.info(f"Aggregated {self.num_rows - len(data)} repeated interactions ({aggregation})")
+
+        # Pairs come back sorted by (row, col), so CSR arrays can be laid out directly
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        matrix = csr_matrix((data, cols.astype(np.int32), indptr), shape=shape)
+        return matrix, self.users.index(), self.events.index(), self.users.ids(), self.events.ids()
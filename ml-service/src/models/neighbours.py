@@ -0,0 +1,200 @@
+"""
+Top-K user neighbour index for collaborative filtering
+Keeps K (index, score) pairs per user instead of the full user-user cosine matrix
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+logger = logging.getLogger(__name__)
+
+# Scratch bytes per (row, user) cell of a block: float64 similarities, int64 argpartition
+# output and the sparse product it is densified from
+BLOCK_BYTES_PER_CELL = 24
+
+# Per-process state for pool workers, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def normalize_rows(matrix: csr_matrix) -> csr_matrix:
+    """L2-normalise each row so a dot product equals cosine similarity"""
+    matrix = csr_matrix(matrix, dtype=np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return diags(inverse) @ matrix
+
+
+def top_k_block(
+    normalized: csr_matrix,
+    normalized_t: csr_matrix,
+    start: int,
+    stop: int,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-K neighbours for rows [start, stop)
+    Memory is bounded by (stop - start) x n_users similarities
+    """
+    return top_k_rows(normalized, normalized_t, np.arange(start, stop), k)
+
+
+def top_k_rows(
+    normalized: csr_matrix,
+    normalized_t: csr_matrix,
+    rows: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-K neighbours for an arbitrary set of rows (e.g. users touched by an incremental update)"""
+    rows = np.asarray(rows, dtype=np.int64)
+    return top_k_similar((normalized[rows] @ normalized_t).toarray(), rows, k)
+
+
+def top_k_similar(block: np.ndarray, own_rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-K positive similarities per row of a dense (rows x n_users) block
+    own_rows[i] is row i's own user index (excluded), or -1 for a user outside the matrix
+    """
+    n_rows, n_users = block.shape
+    # A user is never its own neighbour
+    own = own_rows >= 0
+    block[np.flatnonzero(own), own_rows[own]] = -np.inf
+
+    # Excluded users score -inf, so they never pass the positive filter below
+    kk = min(k, n_users)
+    indices = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    if kk <= 0 or n_rows == 0:
+        return indices, scores
+
+    top = np.argpartition(block, -kk, axis=1)[:, -kk:]
+    top_scores = np.take_along_axis(block, top, axis=1)
+
+    # Highest similarity first
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    # Only users with positive similarity count as neighbours
+    positive = top_scores > 0
+    indices[:, :kk] = np.where(positive, top, -1)
+    scores[:, :kk] = np.where(positive, top_scores, 0.0)
+    return indices, scores
+
+
+def block_rows_for_memory(
+    n_users: int,
+    block_rows: int,
+    memory_mb: float,
+    workers: int,
+    bytes_per_cell: int = BLOCK_BYTES_PER_CELL
+) -> int:
+    """
+    Largest block size up to block_rows whose dense scratch fits in memory_mb across all workers
+    n_users is the width of a block row; memory_mb <= 0 means no ceiling
+    """
+    block_rows = max(1, int(block_rows))
+    if memory_mb <= 0 or n_users == 0:
+        return block_rows
+    budget = memory_mb * 1024 * 1024 / max(1, workers)
+    return max(1, min(block_rows, int(budget // (n_users * bytes_per_cell))))
+
+
+def cpu_quota() -> Optional[int]:
+    """Whole CPUs allowed by a cgroup CPU quota (containers), or None without one"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return max(1, int(int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return max(1, quota // period)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def resolve_workers(workers: int, rows: Optional[int] = None, min_parallel_rows: int = 0) -> int:
+    """
+    Processes to use for scoring `rows` rows: 0 or less means one per available core
+    (capped by any container CPU quota); fewer than min_parallel_rows rows stay in-process
+    """
+    if rows is not None and rows < min_parallel_rows:
+        return 1
+    if workers > 0:
+        return workers
+    try:
+        cores = max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:  # pragma: no cover - not available on every platform
+        cores = max(1, os.cpu_count() or 1)
+    quota = cpu_quota()
+    return min(cores, quota) if quota is not None else cores
+
+
+def _init_worker(normalized: csr_matrix, k: int):
+    _worker['normalized'] = normalized
+    _worker['normalized_t'] = normalized.T.tocsr()
+    _worker['k'] = k
+
+
+def _worker_block(bounds: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    start, stop = bounds
+    return top_k_block(_worker['normalized'], _worker['normalized_t'], start, stop, _worker['k'])
+
+
+def top_k_neighbours(
+    matrix: csr_matrix,
+    k: int,
+    block_rows: int,
+    workers: int = 1,
+    memory_mb: float = 0,
+    min_parallel_rows: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute each user's K most similar users by cosine similarity
+    Row blocks are sized so their dense scratch stays under memory_mb in total and are
+    spread over a process pool when workers > 1 (0 = all cores) and there are at least
+    min_parallel_rows users.
+    Returns (n_users x K) int32 indices padded with -1 and float32 scores padded with 0
+    """
+    n_users = matrix.shape[0]
+    workers = resolve_workers(workers, n_users, min_parallel_rows)
+    block_rows = block_rows_for_memory(n_users, block_rows, memory_mb, workers)
+    bounds = [(start, min(start + block_rows, n_users)) for start in range(0, n_users, block_rows)]
+    workers = min(workers, len(bounds))
+
+    normalized = normalize_rows(matrix)
+
+    indices = np.full((n_users, k), -1, dtype=np.int32)
+    scores = np.zeros((n_users, k), dtype=np.float32)
+
+    if workers <= 1:
+        normalized_t = normalized.T.tocsr()
+        for start, stop in bounds:
+            indices[start:stop], scores[start:stop] = top_k_block(normalized, normalized_t, start, stop, k)
+    else:
+        # Spawned workers each receive the normalised matrix once; only (rows x K) results come back
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(normalized, k)
+        ) as pool:
+            for (start, stop), (block_indices, block_scores) in zip(bounds, pool.map(_worker_block, bounds)):
+                indices[start:stop], scores[start:stop] = block_indices, block_scores
+
+    logger.info(
+        f"Computed top-{k} neighbours for {n_users} users in blocks of {block_rows} on {workers} process(es)"
+    )
+    return indices, scores
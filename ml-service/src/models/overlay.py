@@ -0,0 +1,118 @@
+"""
+In-memory overlay of recent feedback on top of the published model
+A save or hide is recorded against the user straight away, and the user's interaction
+row and neighbour list are re-derived from it on their next CF request instead of
+waiting for a retrain. Holds at most USER_OVERLAY_MAX_USERS users (least recently
+touched go first); entries the base model already reflects are dropped when a new
+model is published.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Same scores the training queries give saved and hidden events
+FEEDBACK_SCORES = {'save': 1.0, 'hide': -0.5}
+
+
+class OverlayEntry:
+    """Pending interactions for one user plus the state derived from them for one model"""
+
+    __slots__ = ('interactions', 'revision', 'model', 'state')
+
+    def __init__(self):
+        # event_id -> score, oldest first
+        self.interactions: Dict[Any, float] = {}
+        self.revision = 0
+        self.model: Optional[Dict[str, Any]] = None
+        self.state: Any = None
+
+
+class UserOverlay:
+    """Bounded LRU of per-user interaction overrides"""
+
+    def __init__(self, max_users: int, max_events: int):
+        self.max_users = max_users
+        self.max_events = max(1, max_events)
+        self._entries: 'OrderedDict[str, OverlayEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_users > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, user_id: Any, event_id: Any, score: float):
+        """Latest feedback for (user, event) replaces any earlier one"""
+        if not self.enabled:
+            return
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = OverlayEntry()
+            self._entries.move_to_end(key)
+
+            entry.interactions.pop(event_id, None)
+            entry.interactions[event_id] = score
+            while len(entry.interactions) > self.max_events:
+                entry.interactions.pop(next(iter(entry.interactions)))
+            entry.revision += 1
+            entry.model = entry.state = None
+
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def score(self, user_id: Any, event_id: Any) -> Optional[float]:
+        """Pending feedback score for (user, event), or None without any"""
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+            return entry.interactions.get(event_id) if entry is not None else None
+
+    def resolve(
+        self,
+        user_id: Any,
+        model: Dict[str, Any],
+        derive: Callable[[Dict[str, Any], Dict[Any, float]], Any]
+    ) -> Any:
+        """
+        State derived from the user's pending interactions for this model, or None without any
+        derive(model, interactions) runs outside the lock and its result is kept until the
+        user's interactions or the model change
+        """
+        if not self._entries:
+            return None
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.model is model:
+                return entry.state
+            interactions, revision = dict(entry.interactions), entry.revision
+
+        state = derive(model, interactions)
+        with self._lock:
+            if self._entries.get(key) is entry and entry.revision == revision:
+                entry.model, entry.state = model, state
+        return state
+
+    def fold(self, reflected: Callable[[str, Any, float], bool]):
+        """
+        Drop interactions a newly published model already contains
+        reflected(user_key, event_id, score) says whether the base model agrees with one
+        """
+        with self._lock:
+            for key in list(self._entries):
+                entry = self._entries[key]
+                remaining = {
+                    event_id: score for event_id, score in entry.interactions.items()
+                    if not reflected(key, event_id, score)
+                }
+                if not remaining:
+                    del self._entries[key]
+                    continue
+                entry.interactions = remaining
+                entry.revision += 1
+                entry.model = entry.state = None
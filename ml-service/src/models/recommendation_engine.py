@@ -4,63 +4,103 @@ Uses scikit-learn for cost-effective recommendations without SageMaker
 """
 import logging
 import os
+import threading
+import time
 import joblib
 import numpy as np
 import pandas as pd
+import pymysql
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Set
+from typing import Callable, List, Dict, Any, Optional, Set
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
 from scipy.sparse import csr_matrix
-import pymysql
 
+from ..catalog import EventCatalog, normalize_city
 from ..config import settings
+from ..db import ConnectionPool
+from ..feedback import FeedbackWriter, encode_context
+from ..popularity import PopularityIndex
+from ..tokens import split_tokens
+from .. import tracing
+from . import evaluation
+from .candidate_mask import CandidateMask
+from .content_model import ContentModel
+from .ids import IdIndex
+from .artifact import current_version, load_artifact, save_artifact
+from .interactions import InteractionMatrixBuilder, aggregate_interactions, epoch_seconds, to_epoch_seconds
+from .snapshot import ModelSnapshot
+from .neighbours import normalize_rows, top_k_neighbours, top_k_rows, top_k_similar
+from .overlay import FEEDBACK_SCORES, UserOverlay
 
 logger = logging.getLogger(__name__)
 
+# Users scored per sparse product when building content recommendations in bulk
+CONTENT_SCORING_CHUNK = 512
+
+# Users per IN (...) list when re-reading touched users' interactions
+INCREMENTAL_FETCH_CHUNK = 1000
+
 class RecommendationEngine:
     """
     Collaborative filtering recommendation engine
     Lightweight implementation running on EC2 without SageMaker
     """
 
-    def __init__(self):
-        self.model = None
+    def __init__(self, db_pool: Optional[ConnectionPool] = None, metrics_collector=None):
+        self.db_pool = db_pool or ConnectionPool()
+        self.metrics_collector = metrics_collector
+        self.catalog = EventCatalog(self.db_pool)
+        self.popularity = PopularityIndex(self.db_pool, self.catalog)
+        self.feedback = FeedbackWriter(self.db_pool)
+        # The serving model; replaced wholesale, never modified in place
+        self._snapshot: Optional[ModelSnapshot] = None
         self.user_features = None
         self.event_features = None
         self.scaler = StandardScaler()
-        self.model_version = settings.model_version
-        self.last_trained = None
-        self.is_model_loaded = False
+        # (catalog columns, content model, transposed event token matrix) for content scoring
+        self._content_index = None
+        # Candidate generators of multi-source arms (hybrid) run here concurrently
+        self._generator_pool = ThreadPoolExecutor(
+            max_workers=settings.generator_workers, thread_name_prefix='candidate-generator'
+        )
+        # Serving workers reload when another process publishes a model
+        self._loaded_version: Optional[str] = None
+        self._watch_stop = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
+        # Saves and hides since the published model, applied to CF on the user's next request
+        self.overlay = UserOverlay(settings.user_overlay_max_users, settings.user_overlay_max_events)
+        # (model, transposed row-normalised interaction matrix) for overlay neighbour search
+        self._overlay_basis: Optional[tuple] = None
+        # Servable CF columns per city for the current model and catalog snapshot
+        self._candidate_mask: Optional[CandidateMask] = None
+        # (model, IdIndex over its event ids) for models whose event_idx is a plain dict
+        self._event_index: Optional[tuple] = None
+        self.catalog.add_listener(lambda cols: self._refresh_candidate_mask())
 
     def get_db_connection(self):
-        """Get MySQL database connection"""
-        return pymysql.connect(
-            host=settings.db_host,
-            port=settings.db_port,
-            user=settings.db_user,
-            password=settings.db_password,
-            database=settings.db_name,
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        """Check out a pooled MySQL connection; close() returns it to the pool"""
+        return self.db_pool.connection()
 
-    def load_model(self) -> bool:
-        """Load the trained model from disk"""
+    def load_model(self, train_if_missing: bool = True) -> bool:
+        """
+        Load the trained model from disk
+        Serving workers pass train_if_missing=False: only the trainer process trains
+        """
         try:
-            model_path = os.path.join(settings.model_dir, 'recommendation_model.joblib')
-
-            if os.path.exists(model_path):
-                model_data = joblib.load(model_path)
-                self.model = model_data.get('model')
-                self.user_features = model_data.get('user_features')
-                self.event_features = model_data.get('event_features')
-                self.scaler = model_data.get('scaler', StandardScaler())
-                self.model_version = model_data.get('version', settings.model_version)
-                self.last_trained = model_data.get('last_trained')
-
-                self.is_model_loaded = True
+            published = self._published_version()
+            snapshot = self._read_model()
+
+            if snapshot is not None:
+                self._publish(snapshot)
+                self._loaded_version = published
                 logger.info(f"Model loaded successfully: version {self.model_version}")
                 return True
+            elif not train_if_missing:
+                logger.warning("No published model found; serving fallbacks until one is published")
+                return False
             else:
                 logger.warning("No trained model found. Training initial model...")
                 # Train initial model if none exists
@@ -69,13 +109,147 @@ class RecommendationEngine:
 
         except Exception as e:
             logger.error(f"Error loading model: {e}")
-            self.is_model_loaded = False
             return False
 
+    def _read_model(self) -> Optional[ModelSnapshot]:
+        """
+        The published model on disk: the memory-mapped artifact when enabled, else the joblib file
+        The joblib file is still read as a fallback so existing deployments keep their model
+        """
+        if settings.model_artifact_format == 'mmap':
+            snapshot = load_artifact(self._artifact_root())
+            if snapshot is not None:
+                return snapshot
+
+        model_path = os.path.join(settings.model_dir, 'recommendation_model.joblib')
+        if not os.path.exists(model_path):
+            return None
+
+        model_data = joblib.load(model_path)
+        self.user_features = model_data.get('user_features')
+        self.event_features = model_data.get('event_features')
+        self.scaler = model_data.get('scaler', StandardScaler())
+        model = model_data.get('model')
+        # Files written before metrics were stored get the basic ones once, at load
+        validation_metrics = model_data.get('validation_metrics')
+        if not validation_metrics and model is not None:
+            validation_metrics = self._compute_validation_metrics(model)
+        return ModelSnapshot(
+            model,
+            model_data.get('version', settings.model_version),
+            model_data.get('last_trained'),
+            model_data.get('last_updated'),
+            validation_metrics
+        )
+
+    @staticmethod
+    def _artifact_root() -> str:
+        return os.path.join(settings.model_dir, 'artifacts')
+
+    def _published_version(self) -> Optional[str]:
+        """What is on disk now: the CURRENT artifact name, or the joblib file's mtime"""
+        if settings.model_artifact_format == 'mmap':
+            version = current_version(self._artifact_root())
+            if version is not None:
+                return version
+        model_path = os.path.join(settings.model_dir, 'recommendation_model.joblib')
+        return str(os.path.getmtime(model_path)) if os.path.exists(model_path) else None
+
+    def check_for_new_model(self) -> bool:
+        """Load the published model if it changed since the last load; True when reloaded"""
+        published = self._published_version()
+        if published is None or published == self._loaded_version:
+            return False
+        logger.info(f"New model published ({published}), reloading")
+        return self.load_model(train_if_missing=False)
+
+    def start_model_watch(self):
+        """Poll for models published by the trainer process from a daemon thread"""
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, name='model-watch', daemon=True)
+        self._watch_thread.start()
+
+    def stop_model_watch(self):
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=5)
+            self._watch_thread = None
+
+    def _watch_loop(self):
+        while not self._watch_stop.wait(settings.model_watch_seconds):
+            try:
+                self.check_for_new_model()
+            except Exception as e:
+                logger.error(f"Model reload failed: {e}")
+
+    def shutdown(self):
+        """Stop the candidate generator threads"""
+        self._generator_pool.shutdown(wait=False, cancel_futures=True)
+
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
         return self.is_model_loaded
 
+    def _publish(self, snapshot: ModelSnapshot):
+        """Switch serving to a fully built model with one reference assignment"""
+        model = snapshot.model
+        # Built here rather than on the first overlay request after the publish
+        if self.overlay.enabled and model is not None:
+            self._overlay_basis = (model, normalize_rows(model['interaction_matrix']).T.tocsr())
+        self._snapshot = snapshot
+        # Overlay entries the new model already contains are no longer needed
+        self.overlay.fold(lambda user_key, event_id, score: self._base_reflects(model, user_key, event_id, score))
+        self._refresh_candidate_mask()
+
+    @property
+    def snapshot(self) -> Optional[ModelSnapshot]:
+        return self._snapshot
+
+    @property
+    def model(self) -> Optional[Dict[str, Any]]:
+        snapshot = self._snapshot
+        return snapshot.model if snapshot is not None else None
+
+    @property
+    def is_model_loaded(self) -> bool:
+        snapshot = self._snapshot
+        return snapshot is not None and snapshot.model is not None
+
+    @property
+    def model_version(self) -> str:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else settings.model_version
+
+    @property
+    def last_trained(self) -> Optional[str]:
+        snapshot = self._snapshot
+        return snapshot.last_trained if snapshot is not None else None
+
+    @property
+    def last_updated(self) -> Optional[str]:
+        snapshot = self._snapshot
+        return snapshot.last_updated if snapshot is not None else None
+
+    @property
+    def model_fingerprint(self) -> str:
+        """Identifies the serving model; changes whenever a retrained or updated model is published"""
+        snapshot = self._snapshot
+        return snapshot.fingerprint if snapshot is not None else f"{settings.model_version}:None:None"
+
+    @property
+    def cache_fingerprint(self) -> str:
+        """Model and catalog snapshot behind a result; cached results under another one are never read"""
+        return f"{self.model_fingerprint}|{self.catalog.fingerprint}"
+
+    def _read_frame(self, conn, query: str) -> pd.DataFrame:
+        """Run a query and build a DataFrame from dict rows (pd.read_sql mangles DictCursor rows)"""
+        cursor = conn.cursor()
+        cursor.execute(query)
+        columns = [col[0] for col in cursor.description]
+        return pd.DataFrame(list(cursor.fetchall()), columns=columns)
+
     def fetch_training_data(self) -> pd.DataFrame:
         """
         Fetch user interaction data from database for training
@@ -102,7 +276,7 @@ class RecommendationEngine:
             FROM user_hidden_events he
             """
 
-            interactions_df = pd.read_sql(query, conn)
+            interactions_df = self._read_frame(conn, query)
 
             # Get event features
             events_query = """
@@ -119,7 +293,7 @@ class RecommendationEngine:
             WHERE start_time >= NOW()
             """
 
-            events_df = pd.read_sql(events_query, conn)
+            events_df = self._read_frame(conn, events_query)
 
             # Get user preferences
             prefs_query = """
@@ -132,7 +306,7 @@ class RecommendationEngine:
             FROM user_preferences
             """
 
-            prefs_df = pd.read_sql(prefs_query, conn)
+            prefs_df = self._read_frame(conn, prefs_query)
 
             # Merge data
             training_data = interactions_df.merge(events_df, on='event_id', how='left')
@@ -147,53 +321,123 @@ class RecommendationEngine:
         finally:
             conn.close()
 
-    def build_user_item_matrix(self, interactions_df: pd.DataFrame) -> tuple:
-        """Build user-item interaction matrix for collaborative filtering"""
+    def stream_training_interactions(self) -> InteractionMatrixBuilder:
+        """
+        Stream saved/hidden interactions through a server-side cursor in fixed-size chunks
+        Only user_id, event_id, score and time are kept, accumulated as COO blocks
+        """
+        query = """
+        SELECT user_id, event_id, 1.0 as interaction_score, saved_at as created_at
+        FROM user_saved_events
+        UNION ALL
+        SELECT user_id, event_id, -0.5 as interaction_score, hidden_at as created_at
+        FROM user_hidden_events
+        """
+
+        builder = InteractionMatrixBuilder()
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.cursor(pymysql.cursors.SSCursor)
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(settings.training_chunk_rows)
+                if not rows:
+                    break
+                builder.add_rows(rows)
+            cursor.close()
+        except Exception:
+            # An unread server-side result leaves the connection unusable
+            conn.invalidate()
+            raise
+        finally:
+            conn.close()
+
+        logger.info(f"Streamed {builder.num_rows} interactions in chunks of {settings.training_chunk_rows}")
+        return builder
+
+    def fetch_content_data(self) -> tuple:
+        """
+        Fetch event features and stated preferences for the content model
+        Covers past events users interacted with as well as upcoming ones
+        """
+        conn = self.get_db_connection()
         try:
-            # Create user-event matrix
-            user_ids = interactions_df['user_id'].unique()
-            event_ids = interactions_df['event_id'].unique()
+            events_query = """
+            SELECT id as event_id, title, genres as genre
+            FROM events
+            WHERE start_time >= NOW()
+               OR id IN (SELECT event_id FROM user_saved_events)
+               OR id IN (SELECT event_id FROM user_hidden_events)
+            """
+            events_df = self._read_frame(conn, events_query)
 
-            user_idx = {uid: idx for idx, uid in enumerate(user_ids)}
-            event_idx = {eid: idx for idx, eid in enumerate(event_ids)}
+            prefs_query = """
+            SELECT user_id, preferred_genres, preferred_artists
+            FROM user_preferences
+            """
+            prefs_df = self._read_frame(conn, prefs_query)
 
-            # Build sparse matrix
-            rows = [user_idx[uid] for uid in interactions_df['user_id']]
-            cols = [event_idx[eid] for eid in interactions_df['event_id']]
-            data = interactions_df['interaction_score'].values
+            return events_df, prefs_df
+        finally:
+            conn.close()
 
-            matrix = csr_matrix(
-                (data, (rows, cols)),
-                shape=(len(user_ids), len(event_ids))
-            )
+    @staticmethod
+    def _frame_builder(interactions_df: pd.DataFrame) -> InteractionMatrixBuilder:
+        builder = InteractionMatrixBuilder()
+        builder.add(
+            interactions_df['user_id'],
+            interactions_df['event_id'],
+            interactions_df['interaction_score'],
+            interactions_df.get('created_at')
+        )
+        return builder
 
-            return matrix, user_idx, event_idx, user_ids, event_ids
+    def build_user_item_matrix(self, interactions_df: pd.DataFrame, now: Optional[datetime] = None) -> tuple:
+        """Build user-item interaction matrix for collaborative filtering"""
+        try:
+            builder = self._frame_builder(interactions_df)
+            return builder.build(settings.interaction_aggregation, settings.interaction_half_life_days, now=now)
 
         except Exception as e:
             logger.error(f"Error building user-item matrix: {e}")
             return None, None, None, None, None
 
-    def train_collaborative_filtering(self, training_data: pd.DataFrame) -> Dict[str, Any]:
+    def train_collaborative_filtering(self, training_data: pd.DataFrame, now: Optional[datetime] = None) -> tuple:
         """
         Train collaborative filtering model using cosine similarity
         Lightweight approach without matrix factorization for cost savings
+        Returns (model, validation_metrics)
         """
-        try:
-            if len(training_data) < settings.min_training_samples:
-                raise ValueError(f"Insufficient training data: {len(training_data)} < {settings.min_training_samples}")
+        # Build user-item matrix
+        matrix, user_idx, event_idx, user_ids, event_ids = self.build_user_item_matrix(training_data, now=now)
 
-            # Build user-item matrix
-            matrix, user_idx, event_idx, user_ids, event_ids = self.build_user_item_matrix(training_data)
+        return self.fit_collaborative_filtering(
+            matrix, user_idx, event_idx, user_ids, event_ids, num_samples=len(training_data)
+        )
+
+    def fit_collaborative_filtering(
+        self,
+        matrix: Optional[csr_matrix],
+        user_idx: Dict[Any, int],
+        event_idx: Dict[Any, int],
+        user_ids: np.ndarray,
+        event_ids: np.ndarray,
+        num_samples: int
+    ) -> tuple:
+        """
+        Fit the similarity structure for an already built user-item matrix
+        Returns a new (model, validation_metrics); the serving model is untouched
+        """
+        try:
+            if num_samples < settings.min_training_samples:
+                raise ValueError(f"Insufficient training data: {num_samples} < {settings.min_training_samples}")
 
             if matrix is None:
                 raise ValueError("Failed to build user-item matrix")
 
-            # Compute user-user similarity matrix
-            user_similarity = cosine_similarity(matrix, dense_output=False)
-
             # Store model components
-            self.model = {
-                'user_similarity': user_similarity,
+            model = {
+                'similarity_mode': settings.cf_similarity_mode,
                 'interaction_matrix': matrix,
                 'user_idx': user_idx,
                 'event_idx': event_idx,
@@ -201,30 +445,149 @@ class RecommendationEngine:
                 'event_ids': event_ids
             }
 
+            if settings.cf_similarity_mode == 'dense':
+                # Full user-user similarity matrix (grows quadratically with users)
+                model['user_similarity'] = cosine_similarity(matrix, dense_output=False)
+            else:
+                # Compact top-K neighbour table computed in memory-bounded row blocks
+                neighbour_idx, neighbour_scores = top_k_neighbours(
+                    matrix,
+                    k=settings.cf_neighbours_k,
+                    block_rows=settings.cf_similarity_block_rows,
+                    workers=settings.cf_similarity_workers,
+                    memory_mb=settings.cf_similarity_memory_mb,
+                    min_parallel_rows=settings.cf_similarity_parallel_min_rows
+                )
+                model['neighbour_idx'] = neighbour_idx
+                model['neighbour_scores'] = neighbour_scores
+
             # Compute validation metrics
-            validation_metrics = self._compute_validation_metrics(matrix, user_similarity)
+            validation_metrics = self._compute_validation_metrics(model)
 
             logger.info(f"Model trained successfully with {len(user_ids)} users and {len(event_ids)} events")
 
-            return validation_metrics
+            return model, validation_metrics
 
         except Exception as e:
             logger.error(f"Error training model: {e}")
             raise
 
-    def _compute_validation_metrics(self, matrix, user_similarity) -> Dict[str, float]:
+    def train_content_model(
+        self,
+        model: Dict[str, Any],
+        interactions: pd.DataFrame,
+        content_data: Optional[tuple] = None
+    ) -> Dict[str, float]:
+        """
+        Build genre/artist user profiles for the content_based and hybrid arms
+        A failure leaves those arms on the soonest-events fallback rather than failing the retrain
+        """
+        try:
+            events_df, prefs_df = content_data if content_data is not None else self.fetch_content_data()
+            content = ContentModel.train(
+                events_df,
+                interactions[['user_id', 'event_id', 'interaction_score']],
+                prefs_df
+            )
+            model['content'] = content
+            return self._content_metrics(content)
+        except Exception as e:
+            logger.error(f"Error training content model: {e}")
+            model['content'] = None
+            return {}
+
+    @staticmethod
+    def _interaction_frame(model: Dict[str, Any], matrix: Optional[csr_matrix] = None) -> pd.DataFrame:
+        """(user_id, event_id, interaction_score) rows of the model's interaction matrix, or of matrix"""
+        coo = (matrix if matrix is not None else model['interaction_matrix']).tocoo()
+        return pd.DataFrame({
+            'user_id': model['user_ids'][coo.row],
+            'event_id': model['event_ids'][coo.col],
+            'interaction_score': coo.data
+        })
+
+    def evaluate_model(
+        self,
+        model: Dict[str, Any],
+        pair_times: Optional[np.ndarray],
+        content_data: Optional[tuple]
+    ) -> Dict[str, float]:
+        """
+        Offline ranking metrics for every variant on a time-based holdout
+        The newest EVAL_HOLDOUT_FRACTION of interactions is hidden, neighbours and content
+        profiles are refit on the rest, and each variant is scored on the hidden saves.
+        A failure only leaves the metrics out of the retrain
+        """
+        try:
+            split = evaluation.time_split(model['interaction_matrix'], pair_times, settings.eval_holdout_fraction)
+            if split is None:
+                logger.info("No dated interactions to hold out; skipping offline evaluation")
+                return {}
+            train, relevant, cutoff = split
+
+            profiles = event_tokens = None
+            if content_data is not None:
+                events_df, prefs_df = content_data
+                content = ContentModel.train(events_df, self._interaction_frame(model, train), prefs_df)
+                events = {
+                    row.event_id: (row.genre, row.title) for row in events_df.itertuples(index=False)
+                }
+                profiles, event_tokens = evaluation.content_matrices(
+                    content, model['user_ids'], model['event_ids'], events
+                )
+
+            metrics = evaluation.evaluate(
+                train,
+                relevant,
+                profiles,
+                event_tokens,
+                k=settings.eval_k,
+                neighbours_k=settings.cf_neighbours_k,
+                block_rows=settings.cf_similarity_block_rows,
+                workers=settings.cf_similarity_workers,
+                memory_mb=settings.cf_similarity_memory_mb,
+                min_parallel_rows=settings.cf_similarity_parallel_min_rows
+            )
+            # Epoch seconds: validation_metrics is a name -> number map in the API
+            metrics['eval_cutoff'] = float(cutoff)
+            return metrics
+        except Exception as e:
+            logger.error(f"Error evaluating model: {e}")
+            return {}
+
+    @staticmethod
+    def _content_metrics(content: Optional[ContentModel]) -> Dict[str, float]:
+        if content is None:
+            return {}
+        return {
+            'content_profiles': int(content.num_users),
+            'content_vocabulary': int(len(content.vocabulary))
+        }
+
+    def _compute_validation_metrics(self, model: Dict[str, Any]) -> Dict[str, float]:
         """Compute validation metrics for the model"""
         try:
+            matrix = model['interaction_matrix']
+
             # Simple metrics: coverage and sparsity
             coverage = (matrix.nnz / (matrix.shape[0] * matrix.shape[1])) * 100
-            avg_similarity = user_similarity.mean()
 
-            return {
+            metrics = {
                 'coverage_percent': float(coverage),
-                'avg_user_similarity': float(avg_similarity),
                 'num_users': int(matrix.shape[0]),
                 'num_events': int(matrix.shape[1])
             }
+
+            if 'neighbour_scores' in model:
+                neighbour_scores = model['neighbour_scores']
+                valid = model['neighbour_idx'] >= 0
+                metrics['avg_neighbour_similarity'] = float(neighbour_scores[valid].mean()) if valid.any() else 0.0
+            else:
+                metrics['avg_user_similarity'] = float(model['user_similarity'].mean())
+
+            metrics.update(self._content_metrics(model.get('content')))
+
+            return metrics
         except Exception as e:
             logger.error(f"Error computing validation metrics: {e}")
             return {}
@@ -237,45 +600,295 @@ class RecommendationEngine:
         try:
             logger.info("Starting model retraining...")
 
-            # Fetch latest training data
-            training_data = self.fetch_training_data()
+            # Interactions at or after this point are left for incremental updates
+            watermark = self._db_now()
+
+            if settings.training_extraction_mode == 'stream':
+                # Chunked server-side extraction straight into the sparse matrix
+                builder = self.stream_training_interactions()
+                training_samples = builder.num_rows
+                interactions = None
+            else:
+                # Fetch latest training data
+                training_data = self.fetch_training_data()
+                builder = self._frame_builder(training_data) if not training_data.empty else None
+                training_samples = len(training_data)
+                interactions = training_data
 
-            if training_data.empty:
+            if training_samples == 0:
                 raise ValueError("No training data available")
 
-            # Train model
-            validation_metrics = self.train_collaborative_filtering(training_data)
+            model, validation_metrics = self.fit_collaborative_filtering(
+                *builder.build(settings.interaction_aggregation, settings.interaction_half_life_days, now=watermark),
+                num_samples=training_samples
+            )
+            if interactions is None:
+                interactions = self._interaction_frame(model)
+
+            try:
+                content_data = self.fetch_content_data()
+            except Exception as e:
+                logger.error(f"Error fetching content data: {e}")
+                content_data = None
+            validation_metrics.update(self.train_content_model(model, interactions, content_data))
+            if settings.eval_enabled:
+                validation_metrics.update(self.evaluate_model(model, builder.pair_times, content_data))
+            model['watermark'] = watermark
+
+            # Save, then switch serving over in one step
+            snapshot = ModelSnapshot(
+                model, settings.model_version, datetime.utcnow().isoformat(), validation_metrics=validation_metrics
+            )
+            self._save_model(snapshot)
+            self._publish(snapshot)
 
-            # Save model
-            self.last_trained = datetime.utcnow().isoformat()
-            model_data = {
-                'model': self.model,
-                'user_features': self.user_features,
-                'event_features': self.event_features,
-                'scaler': self.scaler,
-                'version': self.model_version,
-                'last_trained': self.last_trained,
+            return {
+                'status': 'success',
+                'version': snapshot.version,
+                'last_trained': snapshot.last_trained,
+                'training_samples': training_samples,
                 'validation_metrics': validation_metrics
             }
 
-            model_path = os.path.join(settings.model_dir, 'recommendation_model.joblib')
-            os.makedirs(settings.model_dir, exist_ok=True)
-            joblib.dump(model_data, model_path)
+        except Exception as e:
+            logger.error(f"Error retraining model: {e}")
+            raise
+
+    def _save_model(self, snapshot: ModelSnapshot):
+        if settings.model_artifact_format == 'mmap':
+            self._loaded_version = save_artifact(self._artifact_root(), snapshot, keep=settings.model_artifact_keep)
+            return
+
+        model_data = {
+            'model': snapshot.model,
+            'user_features': self.user_features,
+            'event_features': self.event_features,
+            'scaler': self.scaler,
+            'version': snapshot.version,
+            'last_trained': snapshot.last_trained,
+            'last_updated': snapshot.last_updated,
+            'validation_metrics': snapshot.validation_metrics
+        }
+
+        model_path = os.path.join(settings.model_dir, 'recommendation_model.joblib')
+        os.makedirs(settings.model_dir, exist_ok=True)
+        joblib.dump(model_data, model_path)
+        self._loaded_version = str(os.path.getmtime(model_path))
 
-            logger.info(f"Model saved to {model_path}")
+        logger.info(f"Model saved to {model_path}")
+
+    def _db_now(self) -> Optional[datetime]:
+        """Current time on the database clock, so watermarks compare with row timestamps"""
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT NOW() AS now")
+            return cursor.fetchone()['now']
+        finally:
+            conn.close()
 
+    @staticmethod
+    def _full_retrain_due(snapshot: ModelSnapshot) -> bool:
+        if not snapshot.last_trained:
+            return True
+        last_trained = datetime.fromisoformat(snapshot.last_trained)
+        return datetime.utcnow() - last_trained >= timedelta(days=settings.retrain_threshold_days)
+
+    def update_model(self) -> Dict[str, Any]:
+        """
+        Fold interactions newer than the model's watermark into the current model
+        Only touched users' matrix rows and neighbour lists are recomputed. Runs a full
+        retrain instead when one is due or the model cannot be updated in place.
+        """
+        current = self._snapshot
+        model = current.model if current is not None else None
+        if (
+            model is None
+            or model.get('watermark') is None
+            or 'neighbour_idx' not in model
+            or self._full_retrain_due(current)
+        ):
+            logger.info("Incremental update not possible or full retrain due; retraining from scratch")
+            result = self.retrain_model()
+            result['mode'] = 'full'
+            return result
+
+        try:
+            watermark = self._db_now()
+            touched = self._fetch_touched_users(model['watermark'])
+
+            updated = dict(model)
+            if touched:
+                rows = self._fetch_user_interactions(touched)
+                updated = self._apply_interaction_delta(model, touched, rows, now=watermark)
+            updated['watermark'] = watermark
+
+            # Offline evaluation only runs at retrain; keep its results until the next one
+            validation_metrics = {**current.validation_metrics, **self._compute_validation_metrics(updated)}
+            snapshot = ModelSnapshot(
+                updated, current.version, current.last_trained, datetime.utcnow().isoformat(), validation_metrics
+            )
+            self._save_model(snapshot)
+            # Requests already holding the old snapshot finish on it; new ones see the update
+            self._publish(snapshot)
+
+            logger.info(
+                f"Incremental update applied: {len(touched)} touched users, "
+                f"{len(updated['user_ids']) - len(model['user_ids'])} new users, "
+                f"{len(updated['event_ids']) - len(model['event_ids'])} new events"
+            )
             return {
                 'status': 'success',
-                'version': self.model_version,
-                'last_trained': self.last_trained,
-                'training_samples': len(training_data),
+                'mode': 'incremental',
+                'version': snapshot.version,
+                'last_trained': snapshot.last_trained,
+                'last_updated': snapshot.last_updated,
+                'touched_users': len(touched),
+                'new_users': len(updated['user_ids']) - len(model['user_ids']),
+                'new_events': len(updated['event_ids']) - len(model['event_ids']),
                 'validation_metrics': validation_metrics
             }
 
         except Exception as e:
-            logger.error(f"Error retraining model: {e}")
+            logger.error(f"Error updating model incrementally: {e}")
             raise
 
+    def _fetch_touched_users(self, since: datetime) -> List[Any]:
+        """Users with saves, hides or save/hide feedback at or after the watermark"""
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT user_id FROM user_saved_events WHERE saved_at >= %s
+                UNION
+                SELECT user_id FROM user_hidden_events WHERE hidden_at >= %s
+                """,
+                (since, since)
+            )
+            touched = {row['user_id'] for row in cursor.fetchall()}
+
+            # Feedback can arrive before the save reaches user_saved_events; its user ids are strings
+            cursor.execute(
+                """
+                SELECT DISTINCT user_id FROM ml_feedback
+                WHERE created_at >= %s AND action IN ('save', 'hide')
+                """,
+                (since,)
+            )
+            for row in cursor.fetchall():
+                user_id = row['user_id']
+                touched.add(int(user_id) if isinstance(user_id, str) and user_id.isdigit() else user_id)
+        finally:
+            conn.close()
+
+        return sorted(touched, key=str)
+
+    def _fetch_user_interactions(self, user_ids: List[Any]) -> List[tuple]:
+        """All current saved/hidden rows for the given users, as (user_id, event_id, score, created_at)"""
+        rows: List[tuple] = []
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            for start in range(0, len(user_ids), INCREMENTAL_FETCH_CHUNK):
+                chunk = user_ids[start:start + INCREMENTAL_FETCH_CHUNK]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f"""
+                    SELECT user_id, event_id, 1.0 as interaction_score, saved_at as created_at
+                    FROM user_saved_events WHERE user_id IN ({placeholders})
+                    UNION ALL
+                    SELECT user_id, event_id, -0.5 as interaction_score, hidden_at as created_at
+                    FROM user_hidden_events WHERE user_id IN ({placeholders})
+                    """,
+                    tuple(chunk) + tuple(chunk)
+                )
+                rows.extend(
+                    (row['user_id'], row['event_id'], float(row['interaction_score']), row['created_at'])
+                    for row in cursor.fetchall()
+                )
+        finally:
+            conn.close()
+        return rows
+
+    def _apply_interaction_delta(
+        self, model: Dict[str, Any], touched: List[Any], rows: List[tuple], now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        New model dict with touched users' matrix rows replaced by their current interactions
+        New users and events are appended to the index maps; only touched users get fresh neighbours.
+        Repeated pairs are aggregated as in a full retrain; untouched rows keep their decay as of
+        the last retrain until the next one.
+        """
+        user_idx = dict(model['user_idx'])
+        event_idx = dict(model['event_idx'])
+        user_ids = list(model['user_ids'])
+        event_ids = list(model['event_ids'])
+
+        new_rows, new_cols, new_data, new_times = [], [], [], []
+        for user_id, event_id, score, created_at in rows:
+            if user_id not in user_idx:
+                user_idx[user_id] = len(user_ids)
+                user_ids.append(user_id)
+            if event_id not in event_idx:
+                event_idx[event_id] = len(event_ids)
+                event_ids.append(event_id)
+            new_rows.append(user_idx[user_id])
+            new_cols.append(event_idx[event_id])
+            new_data.append(score)
+            new_times.append(created_at)
+
+        touched_rows = np.array(sorted({user_idx[uid] for uid in touched if uid in user_idx}), dtype=np.int64)
+
+        new_rows, new_cols, new_data, _ = aggregate_interactions(
+            np.asarray(new_rows, dtype=np.int64),
+            np.asarray(new_cols, dtype=np.int64),
+            np.asarray(new_data, dtype=np.float64),
+            to_epoch_seconds(new_times),
+            len(event_ids),
+            settings.interaction_aggregation,
+            settings.interaction_half_life_days,
+            epoch_seconds(now)
+        )
+
+        # Keep every untouched row as is and replace the touched ones
+        old = model['interaction_matrix'].tocoo()
+        keep = ~np.isin(old.row, touched_rows)
+        matrix = csr_matrix(
+            (
+                np.concatenate([old.data[keep], np.asarray(new_data, dtype=np.float64)]),
+                (
+                    np.concatenate([old.row[keep], np.asarray(new_rows, dtype=old.row.dtype)]),
+                    np.concatenate([old.col[keep], np.asarray(new_cols, dtype=old.col.dtype)])
+                )
+            ),
+            shape=(len(user_ids), len(event_ids))
+        )
+
+        k = model['neighbour_idx'].shape[1]
+        added = len(user_ids) - len(model['user_ids'])
+        neighbour_idx = np.vstack([model['neighbour_idx'], np.full((added, k), -1, dtype=np.int32)])
+        neighbour_scores = np.vstack([model['neighbour_scores'], np.zeros((added, k), dtype=np.float32)])
+
+        # Untouched users keep their neighbour lists until the next full retrain
+        normalized = normalize_rows(matrix)
+        normalized_t = normalized.T.tocsr()
+        block_rows = max(1, settings.cf_similarity_block_rows)
+        for start in range(0, len(touched_rows), block_rows):
+            block = touched_rows[start:start + block_rows]
+            neighbour_idx[block], neighbour_scores[block] = top_k_rows(normalized, normalized_t, block, k)
+
+        return {
+            **model,
+            'interaction_matrix': matrix,
+            'user_idx': user_idx,
+            'event_idx': event_idx,
+            'user_ids': np.array(user_ids),
+            'event_ids': np.array(event_ids),
+            'neighbour_idx': neighbour_idx,
+            'neighbour_scores': neighbour_scores
+        }
+
     def predict(
         self,
         user_id: str,
@@ -288,58 +901,158 @@ class RecommendationEngine:
         Generate personalized event recommendations for a user
         Supports multiple algorithm variants for A/B testing
         """
+        return self.predict_with_status(user_id, city, limit, variant, context)[0]
+
+    def predict_with_status(
+        self,
+        user_id: str,
+        city: Optional[str] = None,
+        limit: int = 20,
+        variant: str = 'control',
+        context: Optional[Dict[str, Any]] = None
+    ) -> tuple:
+        """
+        predict() plus whether the result is degraded and should not be cached
+        Degraded means a hybrid generator was dropped or the popularity fallback stood in for the model
+        """
         try:
-            if not self.is_model_loaded or self.model is None:
+            # One snapshot for the whole request, even if a retrain is published meanwhile
+            model = self.model
+            if model is None:
                 logger.warning("Model not loaded, returning fallback recommendations")
                 fallback = self._get_fallback_recommendations(user_id, city, limit)
-                return self._apply_context_boost(fallback, context)
+                return self._apply_context_boost(fallback, context), True
 
+            degraded = False
             # Select algorithm based on A/B test variant
             if variant == 'collaborative_filtering':
-                recommendations = self._collaborative_filtering_recommendations(user_id, city, limit)
+                recommendations = self._timed(
+                    'collaborative_filtering',
+                    lambda: self._collaborative_filtering_recommendations(model, user_id, city, limit)
+                )
             elif variant == 'content_based':
-                recommendations = self._content_based_recommendations(user_id, city, limit)
+                recommendations = self._timed(
+                    'content_based', lambda: self._content_based_recommendations(model, user_id, city, limit)
+                )
             elif variant == 'hybrid':
-                recommendations = self._hybrid_recommendations(user_id, city, limit)
+                recommendations, degraded = self._hybrid_recommendations(model, user_id, city, limit)
             else:
                 # Control: simple popularity-based
-                recommendations = self._popularity_recommendations(city, limit)
+                recommendations = self._timed('popularity', lambda: self._popularity_recommendations(city, limit))
 
-            recommendations = self._apply_context_boost(recommendations, context)
-            return recommendations
+            with tracing.span('context_boost'):
+                recommendations = self._apply_context_boost(recommendations, context)
+            return recommendations, degraded
 
         except Exception as e:
             logger.error(f"Error generating recommendations: {e}")
             fallback = self._get_fallback_recommendations(user_id, city, limit)
-            return self._apply_context_boost(fallback, context)
+            return self._apply_context_boost(fallback, context), True
 
-    def _normalize_token(self, value: Any) -> str:
-        return str(value or '').lower().strip()
+    def predict_batch(self, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Generate recommendations for many users in one call
+        Each request holds user_id, city, limit, variant and context; results keep request order.
+        Users are grouped by variant so each CF group is scored with one sparse product.
+        """
+        return self.predict_batch_with_status(requests)[0]
 
-    def _tokenize(self, value: Any) -> List[str]:
-        if value is None:
-            return []
+    def predict_batch_with_status(self, requests: List[Dict[str, Any]]) -> tuple:
+        """predict_batch() plus whether the popularity fallback stood in for the model"""
+        results: List[List[Dict[str, Any]]] = [[] for _ in requests]
 
-        if isinstance(value, list):
-            tokens: List[str] = []
-            for item in value:
-                tokens.extend(self._tokenize(item))
-            return tokens
-
-        if isinstance(value, dict):
-            # Support context shapes like {name: "..."} or {genre: "..."}.
-            if 'name' in value:
-                return self._tokenize(value.get('name'))
-            if 'genre' in value:
-                return self._tokenize(value.get('genre'))
-            return []
-
-        text = self._normalize_token(value)
-        if not text:
-            return []
+        try:
+            model = self.model
+            if model is None:
+                logger.warning("Model not loaded, returning fallback recommendations")
+                for i, req in enumerate(requests):
+                    fallback = self._get_fallback_recommendations(req['user_id'], req.get('city'), req['limit'])
+                    results[i] = self._apply_context_boost(fallback, req.get('context'))
+                return results, True
+
+            groups: Dict[str, List[int]] = defaultdict(list)
+            for i, req in enumerate(requests):
+                groups[req.get('variant') or settings.control_variant].append(i)
+
+            # Popularity lists only depend on (city, limit)
+            popular_cache: Dict[tuple, List[Dict[str, Any]]] = {}
+
+            def popular(city: Optional[str], limit: int) -> List[Dict[str, Any]]:
+                key = (normalize_city(city), limit)
+                if key not in popular_cache:
+                    popular_cache[key] = self._popularity_recommendations(city, limit)
+                return [dict(rec) for rec in popular_cache[key]]
+
+            # Content scores for the content_based and hybrid groups in one pass
+            content_indices = groups.get('content_based', []) + groups.get('hybrid', [])
+            content_recs = dict(zip(content_indices, self._timed(
+                'content_based_batch',
+                lambda: self._content_recommendations_batch(model, [
+                    (requests[i]['user_id'], requests[i].get('city'), requests[i]['limit']) for i in content_indices
+                ])
+            )))
+
+            # Score every CF group with one product each; candidates are limited to each request's city
+            mask = self._candidate_mask_for(model)
+            cf_users: Dict[int, tuple] = {}
+            cf_columns: Dict[int, np.ndarray] = {}
+
+            def score_cf_groups():
+                for variant in ('collaborative_filtering', 'hybrid'):
+                    indices = groups.get(variant, [])
+                    known = [
+                        (i, self._user_index(model, requests[i]['user_id']),
+                         self._overlay_state(model, requests[i]['user_id']))
+                        for i in indices
+                    ]
+                    known = [entry for entry in known if entry[1] is not None or entry[2] is not None]
+                    if not known:
+                        continue
+                    top_events = self._cf_top_events_batch(
+                        model,
+                        [user_idx for _, user_idx, _ in known],
+                        [requests[i]['limit'] for i, _, _ in known],
+                        [overlay for _, _, overlay in known],
+                        [requests[i].get('city') for i, _, _ in known],
+                        mask
+                    )
+                    for (i, user_idx, overlay), (top_event_indices, _scores) in zip(known, top_events):
+                        cf_users[i] = (user_idx, overlay)
+                        cf_columns[i] = top_event_indices
+
+            self._timed('collaborative_filtering_batch', score_cf_groups)
+
+            def cf_recommendations(i: int) -> List[Dict[str, Any]]:
+                req = requests[i]
+                if i not in cf_columns:
+                    # New user: cold start with popularity
+                    return popular(req.get('city'), req['limit'])
+                user_idx, overlay = cf_users[i]
+                recs = self._cf_rows(model, mask, cf_columns[i], req.get('city'))
+                return self._pad_with_popular(recs, model, user_idx, overlay, req.get('city'), req['limit'])
+
+            for variant, indices in groups.items():
+                for i in indices:
+                    req = requests[i]
+                    city, limit = req.get('city'), req['limit']
+                    if variant == 'collaborative_filtering':
+                        recs = cf_recommendations(i)
+                    elif variant == 'content_based':
+                        recs = content_recs[i]
+                    elif variant == 'hybrid':
+                        recs = self._merge_hybrid(cf_recommendations(i), content_recs[i], limit)
+                    else:
+                        recs = popular(city, limit)
+                    results[i] = self._apply_context_boost(recs, req.get('context'))
+
+            return results, False
 
-        text = text.replace('|', ',').replace('/', ',').replace(';', ',')
-        return [part.strip() for part in text.split(',') if part.strip()]
+        except Exception as e:
+            logger.error(f"Error generating batch recommendations: {e}")
+            for i, req in enumerate(requests):
+                fallback = self._get_fallback_recommendations(req['user_id'], req.get('city'), req['limit'])
+                results[i] = self._apply_context_boost(fallback, req.get('context'))
+            return results, True
 
     def _extract_context_tokens(self, context: Optional[Dict[str, Any]]) -> tuple[Set[str], Set[str]]:
         if not context or not isinstance(context, dict):
@@ -350,13 +1063,13 @@ class RecommendationEngine:
 
         genre_tokens: Set[str] = set()
         for key in genre_keys:
-            for token in self._tokenize(context.get(key)):
+            for token in split_tokens(context.get(key)):
                 if token:
                     genre_tokens.add(token)
 
         artist_tokens: Set[str] = set()
         for key in artist_keys:
-            for token in self._tokenize(context.get(key)):
+            for token in split_tokens(context.get(key)):
                 if token:
                     artist_tokens.add(token)
 
@@ -374,150 +1087,479 @@ class RecommendationEngine:
         if not genre_tokens and not artist_tokens:
             return recommendations
 
+        cols = self.catalog.columns
+        if cols is None:
+            return recommendations
+
+        # Match counts come from the catalog's interned token matrices, one sparse product per kind
+        positions = np.array(
+            [cols.position(rec.get('event_id')) for rec in recommendations], dtype=object
+        )
+        known = np.array([pos is not None for pos in positions], dtype=bool)
+        genre_counts = np.zeros(len(recommendations), dtype=np.int64)
+        artist_counts = np.zeros(len(recommendations), dtype=np.int64)
+        genre_counts[known], artist_counts[known] = cols.context_match_counts(
+            positions[known].astype(np.int64), sorted(genre_tokens), sorted(artist_tokens)
+        )
+
+        base_scores = np.array([float(rec.get('score') or 0.0) for rec in recommendations])
+        scores = np.round(
+            base_scores + np.minimum(genre_counts, 3) * 0.15 + np.minimum(artist_counts, 2) * 0.25, 4
+        )
+
         boosted: List[Dict[str, Any]] = []
-        for recommendation in recommendations:
-            row = dict(recommendation)
-            base_score = float(row.get('score') or 0.0)
-            reasons = row.get('context_reasons', [])
-            if not isinstance(reasons, list):
-                reasons = []
-
-            title_blob = self._normalize_token(
-                f"{row.get('title', '')} {row.get('artist_name', '')}"
-            )
-            rec_genres = set(self._tokenize(row.get('genre') or row.get('genres')))
-            genre_match_count = 0
-            for token in genre_tokens:
-                if any(token in genre or genre in token for genre in rec_genres):
-                    genre_match_count += 1
-            if genre_match_count > 0:
-                base_score += min(genre_match_count, 3) * 0.15
-                reasons.append('taste_genre_match')
-
-            artist_match_count = 0
-            for token in artist_tokens:
-                if token and token in title_blob:
-                    artist_match_count += 1
-            if artist_match_count > 0:
-                base_score += min(artist_match_count, 2) * 0.25
-                reasons.append('taste_artist_match')
-
-            row['score'] = float(round(base_score, 4))
-            if reasons:
+        for i in np.argsort(-scores, kind='stable').tolist():
+            row = {**recommendations[i], 'score': float(scores[i])}
+            if genre_counts[i] or artist_counts[i]:
+                reasons = row.get('context_reasons', [])
+                reasons = list(reasons) if isinstance(reasons, list) else []
+                if genre_counts[i]:
+                    reasons.append('taste_genre_match')
+                if artist_counts[i]:
+                    reasons.append('taste_artist_match')
                 row['context_reasons'] = list(dict.fromkeys(reasons))
             boosted.append(row)
-
-        boosted.sort(key=lambda item: float(item.get('score') or 0.0), reverse=True)
         return boosted
 
     def _collaborative_filtering_recommendations(
         self,
+        model: Dict[str, Any],
         user_id: str,
         city: Optional[str],
         limit: int
     ) -> List[Dict[str, Any]]:
         """Generate recommendations using collaborative filtering"""
         try:
-            user_idx = self.model['user_idx'].get(user_id)
+            user_idx = self._user_index(model, user_id)
+            with tracing.span('cf_overlay'):
+                overlay = self._overlay_state(model, user_id)
 
-            if user_idx is None:
+            if user_idx is None and overlay is None:
                 # New user: cold start with popularity
                 return self._popularity_recommendations(city, limit)
 
-            # Get similar users
-            user_similarity = self.model['user_similarity'][user_idx].toarray().flatten()
-            similar_users_idx = np.argsort(user_similarity)[::-1][1:11]  # Top 10 similar users
+            # Only upcoming events in the requested city are scored and ranked
+            mask = self._candidate_mask_for(model)
+            with tracing.span('cf_scoring'):
+                top_event_indices, _ = self._cf_top_events(model, user_idx, limit, overlay, city=city, mask=mask)
+
+            with tracing.span('candidate_fetch'):
+                recommendations = self._cf_rows(model, mask, top_event_indices, city)
+                return self._pad_with_popular(recommendations, model, user_idx, overlay, city, limit)
+
+        except Exception as e:
+            logger.error(f"Error in collaborative filtering: {e}")
+            return []
 
-            # Get events liked by similar users
-            interaction_matrix = self.model['interaction_matrix']
-            recommended_scores = np.zeros(interaction_matrix.shape[1])
+    def _cf_top_events(
+        self,
+        model: Dict[str, Any],
+        user_idx: Optional[int],
+        limit: int,
+        overlay: Optional[tuple] = None,
+        city: Optional[str] = None,
+        mask: Optional[CandidateMask] = None
+    ) -> tuple:
+        """
+        Score events for a user from their neighbours' interactions
+        overlay, when the user has pending feedback, replaces their stored neighbours and saved events;
+        mask, when given, limits candidates to upcoming events in city before the top limit is taken
+        Returns (event column indices, scores), best first, positive scores only
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        similar_users_idx, similarity_scores = (
+            overlay[:2] if overlay is not None else self._user_neighbours(model, user_idx)
+        )
+        if len(similar_users_idx) == 0 or limit <= 0:
+            return empty
 
-            for sim_user_idx in similar_users_idx:
-                sim_score = user_similarity[sim_user_idx]
-                recommended_scores += sim_score * interaction_matrix[sim_user_idx].toarray().flatten()
+        interaction_matrix = model['interaction_matrix']
 
-            # Get user's already interacted events
-            user_events = interaction_matrix[user_idx].toarray().flatten()
+        # One sparse (1 x K) @ (K x n_events) product; only events a neighbour touched come back
+        weights = csr_matrix(np.asarray(similarity_scores, dtype=np.float64).reshape(1, -1))
+        scored = (weights @ interaction_matrix[similar_users_idx]).tocsr()
+        return self._select_top_events(
+            model, user_idx, scored.indices, scored.data, limit, overlay[2] if overlay is not None else None,
+            city, mask
+        )
 
-            # Filter out already interacted events
-            recommended_scores[user_events > 0] = -np.inf
+    def _cf_top_events_batch(
+        self,
+        model: Dict[str, Any],
+        user_indices: List[Optional[int]],
+        limits: List[int],
+        overlays: Optional[List[Optional[tuple]]] = None,
+        cities: Optional[List[Optional[str]]] = None,
+        mask: Optional[CandidateMask] = None
+    ) -> List[tuple]:
+        """
+        Batch version of _cf_top_events
+        Scores all users with one (n_users_in_batch x n_users) @ (n_users x n_events) sparse product
+        """
+        overlays = overlays or [None] * len(user_indices)
+        cities = cities or [None] * len(user_indices)
+        rows, cols, weights = [], [], []
+        for row, (user_idx, overlay) in enumerate(zip(user_indices, overlays)):
+            similar_users_idx, similarity_scores = (
+                overlay[:2] if overlay is not None else self._user_neighbours(model, int(user_idx))
+            )
+            rows.append(np.full(len(similar_users_idx), row, dtype=np.int64))
+            cols.append(np.asarray(similar_users_idx, dtype=np.int64))
+            weights.append(np.asarray(similarity_scores, dtype=np.float64))
+
+        interaction_matrix = model['interaction_matrix']
+        weight_matrix = csr_matrix(
+            (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(user_indices), interaction_matrix.shape[0])
+        )
+        scored = (weight_matrix @ interaction_matrix).tocsr()
+
+        results = []
+        for row, (user_idx, limit, overlay, city) in enumerate(zip(user_indices, limits, overlays, cities)):
+            start, stop = scored.indptr[row], scored.indptr[row + 1]
+            results.append(self._select_top_events(
+                model, user_idx, scored.indices[start:stop], scored.data[start:stop], limit,
+                overlay[2] if overlay is not None else None, city, mask
+            ))
+        return results
+
+    def _select_top_events(
+        self,
+        model: Dict[str, Any],
+        user_idx: Optional[int],
+        candidates: np.ndarray,
+        candidate_scores: np.ndarray,
+        limit: int,
+        saved: Optional[np.ndarray] = None,
+        city: Optional[str] = None,
+        mask: Optional[CandidateMask] = None
+    ) -> tuple:
+        """Drop non-positive, already-saved and (with a mask) unservable candidates, then pick the top limit"""
+        candidates = np.asarray(candidates, dtype=np.int64)
+
+        keep = candidate_scores > 0
+        if mask is not None:
+            keep &= mask.keep(candidates, city, self.catalog.now())
+
+        # Filter out events the user already saved
+        if saved is None:
+            saved = self._saved_events(model, user_idx)
+        keep &= ~np.isin(candidates, saved)
+        return self._top_k(candidates[keep], candidate_scores[keep], limit)
+
+    @staticmethod
+    def _top_k(candidates: np.ndarray, candidate_scores: np.ndarray, limit: int) -> tuple:
+        """Best limit candidates by score without sorting them all; ties go to the lowest index"""
+        if len(candidates) == 0 or limit <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        if len(candidates) > limit:
+            kth = np.partition(candidate_scores, len(candidates) - limit)[len(candidates) - limit]
+            above = np.flatnonzero(candidate_scores > kth)
+            ties = np.flatnonzero(candidate_scores == kth)
+            ties = ties[np.argsort(candidates[ties], kind='stable')][:limit - len(above)]
+            top = np.concatenate([above, ties])
+            candidates = candidates[top]
+            candidate_scores = candidate_scores[top]
+        order = np.lexsort((candidates, -candidate_scores))
+        return candidates[order], candidate_scores[order]
+
+    @staticmethod
+    def _saved_events(model: Dict[str, Any], user_idx: Optional[int]) -> np.ndarray:
+        """Event columns the user has a positive interaction with in the stored matrix"""
+        if user_idx is None:
+            return np.empty(0, dtype=np.int64)
+        interaction_matrix = model['interaction_matrix']
+        start, stop = interaction_matrix.indptr[user_idx], interaction_matrix.indptr[user_idx + 1]
+        return interaction_matrix.indices[start:stop][interaction_matrix.data[start:stop] > 0]
+
+    @staticmethod
+    def _lookup(index: Any, key: Any) -> Optional[int]:
+        """Position of an id; API ids arrive as strings, database ids are ints"""
+        position = index.get(key)
+        if position is None and isinstance(key, str) and key.isdigit():
+            position = index.get(int(key))
+        return position
+
+    @classmethod
+    def _user_index(cls, model: Dict[str, Any], user_id: str) -> Optional[int]:
+        """Matrix row for a user"""
+        return cls._lookup(model['user_idx'], user_id)
+
+    def apply_feedback(self, user_id: str, event_id: str, action: str):
+        """Overlay a save or hide on the user's row so their next CF request reflects it"""
+        score = FEEDBACK_SCORES.get(action)
+        if score is not None:
+            self.overlay.record(user_id, event_id, score)
+
+    def is_new_save(self, user_id: str, event_id: str) -> bool:
+        """
+        Whether a save may add a user_saved_events row: the user has not saved the event
+        according to the published model or their pending feedback. Saves since the model
+        that the overlay has dropped are caught by PopularityIndex.record_save
+        """
+        pending = self.overlay.score(user_id, event_id)
+        if pending is not None and pending > 0:
+            return False
+        model = self.model
+        return model is None or not self._base_reflects(model, user_id, event_id, FEEDBACK_SCORES['save'])
 
-            # Get top recommendations
-            top_event_indices = np.argsort(recommended_scores)[::-1][:limit]
+    def _overlay_state(self, model: Dict[str, Any], user_id: str) -> Optional[tuple]:
+        """
+        (neighbour indices, neighbour scores, saved event columns, interacted event columns)
+        for a user with pending feedback
+        """
+        if not self.overlay.enabled:
+            return None
+        return self.overlay.resolve(
+            user_id, model, lambda m, interactions: self._derive_overlay_state(m, user_id, interactions)
+        )
 
-            event_idx_reverse = {idx: eid for eid, idx in self.model['event_idx'].items()}
-            recommended_event_ids = [event_idx_reverse[idx] for idx in top_event_indices if recommended_scores[idx] > 0]
+    def _derive_overlay_state(self, model: Dict[str, Any], user_id: str, interactions: Dict[Any, float]) -> tuple:
+        """Apply pending interactions to the user's stored row and search neighbours for the result"""
+        interaction_matrix = model['interaction_matrix']
+        user_idx = self._user_index(model, user_id)
+
+        row: Dict[int, float] = {}
+        if user_idx is not None:
+            start, stop = interaction_matrix.indptr[user_idx], interaction_matrix.indptr[user_idx + 1]
+            row = dict(zip(
+                interaction_matrix.indices[start:stop].tolist(), interaction_matrix.data[start:stop].tolist()
+            ))
+        for event_id, score in interactions.items():
+            col = self._lookup(model['event_idx'], event_id)
+            # Events the model has never seen have no column to score against yet
+            if col is None:
+                continue
+            if settings.interaction_aggregation == 'decayed_sum':
+                row[col] = row.get(col, 0.0) + score
+            else:
+                row[col] = score
 
-            # Fetch event details
-            recommendations = self._fetch_event_details(recommended_event_ids, city)
+        cols = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+        data = np.fromiter(row.values(), dtype=np.float64, count=len(row))
+        vector = normalize_rows(csr_matrix(
+            (data, (np.zeros(len(cols), dtype=np.int64), cols)), shape=(1, interaction_matrix.shape[1])
+        ))
+        similarities = (vector @ self._overlay_normalized_t(model)).toarray()
+        own = np.array([-1 if user_idx is None else user_idx], dtype=np.int64)
+        indices, scores = top_k_similar(similarities, own, settings.cf_neighbours_k)
 
-            return recommendations
+        valid = indices[0] >= 0
+        return indices[0][valid], scores[0][valid], cols[data > 0], cols
 
-        except Exception as e:
-            logger.error(f"Error in collaborative filtering: {e}")
-            return []
+    def _overlay_normalized_t(self, model: Dict[str, Any]) -> csr_matrix:
+        """
+        Transposed row-normalised interaction matrix of a model, built by _publish
+        A request still holding a replaced model builds its own without displacing the current one
+        """
+        basis = self._overlay_basis
+        if basis is not None and basis[0] is model:
+            return basis[1]
+        normalized_t = normalize_rows(model['interaction_matrix']).T.tocsr()
+        if model is self.model:
+            self._overlay_basis = (model, normalized_t)
+        return normalized_t
+
+    def _base_reflects(self, model: Dict[str, Any], user_key: str, event_id: Any, score: float) -> bool:
+        """Whether a model's stored row already has this interaction (same sign)"""
+        user_idx = self._user_index(model, user_key)
+        col = self._lookup(model['event_idx'], event_id)
+        if user_idx is None or col is None:
+            return False
+        return float(model['interaction_matrix'][user_idx, col]) * score > 0
+
+    @staticmethod
+    def _user_neighbours(model: Dict[str, Any], user_idx: int) -> tuple:
+        """Indices and similarity scores of a user's nearest neighbours"""
+        if 'neighbour_idx' in model:
+            # O(K) read from the precomputed neighbour table
+            indices = model['neighbour_idx'][user_idx]
+            valid = indices >= 0
+            return indices[valid], model['neighbour_scores'][user_idx][valid]
+
+        # Legacy dense similarity matrix
+        user_similarity = model['user_similarity'][user_idx].toarray().flatten()
+        user_similarity[user_idx] = -np.inf
+        similar_users_idx = np.argsort(user_similarity)[::-1][:settings.cf_neighbours_k]
+        scores = user_similarity[similar_users_idx]
+        # Same neighbour set as the top-K table: never the user, never zero-similarity users
+        keep = np.isfinite(scores) & (scores > 0)
+        return similar_users_idx[keep], scores[keep]
 
     def _content_based_recommendations(
         self,
+        model: Dict[str, Any],
         user_id: str,
         city: Optional[str],
         limit: int
     ) -> List[Dict[str, Any]]:
         """Generate recommendations using content-based filtering"""
-        # Simplified content-based (genre/artist matching)
-        conn = self.get_db_connection()
         try:
-            query = """
-            SELECT e.id, e.title, e.title as artist_name, e.genres as genre, e.city,
-                   e.start_time as date, e.price_min as price, e.venue_name,
-                   0.5 as score
-            FROM events e
-            WHERE e.start_time >= NOW()
-            """
-
-            params = []
-
-            if city:
-                query += " AND LOWER(e.city) = LOWER(%s)"
-                params.append(city)
-
-            query += " ORDER BY e.start_time ASC LIMIT %s"
-            params.append(limit)
-
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-
-            return [{
-                'event_id': r['id'],
-                'title': r['title'],
-                'artist_name': r['artist_name'],
-                'genre': r['genre'],
-                'city': r['city'],
-                'date': r['date'].isoformat() if r['date'] else None,
-                'price': float(r['price']) if r['price'] else None,
-                'venue_name': r['venue_name'],
-                'score': float(r['score']),
-                'algorithm': 'content_based'
-            } for r in results]
-
+            with tracing.span('content_scoring'):
+                return self._content_recommendations_batch(model, [(user_id, city, limit)])[0]
         except Exception as e:
             logger.error(f"Error in content-based recommendations: {e}")
             return []
-        finally:
-            conn.close()
+
+    def _content_recommendations_batch(
+        self,
+        model: Dict[str, Any],
+        requests: List[tuple]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Content-based recommendations for (user_id, city, limit) requests
+        Profiles are scored against every catalog event with sparse products; users
+        without a profile get the soonest upcoming events
+        """
+        content = model.get('content') if model else None
+        cols = self.catalog.columns
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(requests)
+
+        rows = [content.user_row(user_id) if content is not None else None for user_id, _, _ in requests]
+        known = [i for i, row in enumerate(rows) if row is not None]
+        if known and cols is not None and len(cols) > 0:
+            event_matrix_t = self._content_event_matrix(content, cols)
+            now = self.catalog.now()
+            for start in range(0, len(known), CONTENT_SCORING_CHUNK):
+                chunk = known[start:start + CONTENT_SCORING_CHUNK]
+                scored = (content.profiles[[rows[i] for i in chunk]] @ event_matrix_t).tocsr()
+                for r, i in enumerate(chunk):
+                    user_id, city, limit = requests[i]
+                    lo, hi = scored.indptr[r], scored.indptr[r + 1]
+                    positions, scores = self._select_content_events(
+                        model, cols, user_id, city, scored.indices[lo:hi], scored.data[lo:hi], limit, now
+                    )
+                    recs = EventCatalog.materialize(cols, positions, 'content_based', scores)
+                    results[i] = self._pad_with_soonest(recs, city, limit)
+
+        for i, (_, city, limit) in enumerate(requests):
+            if results[i] is None:
+                results[i] = self.catalog.soonest(city, limit)
+        return results
+
+    def _content_event_matrix(self, content: ContentModel, cols) -> csr_matrix:
+        """(vocabulary x catalog events) token matrix, rebuilt when the catalog or model changes"""
+        cached = self._content_index
+        if cached is not None and cached[0] is cols and cached[1] is content:
+            return cached[2]
+
+        event_matrix_t = content.event_matrix(cols.genre.tolist(), cols.title.tolist()).T.tocsr()
+        self._content_index = (cols, content, event_matrix_t)
+        return event_matrix_t
+
+    def _select_content_events(
+        self,
+        model: Dict[str, Any],
+        cols,
+        user_id: str,
+        city: Optional[str],
+        candidates: np.ndarray,
+        candidate_scores: np.ndarray,
+        limit: int,
+        now: np.datetime64
+    ) -> tuple:
+        """Keep upcoming, in-city events the user has not saved or hidden; best scores first"""
+        keep = (candidate_scores > 0) & (cols.start_time[candidates] >= now)
+        if city:
+            keep &= cols.city_key[candidates] == normalize_city(city)
+
+        user_idx = self._user_index(model, user_id)
+        if user_idx is not None:
+            matrix = model['interaction_matrix']
+            seen_ids = model['event_ids'][matrix.indices[matrix.indptr[user_idx]:matrix.indptr[user_idx + 1]]]
+            seen = [cols.position(eid) for eid in seen_ids.tolist()]
+            keep &= ~np.isin(candidates, [pos for pos in seen if pos is not None])
+
+        return self._top_k(candidates[keep].astype(np.int64), candidate_scores[keep], limit)
+
+    def _pad_with_soonest(self, recs: List[Dict[str, Any]], city: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """Fill a short content list with the soonest events, scored 0 so matches stay on top"""
+        if len(recs) >= limit:
+            return recs
+        chosen = {rec['event_id'] for rec in recs}
+        for rec in self.catalog.soonest(city, limit + len(recs)):
+            if rec['event_id'] not in chosen:
+                recs.append({**rec, 'score': 0.0})
+                if len(recs) == limit:
+                    break
+        return recs
 
     def _hybrid_recommendations(
         self,
+        model: Dict[str, Any],
         user_id: str,
         city: Optional[str],
         limit: int
-    ) -> List[Dict[str, Any]]:
-        """Hybrid approach: combine collaborative and content-based"""
-        # Get both types of recommendations
-        cf_recs = self._collaborative_filtering_recommendations(user_id, city, limit)
-        cb_recs = self._content_based_recommendations(user_id, city, limit)
+    ) -> tuple:
+        """
+        Hybrid approach: combine collaborative and content-based
+        Returns (recommendations, whether a generator was dropped)
+        """
+        # Retrieve both concurrently; a generator that misses its deadline is left out of the merge
+        generators = {
+            'collaborative_filtering': lambda: self._collaborative_filtering_recommendations(
+                model, user_id, city, limit
+            ),
+            'content_based': lambda: self._content_based_recommendations(model, user_id, city, limit)
+        }
+        candidates = self._run_generators(generators)
+
+        with tracing.span('hybrid_merge'):
+            recommendations = self._merge_hybrid(
+                candidates.get('collaborative_filtering', []), candidates.get('content_based', []), limit
+            )
+        return recommendations, len(candidates) < len(generators)
+
+    def _run_generators(
+        self,
+        generators: Dict[str, Callable[[], List[Dict[str, Any]]]],
+        timeout_ms: Optional[float] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Run candidate generators concurrently and return the ones that finish in time
+        Late generators keep running in the pool but their results are discarded
+        """
+        timeout_ms = timeout_ms if timeout_ms is not None else settings.generator_timeout_ms
+        start = time.perf_counter()
+        futures = {
+            name: self._generator_pool.submit(tracing.bind(self._timed), name, generator)
+            for name, generator in generators.items()
+        }
+        done, _ = wait(futures.values(), timeout=timeout_ms / 1000)
+
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        for name, future in futures.items():
+            if future not in done:
+                logger.warning(f"Candidate generator {name} missed its {timeout_ms:.0f}ms deadline, dropping it")
+                self._record_generator(name, (time.perf_counter() - start) * 1000, timed_out=True)
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Candidate generator {name} failed: {e}")
+        return results
+
+    def _timed(self, name: str, generator: Callable[[], Any]) -> Any:
+        """Run a candidate generator and record how long it took"""
+        start = time.perf_counter()
+        try:
+            with tracing.span(f'generate.{name}'):
+                return generator()
+        finally:
+            self._record_generator(name, (time.perf_counter() - start) * 1000)
+
+    def _record_generator(self, name: str, duration_ms: float, timed_out: bool = False):
+        if self.metrics_collector is not None:
+            self.metrics_collector.record_generator(name, duration_ms, timed_out)
 
+    def _merge_hybrid(
+        self,
+        cf_recs: List[Dict[str, Any]],
+        cb_recs: List[Dict[str, Any]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Weighted merge of collaborative and content-based lists"""
         # Merge and deduplicate
         all_recs = {}
         for rec in cf_recs:
@@ -536,91 +1578,96 @@ class RecommendationEngine:
 
     def _popularity_recommendations(self, city: Optional[str], limit: int) -> List[Dict[str, Any]]:
         """Fallback: popularity-based recommendations"""
-        conn = self.get_db_connection()
         try:
-            query = """
-            SELECT e.id, e.title, e.title as artist_name, e.genres as genre, e.city,
-                   e.start_time as date, e.price_min as price, e.venue_name,
-                   COUNT(se.event_id) as save_count
-            FROM events e
-            LEFT JOIN user_saved_events se ON e.id = se.event_id
-            WHERE e.start_time >= NOW()
-            """
-
-            params = []
-            if city:
-                query += " AND LOWER(e.city) = LOWER(%s)"
-                params.append(city)
-
-            query += " GROUP BY e.id ORDER BY save_count DESC, e.start_time ASC LIMIT %s"
-            params.append(limit)
-
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-
-            return [{
-                'event_id': r['id'],
-                'title': r['title'],
-                'artist_name': r['artist_name'],
-                'genre': r['genre'],
-                'city': r['city'],
-                'date': r['date'].isoformat() if r['date'] else None,
-                'price': float(r['price']) if r['price'] else None,
-                'venue_name': r['venue_name'],
-                'score': float(r['save_count'] or 0),
-                'algorithm': 'popularity'
-            } for r in results]
-
+            return self.popularity.top(city, limit)
         except Exception as e:
             logger.error(f"Error in popularity recommendations: {e}")
             return []
-        finally:
-            conn.close()
+
+    def _candidate_mask_for(self, model: Dict[str, Any]) -> Optional[CandidateMask]:
+        """Servable CF columns for this model and the current catalog; None until the catalog loads"""
+        cols = self.catalog.columns
+        mask = self._candidate_mask
+        if mask is not None and mask.matches(model, cols):
+            return mask
+        if cols is None:
+            return None
+        try:
+            mask = CandidateMask(self._event_index_for(model), model['event_ids'], cols)
+        except Exception as e:
+            logger.error(f"Error building CF candidate mask: {e}")
+            return None
+        self._candidate_mask = mask
+        return mask
+
+    def _event_index_for(self, model: Dict[str, Any]) -> IdIndex:
+        """Sorted event id index of a model, built once per model when it only has a dict"""
+        if isinstance(model['event_idx'], IdIndex):
+            return model['event_idx']
+        cached = self._event_index
+        if cached is None or cached[0] is not model:
+            cached = (model, IdIndex.from_ids(model['event_ids']))
+            self._event_index = cached
+        return cached[1]
+
+    def _refresh_candidate_mask(self):
+        """Rebuild the mask off the request path when the model or catalog snapshot changes"""
+        model = self.model
+        if model is not None:
+            self._candidate_mask_for(model)
+
+    def _cf_rows(
+        self,
+        model: Dict[str, Any],
+        mask: Optional[CandidateMask],
+        columns: np.ndarray,
+        city: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """API rows for ranked CF columns; masked columns are already upcoming and in the city"""
+        if mask is not None:
+            return EventCatalog.materialize(mask.cols, mask.positions(columns), 'collaborative_filtering')
+        # event_ids is the stored index -> event_id array
+        return self._fetch_event_details(model['event_ids'][columns].tolist(), city)
+
+    def _pad_with_popular(
+        self,
+        recs: List[Dict[str, Any]],
+        model: Dict[str, Any],
+        user_idx: Optional[int],
+        overlay: Optional[tuple],
+        city: Optional[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Fill a short CF list with the city's most-saved events the user has not interacted with, scored 0"""
+        if len(recs) >= limit:
+            return recs
+        if overlay is not None:
+            # Hides as well as saves, like the stored row below
+            seen_columns = overlay[3]
+        elif user_idx is not None:
+            matrix = model['interaction_matrix']
+            seen_columns = matrix.indices[matrix.indptr[user_idx]:matrix.indptr[user_idx + 1]]
+        else:
+            seen_columns = np.empty(0, dtype=np.int64)
+        skip = {rec['event_id'] for rec in recs} | set(model['event_ids'][seen_columns].tolist())
+
+        for rec in self._popularity_recommendations(city, limit + len(skip)):
+            if rec['event_id'] not in skip:
+                recs.append({**rec, 'score': 0.0})
+                if len(recs) == limit:
+                    break
+        return recs
 
     def _fetch_event_details(self, event_ids: List[str], city: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Fetch full event details from database"""
+        """Look up upcoming event details in the in-memory catalog, keeping the ranked order"""
         if not event_ids:
             return []
 
-        conn = self.get_db_connection()
         try:
-            placeholders = ','.join(['%s'] * len(event_ids))
-            query = f"""
-            SELECT id, title, title as artist_name, genres as genre, city,
-                   start_time as date, price_min as price, venue_name
-            FROM events
-            WHERE id IN ({placeholders})
-            AND start_time >= NOW()
-            """
-
-            params = event_ids
-
-            if city:
-                query += " AND city = %s"
-                params.append(city)
-
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-
-            return [{
-                'event_id': r['id'],
-                'title': r['title'],
-                'artist_name': r['artist_name'],
-                'genre': r['genre'],
-                'city': r['city'],
-                'date': r['date'].isoformat() if r['date'] else None,
-                'price': float(r['price']) if r['price'] else None,
-                'venue_name': r['venue_name'],
-                'algorithm': 'collaborative_filtering'
-            } for r in results]
-
+            return self.catalog.details(event_ids, city)
         except Exception as e:
             logger.error(f"Error fetching event details: {e}")
             return []
-        finally:
-            conn.close()
 
     def _get_fallback_recommendations(
         self,
@@ -638,7 +1685,7 @@ class RecommendationEngine:
         action: str,
         context: Optional[Dict[str, Any]] = None
     ):
-        """Record user feedback for future model training"""
+        """Record user feedback for future model training, written straight through"""
         conn = self.get_db_connection()
         try:
             # Store feedback in database for next retraining cycle
@@ -648,7 +1695,7 @@ class RecommendationEngine:
             """
 
             cursor = conn.cursor()
-            cursor.execute(query, (user_id, event_id, action, str(context or {})))
+            cursor.execute(query, (user_id, event_id, action, encode_context(context)))
             conn.commit()
 
             logger.info(f"Feedback recorded: user={user_id}, event={event_id}, action={action}")
@@ -660,12 +1707,27 @@ class RecommendationEngine:
 
     def get_model_metrics(self) -> Dict[str, Any]:
         """Get current model performance metrics"""
+        snapshot = self._snapshot
+        model = snapshot.model if snapshot is not None else None
+        if model is None:
+            return {
+                'version': self.model_version,
+                'last_trained': 'never',
+                'training_samples': 0,
+                'validation_metrics': {}
+            }
+        validation_metrics = snapshot.validation_metrics
+        # Models evaluated before the cutoff was stored as epoch seconds have an ISO string
+        if isinstance(validation_metrics.get('eval_cutoff'), str):
+            validation_metrics = dict(validation_metrics)
+            cutoff = epoch_seconds(validation_metrics.pop('eval_cutoff'))
+            if cutoff is not None:
+                validation_metrics['eval_cutoff'] = float(cutoff)
         return {
-            'version': self.model_version,
-            'last_trained': self.last_trained or 'never',
-            'training_samples': len(self.model.get('user_ids', [])) if self.model else 0,
-            'validation_metrics': self._compute_validation_metrics(
-                self.model['interaction_matrix'],
-                self.model['user_similarity']
-            ) if self.model else {}
+            'version': snapshot.version,
+            'last_trained': snapshot.last_trained or 'never',
+            'last_updated': snapshot.last_updated,
+            'training_samples': len(model.get('user_ids', [])),
+            # Computed at retrain/update time and stored with the model; never recomputed per request
+            'validation_metrics': validation_metrics
         }
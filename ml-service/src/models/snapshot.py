@@ -0,0 +1,37 @@
+"""
+Immutable published model
+Training builds a complete snapshot off to the side and serving switches to it
+with a single reference assignment, so a request never sees half of a new model
+"""
+from typing import Any, Dict, Optional
+
+
+class ModelSnapshot:
+    """
+    A trained model plus its identity and validation metrics
+    Neither the snapshot nor its model dict is modified once published; updates build a new one
+    """
+
+    __slots__ = ('model', 'version', 'last_trained', 'last_updated', 'validation_metrics')
+
+    def __init__(
+        self,
+        model: Dict[str, Any],
+        version: str,
+        last_trained: Optional[str],
+        last_updated: Optional[str] = None,
+        validation_metrics: Optional[Dict[str, Any]] = None
+    ):
+        object.__setattr__(self, 'model', model)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'last_trained', last_trained)
+        object.__setattr__(self, 'last_updated', last_updated)
+        object.__setattr__(self, 'validation_metrics', dict(validation_metrics or {}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ModelSnapshot is immutable")
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever a retrained or updated model is published"""
+        return f"{self.version}:{self.last_trained}:{self.last_updated}"
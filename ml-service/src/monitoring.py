@@ -3,6 +3,8 @@ Metrics collection and monitoring using CloudWatch (free tier)
 Lightweight observability without Prometheus/Grafana costs
 """
 import logging
+import queue
+import threading
 from typing import Dict, List, Optional
 from datetime import datetime
 from collections import defaultdict
@@ -13,6 +15,40 @@ from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# PutMetricData accepts up to 1000 metrics per call
+CLOUDWATCH_BATCH_SIZE = 1000
+
+# Upper bounds (ms) of the request stage histogram buckets
+STAGE_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+
+    def __init__(self, buckets_ms=STAGE_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * len(buckets_ms)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, duration_ms: float):
+        self.count += 1
+        self.sum_ms += duration_ms
+        for i, bound in enumerate(self.buckets_ms):
+            if duration_ms <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[tuple]:
+        """(le, observations at or below it), ending with +Inf"""
+        rows, running = [], 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            running += count
+            rows.append((f"{bound:g}", running))
+        rows.append(('+Inf', self.count))
+        return rows
+
+
 class MetricsCollector:
     """
     Collect and publish metrics to CloudWatch
@@ -26,6 +62,25 @@ class MetricsCollector:
         self.error_count = 0
         self.prediction_count = 0
         self.total_latency_ms = 0.0
+        self.db_pool = None
+        self.executor = None
+        self.result_cache = None
+        self.feedback_writer = None
+
+        # Candidate generator timings, keyed by generator name
+        self.generator_calls = defaultdict(int)
+        self.generator_latency_ms = defaultdict(float)
+        self.generator_timeouts = defaultdict(int)
+
+        # Request stage timings from traces, keyed by (stage, variant)
+        self.stage_histograms: Dict[tuple, LatencyHistogram] = {}
+        self._stage_lock = threading.Lock()
+
+        # CloudWatch calls are network I/O; a bounded queue feeds a single publisher thread
+        self.cloudwatch_queue: queue.Queue = queue.Queue(maxsize=settings.cloudwatch_queue_size)
+        self.cloudwatch_dropped = 0
+        self._publisher: Optional[threading.Thread] = None
+        self._stop_publisher = threading.Event()
 
         # Initialize CloudWatch client
         if settings.enable_cloudwatch:
@@ -41,8 +96,70 @@ class MetricsCollector:
 
     def initialize(self):
         """Initialize metrics collection"""
+        if self.cloudwatch and (self._publisher is None or not self._publisher.is_alive()):
+            self._stop_publisher.clear()
+            self._publisher = threading.Thread(
+                target=self._publish_loop, name='cloudwatch-publisher', daemon=True
+            )
+            self._publisher.start()
         logger.info("Metrics collector initialized")
 
+    def shutdown(self):
+        """Flush queued CloudWatch metrics and stop the publisher thread"""
+        self._stop_publisher.set()
+        if self._publisher is not None:
+            self._publisher.join(timeout=5)
+            self._publisher = None
+
+    def _enqueue_cloudwatch(self, metric_data: List[Dict]):
+        """Queue metrics without blocking; drops them if the publisher has fallen behind"""
+        for datum in metric_data:
+            try:
+                self.cloudwatch_queue.put_nowait(datum)
+            except queue.Full:
+                self.cloudwatch_dropped += 1
+
+    def _publish_loop(self):
+        while True:
+            stopping = self._stop_publisher.wait(settings.cloudwatch_flush_seconds)
+            self._flush_cloudwatch()
+            if stopping:
+                return
+
+    def _flush_cloudwatch(self):
+        while True:
+            batch = []
+            while len(batch) < CLOUDWATCH_BATCH_SIZE:
+                try:
+                    batch.append(self.cloudwatch_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self.cloudwatch.put_metric_data(
+                    Namespace=settings.cloudwatch_namespace,
+                    MetricData=batch
+                )
+            except Exception as e:
+                logger.error(f"Error publishing metrics to CloudWatch: {e}")
+
+    def attach_executor(self, executor):
+        """Expose blocking-executor saturation per dependency"""
+        self.executor = executor
+
+    def attach_result_cache(self, result_cache):
+        """Expose result cache hit/miss ratios per tier"""
+        self.result_cache = result_cache
+
+    def attach_feedback_writer(self, feedback_writer):
+        """Expose the feedback write-behind buffer depth and flush outcomes"""
+        self.feedback_writer = feedback_writer
+
+    def attach_db_pool(self, db_pool):
+        """Expose connection pool wait times and checkout counts alongside service metrics"""
+        self.db_pool = db_pool
+
     def record_request(self, endpoint: str, method: str, status_code: int, duration_ms: float):
         """Record HTTP request metrics"""
         self.request_count += 1
@@ -56,35 +173,29 @@ class MetricsCollector:
             'timestamp': datetime.utcnow().isoformat()
         })
 
-        # Publish to CloudWatch
+        # Queue for CloudWatch; published in batches off the request path
         if self.cloudwatch:
-            try:
-                self.cloudwatch.put_metric_data(
-                    Namespace=settings.cloudwatch_namespace,
-                    MetricData=[
-                        {
-                            'MetricName': 'RequestCount',
-                            'Value': 1,
-                            'Unit': 'Count',
-                            'Timestamp': datetime.utcnow(),
-                            'Dimensions': [
-                                {'Name': 'Endpoint', 'Value': endpoint},
-                                {'Name': 'StatusCode', 'Value': str(status_code)}
-                            ]
-                        },
-                        {
-                            'MetricName': 'RequestLatency',
-                            'Value': duration_ms,
-                            'Unit': 'Milliseconds',
-                            'Timestamp': datetime.utcnow(),
-                            'Dimensions': [
-                                {'Name': 'Endpoint', 'Value': endpoint}
-                            ]
-                        }
+            self._enqueue_cloudwatch([
+                {
+                    'MetricName': 'RequestCount',
+                    'Value': 1,
+                    'Unit': 'Count',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Endpoint', 'Value': endpoint},
+                        {'Name': 'StatusCode', 'Value': str(status_code)}
                     ]
-                )
-            except Exception as e:
-                logger.error(f"Error publishing request metrics to CloudWatch: {e}")
+                },
+                {
+                    'MetricName': 'RequestLatency',
+                    'Value': duration_ms,
+                    'Unit': 'Milliseconds',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Endpoint', 'Value': endpoint}
+                    ]
+                }
+            ])
 
     def record_prediction(self, user_id: str, variant: str, latency_ms: float, num_recommendations: int):
         """Record ML prediction metrics"""
@@ -100,40 +211,101 @@ class MetricsCollector:
             'timestamp': datetime.utcnow().isoformat()
         })
 
-        # Publish to CloudWatch
+        # Queue for CloudWatch; published in batches off the request path
         if self.cloudwatch:
-            try:
-                self.cloudwatch.put_metric_data(
-                    Namespace=settings.cloudwatch_namespace,
-                    MetricData=[
-                        {
-                            'MetricName': 'PredictionCount',
-                            'Value': 1,
-                            'Unit': 'Count',
-                            'Timestamp': datetime.utcnow(),
-                            'Dimensions': [
-                                {'Name': 'Variant', 'Value': variant}
-                            ]
-                        },
-                        {
-                            'MetricName': 'PredictionLatency',
-                            'Value': latency_ms,
-                            'Unit': 'Milliseconds',
-                            'Timestamp': datetime.utcnow(),
-                            'Dimensions': [
-                                {'Name': 'Variant', 'Value': variant}
-                            ]
-                        },
-                        {
-                            'MetricName': 'RecommendationCount',
-                            'Value': num_recommendations,
-                            'Unit': 'Count',
-                            'Timestamp': datetime.utcnow()
-                        }
+            self._enqueue_cloudwatch([
+                {
+                    'MetricName': 'PredictionCount',
+                    'Value': 1,
+                    'Unit': 'Count',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Variant', 'Value': variant}
                     ]
-                )
-            except Exception as e:
-                logger.error(f"Error publishing prediction metrics to CloudWatch: {e}")
+                },
+                {
+                    'MetricName': 'PredictionLatency',
+                    'Value': latency_ms,
+                    'Unit': 'Milliseconds',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Variant', 'Value': variant}
+                    ]
+                },
+                {
+                    'MetricName': 'RecommendationCount',
+                    'Value': num_recommendations,
+                    'Unit': 'Count',
+                    'Timestamp': datetime.utcnow()
+                }
+            ])
+
+    def record_batch_prediction(self, num_users: int, variant_counts: Dict[str, int], latency_ms: float):
+        """Record a batch recommendation call as one metric update"""
+        self.prediction_count += num_users
+        self.total_latency_ms += latency_ms
+
+        # Store locally
+        self.local_metrics['batch_predictions'].append({
+            'num_users': num_users,
+            'variants': dict(variant_counts),
+            'latency_ms': latency_ms,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+        # Queue for CloudWatch; published in batches off the request path
+        if self.cloudwatch:
+            metric_data = [
+                {
+                    'MetricName': 'BatchPredictionLatency',
+                    'Value': latency_ms,
+                    'Unit': 'Milliseconds',
+                    'Timestamp': datetime.utcnow()
+                }
+            ]
+            for variant, count in variant_counts.items():
+                metric_data.append({
+                    'MetricName': 'PredictionCount',
+                    'Value': count,
+                    'Unit': 'Count',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Variant', 'Value': variant}
+                    ]
+                })
+            self._enqueue_cloudwatch(metric_data)
+
+    def record_generator(self, name: str, duration_ms: float, timed_out: bool = False):
+        """Record one candidate generator run, or a generator dropped for missing its deadline"""
+        if timed_out:
+            self.generator_timeouts[name] += 1
+        else:
+            self.generator_calls[name] += 1
+            self.generator_latency_ms[name] += duration_ms
+
+        # Queue for CloudWatch; published in batches off the request path
+        if self.cloudwatch:
+            self._enqueue_cloudwatch([
+                {
+                    'MetricName': 'GeneratorTimeout' if timed_out else 'GeneratorLatency',
+                    'Value': 1 if timed_out else duration_ms,
+                    'Unit': 'Count' if timed_out else 'Milliseconds',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Generator', 'Value': name}
+                    ]
+                }
+            ])
+
+    def record_trace(self, variant: Optional[str], breakdown: Dict[str, float]):
+        """Add one traced request's per-stage timings to the (stage, variant) histograms"""
+        variant = variant or 'none'
+        with self._stage_lock:
+            for stage, duration_ms in breakdown.items():
+                histogram = self.stage_histograms.get((stage, variant))
+                if histogram is None:
+                    histogram = self.stage_histograms[(stage, variant)] = LatencyHistogram()
+                histogram.observe(duration_ms)
 
     def record_feedback(self, action: str):
         """Record user feedback metrics"""
@@ -143,25 +315,19 @@ class MetricsCollector:
             'timestamp': datetime.utcnow().isoformat()
         })
 
-        # Publish to CloudWatch
+        # Queue for CloudWatch; published in batches off the request path
         if self.cloudwatch:
-            try:
-                self.cloudwatch.put_metric_data(
-                    Namespace=settings.cloudwatch_namespace,
-                    MetricData=[
-                        {
-                            'MetricName': 'UserFeedback',
-                            'Value': 1,
-                            'Unit': 'Count',
-                            'Timestamp': datetime.utcnow(),
-                            'Dimensions': [
-                                {'Name': 'Action', 'Value': action}
-                            ]
-                        }
+            self._enqueue_cloudwatch([
+                {
+                    'MetricName': 'UserFeedback',
+                    'Value': 1,
+                    'Unit': 'Count',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'Action', 'Value': action}
                     ]
-                )
-            except Exception as e:
-                logger.error(f"Error publishing feedback metrics to CloudWatch: {e}")
+                }
+            ])
 
     def record_error(self, error_type: str):
         """Record error metrics"""
@@ -173,25 +339,19 @@ class MetricsCollector:
             'timestamp': datetime.utcnow().isoformat()
         })
 
-        # Publish to CloudWatch
+        # Queue for CloudWatch; published in batches off the request path
         if self.cloudwatch:
-            try:
-                self.cloudwatch.put_metric_data(
-                    Namespace=settings.cloudwatch_namespace,
-                    MetricData=[
-                        {
-                            'MetricName': 'ErrorCount',
-                            'Value': 1,
-                            'Unit': 'Count',
-                            'Timestamp': datetime.utcnow(),
-                            'Dimensions': [
-                                {'Name': 'ErrorType', 'Value': error_type}
-                            ]
-                        }
+            self._enqueue_cloudwatch([
+                {
+                    'MetricName': 'ErrorCount',
+                    'Value': 1,
+                    'Unit': 'Count',
+                    'Timestamp': datetime.utcnow(),
+                    'Dimensions': [
+                        {'Name': 'ErrorType', 'Value': error_type}
                     ]
-                )
-            except Exception as e:
-                logger.error(f"Error publishing error metrics to CloudWatch: {e}")
+                }
+            ])
 
     def get_prometheus_metrics(self) -> str:
         """
@@ -215,6 +375,145 @@ ml_errors_total {self.error_count}
 # HELP ml_prediction_latency_ms Average prediction latency in milliseconds
 # TYPE ml_prediction_latency_ms gauge
 ml_prediction_latency_ms {avg_latency:.2f}
+"""
+        if self.executor is not None:
+            executor_stats = self.executor.stats()
+            metrics += """
+# HELP ml_executor_in_flight Blocking calls currently running per dependency
+# TYPE ml_executor_in_flight gauge
+"""
+            for name, stats in executor_stats.items():
+                metrics += f'ml_executor_in_flight{{dependency="{name}"}} {stats["in_flight"]}\n'
+            metrics += """
+# HELP ml_executor_waiting Blocking calls waiting for a concurrency slot per dependency
+# TYPE ml_executor_waiting gauge
+"""
+            for name, stats in executor_stats.items():
+                metrics += f'ml_executor_waiting{{dependency="{name}"}} {stats["waiting"]}\n'
+
+        generators = sorted(set(self.generator_calls) | set(self.generator_timeouts))
+        if generators:
+            metrics += """
+# HELP ml_generator_calls_total Completed candidate generator runs
+# TYPE ml_generator_calls_total counter
+"""
+            for name in generators:
+                metrics += f'ml_generator_calls_total{{generator="{name}"}} {self.generator_calls[name]}\n'
+            metrics += """
+# HELP ml_generator_latency_ms_total Total candidate generator time in milliseconds
+# TYPE ml_generator_latency_ms_total counter
+"""
+            for name in generators:
+                metrics += f'ml_generator_latency_ms_total{{generator="{name}"}} {self.generator_latency_ms[name]:.2f}\n'
+            metrics += """
+# HELP ml_generator_timeouts_total Candidate generators dropped for missing their deadline
+# TYPE ml_generator_timeouts_total counter
+"""
+            for name in generators:
+                metrics += f'ml_generator_timeouts_total{{generator="{name}"}} {self.generator_timeouts[name]}\n'
+
+        with self._stage_lock:
+            stages = [
+                (stage, variant, histogram.cumulative(), histogram.sum_ms, histogram.count)
+                for (stage, variant), histogram in sorted(self.stage_histograms.items())
+            ]
+        if stages:
+            metrics += """
+# HELP ml_stage_latency_ms Time per recommendation request stage in milliseconds
+# TYPE ml_stage_latency_ms histogram
+"""
+            for stage, variant, buckets, sum_ms, count in stages:
+                labels = f'stage="{stage}",variant="{variant}"'
+                for le, cumulative in buckets:
+                    metrics += f'ml_stage_latency_ms_bucket{{{labels},le="{le}"}} {cumulative}\n'
+                metrics += f'ml_stage_latency_ms_sum{{{labels}}} {sum_ms:.3f}\n'
+                metrics += f'ml_stage_latency_ms_count{{{labels}}} {count}\n'
+
+        if self.result_cache is not None:
+            cache = self.result_cache.stats()
+            metrics += f"""
+# HELP ml_result_cache_entries Recommendation results held in the in-process cache
+# TYPE ml_result_cache_entries gauge
+ml_result_cache_entries {cache['entries']}
+
+# HELP ml_result_cache_hits_total Result cache hits per tier
+# TYPE ml_result_cache_hits_total counter
+ml_result_cache_hits_total{{tier="local"}} {cache['local_hits']}
+ml_result_cache_hits_total{{tier="redis"}} {cache['redis_hits']}
+
+# HELP ml_result_cache_misses_total Result cache misses per tier
+# TYPE ml_result_cache_misses_total counter
+ml_result_cache_misses_total{{tier="local"}} {cache['local_misses']}
+ml_result_cache_misses_total{{tier="redis"}} {cache['redis_misses']}
+
+# HELP ml_result_cache_hit_ratio Result cache hit ratio per tier
+# TYPE ml_result_cache_hit_ratio gauge
+ml_result_cache_hit_ratio{{tier="local"}} {cache['local_hit_ratio']:.4f}
+ml_result_cache_hit_ratio{{tier="redis"}} {cache['redis_hit_ratio']:.4f}
+
+# HELP ml_result_cache_redis_errors_total Redis cache operations that failed
+# TYPE ml_result_cache_redis_errors_total counter
+ml_result_cache_redis_errors_total {cache['redis_errors']}
+"""
+
+        if self.cloudwatch is not None:
+            metrics += f"""
+# HELP ml_cloudwatch_queue_depth Metrics waiting to be published to CloudWatch
+# TYPE ml_cloudwatch_queue_depth gauge
+ml_cloudwatch_queue_depth {self.cloudwatch_queue.qsize()}
+
+# HELP ml_cloudwatch_dropped_total Metrics dropped because the publish queue was full
+# TYPE ml_cloudwatch_dropped_total counter
+ml_cloudwatch_dropped_total {self.cloudwatch_dropped}
+"""
+
+        if self.feedback_writer is not None:
+            feedback = self.feedback_writer.stats()
+            metrics += f"""
+# HELP ml_feedback_pending Feedback rows buffered and not yet written to MySQL
+# TYPE ml_feedback_pending gauge
+ml_feedback_pending {feedback['pending']}
+
+# HELP ml_feedback_written_total Feedback rows written to MySQL by the write-behind buffer
+# TYPE ml_feedback_written_total counter
+ml_feedback_written_total {feedback['written']}
+
+# HELP ml_feedback_rejected_total Feedback requests rejected because the buffer was full
+# TYPE ml_feedback_rejected_total counter
+ml_feedback_rejected_total {feedback['rejected']}
+
+# HELP ml_feedback_failed_flushes_total Feedback batches that failed to write and were retried
+# TYPE ml_feedback_failed_flushes_total counter
+ml_feedback_failed_flushes_total {feedback['failed_flushes']}
+"""
+
+        if self.db_pool is not None:
+            pool = self.db_pool.stats()
+            metrics += f"""
+# HELP ml_db_pool_size Maximum number of pooled database connections
+# TYPE ml_db_pool_size gauge
+ml_db_pool_size {pool['size']}
+
+# HELP ml_db_pool_connections Pooled database connections by state
+# TYPE ml_db_pool_connections gauge
+ml_db_pool_connections{{state="in_use"}} {pool['in_use']}
+ml_db_pool_connections{{state="idle"}} {pool['idle']}
+
+# HELP ml_db_pool_checkouts_total Total number of connection checkouts
+# TYPE ml_db_pool_checkouts_total counter
+ml_db_pool_checkouts_total {pool['checkouts']}
+
+# HELP ml_db_pool_timeouts_total Checkouts that gave up waiting for a free connection
+# TYPE ml_db_pool_timeouts_total counter
+ml_db_pool_timeouts_total {pool['timeouts']}
+
+# HELP ml_db_pool_wait_ms_total Total time spent waiting for a connection in milliseconds
+# TYPE ml_db_pool_wait_ms_total counter
+ml_db_pool_wait_ms_total {pool['total_wait_ms']:.2f}
+
+# HELP ml_db_pool_wait_ms_max Longest wait for a connection in milliseconds
+# TYPE ml_db_pool_wait_ms_max gauge
+ml_db_pool_wait_ms_max {pool['max_wait_ms']:.2f}
 """
         return metrics
 
@@ -227,7 +526,9 @@ ml_prediction_latency_ms {avg_latency:.2f}
             'prediction_count': self.prediction_count,
             'error_count': self.error_count,
             'avg_latency_ms': avg_latency,
-            'cloudwatch_enabled': self.cloudwatch is not None
+            'cloudwatch_enabled': self.cloudwatch is not None,
+            'db_pool': self.db_pool.stats() if self.db_pool is not None else None,
+            'result_cache': self.result_cache.stats() if self.result_cache is not None else None
         }
 
     def publish_model_metrics(self, model_version: str, metrics: Dict):
@@ -0,0 +1,194 @@
+"""
+Materialised per-city popularity rankings
+Save counts are seeded from MySQL, bumped in memory as feedback arrives and
+periodically reconciled, so a popular list is a slice of a pre-sorted ranking
+"""
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .catalog import CatalogColumns, EventCatalog, normalize_city
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+SAVE_COUNTS_QUERY = """
+SELECT se.event_id, COUNT(*) AS save_count
+FROM user_saved_events se
+JOIN events e ON e.id = se.event_id
+WHERE e.start_time >= NOW()
+GROUP BY se.event_id
+"""
+
+# Ranking key: most saves first, then soonest, then catalog order
+RankKey = Tuple[int, int, int]
+
+# Ranking for requests without a city (distinct from the '' key of events with no city)
+ALL_CITIES = None
+
+
+class PopularityIndex:
+    """
+    Per-city event rankings by save count over the current catalog snapshot
+    Rankings are sorted lists of (-save_count, start_ts, position) kept in order with bisect
+    """
+
+    def __init__(
+        self,
+        db_pool,
+        catalog: EventCatalog,
+        reconcile_seconds: Optional[float] = None,
+        recent_saves: Optional[int] = None
+    ):
+        self.db_pool = db_pool
+        self.catalog = catalog
+        self.reconcile_seconds = (
+            reconcile_seconds if reconcile_seconds is not None else settings.popularity_reconcile_seconds
+        )
+        self.recent_saves = recent_saves if recent_saves is not None else settings.popularity_recent_saves
+
+        # Save counts by event id: MySQL totals plus saves reported since the last reconcile
+        self._counts: Dict[Any, int] = {}
+        self._columns: Optional[CatalogColumns] = None
+        self._start_ts: Optional[np.ndarray] = None
+        self._rankings: Dict[Optional[str], List[RankKey]] = {}
+        # (user_id, event_id) saves already counted, least recent first; kept across reconciles
+        # because a save reaches MySQL long before it reaches a published model
+        self._saved: 'OrderedDict[Tuple[str, str], None]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Re-rank whenever the catalog publishes a new snapshot
+        catalog.add_listener(self.rebuild)
+
+    def is_loaded(self) -> bool:
+        return self._columns is not None
+
+    def reconcile(self):
+        """Replace in-memory counts with MySQL's and re-rank"""
+        conn = self.db_pool.connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SAVE_COUNTS_QUERY)
+            counts = {r['event_id']: int(r['save_count']) for r in cursor.fetchall()}
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._counts = counts
+        self.rebuild()
+        logger.debug(f"Popularity reconciled: {len(counts)} events with saves")
+
+    def rebuild(self, columns: Optional[CatalogColumns] = None):
+        """Rank the catalog snapshot by the current counts, per city and overall"""
+        columns = columns if columns is not None else self.catalog.columns
+        if columns is None:
+            return
+
+        with self._lock:
+            counts = np.array([self._counts.get(eid, 0) for eid in columns.event_id.tolist()], dtype=np.int64)
+            start_ts = columns.start_time.astype(np.int64)
+            positions = np.arange(len(columns), dtype=np.int64)
+            order = np.lexsort((positions, start_ts, -counts))
+
+            keys = list(zip((-counts[order]).tolist(), start_ts[order].tolist(), order.tolist()))
+            rankings: Dict[Optional[str], List[RankKey]] = {ALL_CITIES: keys}
+            for key, city_key in zip(keys, columns.city_key[order].tolist()):
+                rankings.setdefault(city_key, []).append(key)
+
+            self._columns = columns
+            self._start_ts = start_ts
+            self._rankings = rankings
+
+    def record_save(self, event_id: Any, user_id: Optional[Any] = None):
+        """
+        Move an event up its city's ranking after a save
+        A save this user was already counted for is ignored: user_saved_events holds one row per pair
+        """
+        with self._lock:
+            if user_id is not None and self.recent_saves > 0:
+                key = (str(user_id), str(event_id))
+                if key in self._saved:
+                    self._saved.move_to_end(key)
+                    return
+                self._saved[key] = None
+                while len(self._saved) > self.recent_saves:
+                    self._saved.popitem(last=False)
+
+            columns = self._columns
+            pos = columns.position(event_id) if columns is not None else None
+            if pos is None:
+                return
+
+            eid = columns.event_id[pos]
+            old_count = self._counts.get(eid, 0)
+            self._counts[eid] = old_count + 1
+
+            start_ts = int(self._start_ts[pos])
+            old_key = (-old_count, start_ts, pos)
+            new_key = (-(old_count + 1), start_ts, pos)
+            for city_key in (ALL_CITIES, columns.city_key[pos]):
+                ranking = self._rankings.get(city_key)
+                if ranking is None:
+                    continue
+                i = bisect.bisect_left(ranking, old_key)
+                if i < len(ranking) and ranking[i] == old_key:
+                    del ranking[i]
+                bisect.insort(ranking, new_key)
+
+    def top(self, city: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """Most-saved upcoming events, soonest first on ties"""
+        if limit <= 0:
+            return []
+
+        now = int(self.catalog.now().astype(np.int64))
+        positions: List[int] = []
+        scores: List[int] = []
+        with self._lock:
+            columns = self._columns
+            if columns is None:
+                return []
+            ranking = self._rankings.get(normalize_city(city) if city else ALL_CITIES, [])
+            # Events that started since the last catalog refresh are skipped, not re-sorted
+            for neg_count, start_ts, pos in ranking:
+                if start_ts < now:
+                    continue
+                positions.append(pos)
+                scores.append(-neg_count)
+                if len(positions) == limit:
+                    break
+
+        return EventCatalog.materialize(
+            columns, np.array(positions, dtype=np.int64), 'popularity', np.array(scores, dtype=np.float64)
+        )
+
+    def start_reconcile(self):
+        """Seed counts from MySQL and reconcile from a daemon thread"""
+        try:
+            self.reconcile()
+        except Exception as e:
+            logger.error(f"Initial popularity load failed: {e}")
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reconcile_loop, name='popularity-reconcile', daemon=True)
+        self._thread.start()
+
+    def stop_reconcile(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _reconcile_loop(self):
+        while not self._stop.wait(self.reconcile_seconds):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Popularity reconcile failed: {e}")
@@ -0,0 +1,46 @@
+"""
+Multi-process entry point: python -m src.serve
+Starts one trainer process and SERVE_WORKERS uvicorn worker processes. Workers only
+serve: they map the published model read-only, hand retrain/update requests to the
+trainer and reload when the trainer publishes a new version.
+"""
+import logging
+import multiprocessing
+import os
+
+import uvicorn
+
+from .config import settings
+from .trainer import run_trainer
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    if settings.model_artifact_format != 'mmap':
+        logger.warning("MODEL_ARTIFACT_FORMAT is not mmap; every worker will hold its own copy of the model")
+
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    # Not a daemon: training fans similarity blocks out to its own process pool
+    trainer = context.Process(target=run_trainer, args=(stop,), name='model-trainer')
+    trainer.start()
+    logger.info(f"Trainer started (pid {trainer.pid}), starting {settings.serve_workers} workers")
+
+    # Inherited by the uvicorn worker processes
+    os.environ['SERVICE_ROLE'] = 'worker'
+    try:
+        uvicorn.run('src.main:app', host='0.0.0.0', port=settings.service_port, workers=settings.serve_workers)
+    finally:
+        stop.set()
+        trainer.join(timeout=10)
+        if trainer.is_alive():
+            trainer.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Token helpers shared by the event catalog, context boosting and the content model
+"""
+import json
+import re
+from typing import Any, List
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize_token(value: Any) -> str:
+    return str(value or '').lower().strip()
+
+
+def split_tokens(value: Any) -> List[str]:
+    """
+    Lower-cased tokens from a JSON list, a Python list or a delimited string
+    MySQL JSON columns arrive as strings such as '["techno","house"]'
+    """
+    if value is None:
+        return []
+
+    if isinstance(value, float) and np.isnan(value):
+        return []
+
+    if isinstance(value, str) and value.strip().startswith('['):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+
+    if isinstance(value, (list, tuple)):
+        tokens: List[str] = []
+        for item in value:
+            tokens.extend(split_tokens(item))
+        return tokens
+
+    if isinstance(value, dict):
+        # Support context shapes like {name: "..."} or {genre: "..."}
+        return split_tokens(value.get('name') or value.get('genre'))
+
+    text = normalize_token(value)
+    text = text.replace('|', ',').replace('/', ',').replace(';', ',')
+    return [part.strip() for part in text.split(',') if part.strip()]
+
+
+def words(value: Any) -> List[str]:
+    """Lower-cased words of a title or artist name"""
+    return WORD_PATTERN.findall(normalize_token(value))
@@ -0,0 +1,116 @@
+"""
+Per-request stage timing
+A Trace collects how long each stage of one request took. The active trace lives
+in a contextvar, so code deep in the engine opens spans without passing it around;
+with no active trace, span() returns a shared no-op and costs one contextvar lookup.
+Work handed to thread pools keeps the trace by running under bind().
+"""
+import contextvars
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+_current: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """Stage durations for one request; spans may come from several threads"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.variant: Optional[str] = None
+        # perf_counter() when the handler produced its result; the rest is serialisation
+        self.handler_done: Optional[float] = None
+        self.spans: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration_ms: float):
+        with self._lock:
+            self.spans.append((start, name, duration_ms))
+
+    def breakdown(self) -> Dict[str, float]:
+        """Milliseconds per stage, ordered by when each stage first started; repeats are summed"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            spans = sorted(self.spans, key=lambda entry: entry[0])
+        for _, name, duration_ms in spans:
+            totals[name] = totals.get(name, 0.0) + duration_ms
+        return totals
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def start() -> tuple:
+    """Make a new trace active for this context; returns (trace, token) for finish()"""
+    trace = Trace()
+    return trace, _current.set(trace)
+
+
+def finish(token: contextvars.Token):
+    _current.reset(token)
+
+
+def span(name: str):
+    """Context manager timing one stage of the active trace, or a no-op without one"""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name)
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Carry the active trace into another thread; fn is returned unchanged without one"""
+    if _current.get() is None:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def server_timing(breakdown: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. 'predict;dur=12.31, serialisation;dur=0.42'"""
+    return ', '.join(f"{name};dur={duration_ms:.2f}" for name, duration_ms in breakdown.items())
+
+
+def set_variant(variant: Optional[str]):
+    """Label the active trace with the request's A/B variant"""
+    trace = _current.get()
+    if trace is not None:
+        trace.variant = variant
+
+
+def handler_done():
+    """Mark the handler's result as ready; from here to the response is serialisation"""
+    trace = _current.get()
+    if trace is not None:
+        trace.handler_done = time.perf_counter()
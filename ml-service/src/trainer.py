@@ -0,0 +1,78 @@
+"""
+Trainer process for multi-process serving
+The only process that trains: it runs retrain/update jobs queued by the serving
+workers and publishes each new model as an artifact the workers pick up
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from .config import settings
+from .jobs import FAILED, RUNNING, SUCCEEDED, FileModelJobs, jobs_root
+from .models.recommendation_engine import RecommendationEngine
+
+logger = logging.getLogger(__name__)
+
+
+class Trainer:
+    """Runs queued model jobs one at a time and owns artifact publication"""
+
+    def __init__(self, engine: Optional[RecommendationEngine] = None, jobs: Optional[FileModelJobs] = None):
+        self.engine = engine or RecommendationEngine()
+        self.jobs = jobs or FileModelJobs(jobs_root())
+
+    def start(self):
+        """Load the published model, training one first if there is none"""
+        self.jobs.fail_interrupted()
+        if not self.engine.load_model(train_if_missing=False):
+            logger.info("No published model, training an initial one")
+            try:
+                self.engine.retrain_model()
+            except Exception as e:
+                logger.error(f"Initial training failed: {e}")
+
+    def run_pending(self) -> int:
+        """Run each kind of queued job once; returns how many runs happened"""
+        runs = 0
+        for kind, queued in self.jobs.queued().items():
+            fn = self.engine.retrain_model if kind == 'retrain' else self.engine.update_model
+            started_at = datetime.utcnow().isoformat()
+            for job in queued:
+                job.status, job.started_at = RUNNING, started_at
+                self.jobs.save(job)
+
+            status, result, error = SUCCEEDED, None, None
+            try:
+                result = fn()
+                logger.info(f"Trainer finished {kind} for {len(queued)} queued job(s)")
+            except Exception as e:
+                logger.error(f"Trainer {kind} failed: {e}")
+                status, error = FAILED, str(e)
+
+            finished_at = datetime.utcnow().isoformat()
+            for job in queued:
+                job.status, job.result, job.error, job.finished_at = status, result, error, finished_at
+                self.jobs.save(job)
+            runs += 1
+
+        if runs:
+            self.jobs.prune()
+        return runs
+
+    def run_forever(self, stop: threading.Event):
+        self.start()
+        while not stop.wait(settings.trainer_poll_seconds):
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Trainer loop error: {e}")
+
+
+def run_trainer(stop=None):
+    """Process entry point; stop is any object with wait(timeout) (threading or multiprocessing Event)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    Trainer().run_forever(stop or threading.Event())
@@ -0,0 +1,25 @@
+"""
+The app against the SQLite stand-in database and in-memory AWS fakes from benchmarks/
+"""
+import os
+
+# Keep the service away from real AWS while importing it; the fakes are attached afterwards
+os.environ.setdefault('USE_LOCAL_DYNAMODB', 'true')
+os.environ.setdefault('ENABLE_CLOUDWATCH', 'false')
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from benchmarks.engine_suite import apply_settings  # noqa: E402
+from benchmarks.load_test import install_fakes  # noqa: E402
+from benchmarks.synthetic_data import SyntheticScale, ensure_dataset  # noqa: E402
+from src import main  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    data = ensure_dataset(str(tmp_path_factory.mktemp('data')), SyntheticScale(3000, seed=1))
+    apply_settings(str(tmp_path_factory.mktemp('models')), {'eval_enabled': 'true'})
+    install_fakes(main, data['path'], 0.0, 0.0, 0.0)
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,43 @@
+"""
+Batch A/B assignment while DynamoDB throttles reads
+"""
+from benchmarks.fake_aws import FakeDynamoDB
+from src import ab_testing
+from src.ab_testing import ABTestManager
+from src.config import settings
+
+
+class ThrottledDynamoDB(FakeDynamoDB):
+    """Returns every requested key as unprocessed"""
+
+    def __init__(self, key_names):
+        super().__init__(key_names)
+        self.batch_gets = 0
+
+    def batch_get_item(self, RequestItems):
+        self.batch_gets += 1
+        return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+
+
+def test_throttled_batch_reads_back_off_then_hash_assign(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ab_testing.time, 'sleep', sleeps.append)
+
+    dynamodb = ThrottledDynamoDB({
+        settings.dynamodb_table_experiments: ('experiment_id',),
+        settings.dynamodb_table_assignments: ('user_id', 'experiment_id')
+    })
+    manager = ABTestManager()
+    manager.dynamodb = dynamodb
+    manager.assignments_table = dynamodb.Table(settings.dynamodb_table_assignments)
+    manager._load_default_experiment()
+
+    users = ['1', '2', '3']
+    assignments = manager.assign_experiments(users)
+
+    assert dynamodb.batch_gets == ab_testing.BATCH_GET_MAX_ATTEMPTS
+    assert len(sleeps) == ab_testing.BATCH_GET_MAX_ATTEMPTS - 1
+    variants = manager.experiments[settings.default_experiment_id]['variants']
+    assert all(assignments[user]['variant'] == manager._hash_assign_variant(user, variants) for user in users)
+    # Stored assignments could not be read, so none are overwritten
+    assert not manager.assignments_table.items
@@ -0,0 +1,44 @@
+"""
+ConnectionPool shutdown
+"""
+import pytest
+
+from src.db import ConnectionPool, PoolClosedError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_all_closes_borrowed_connections_on_release_and_refuses_checkouts():
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    pool = ConnectionPool(connect, size=2, checkout_timeout=1)
+    idle = pool.connection()
+    borrowed = pool.connection()
+    idle.close()
+
+    pool.close_all()
+    assert opened[0].closed
+    assert not opened[1].closed
+
+    borrowed.close()
+    assert opened[1].closed
+    assert pool.stats()['open'] == 0
+
+    with pytest.raises(PoolClosedError):
+        pool.connection()
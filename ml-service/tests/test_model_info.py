@@ -0,0 +1,36 @@
+"""
+/v1/model/info after a retrain
+"""
+from src import main
+from src.config import settings
+from src.models.snapshot import ModelSnapshot
+
+
+def test_model_info_after_retrain(client):
+    response = client.post('/v1/model/retrain', params={'wait': 'true'})
+    assert response.status_code == 200, response.text
+
+    response = client.get('/v1/model/info')
+    assert response.status_code == 200, response.text
+    metrics = response.json()['validation_metrics']
+    assert settings.eval_enabled
+    assert isinstance(metrics['eval_cutoff'], float)
+    assert all(isinstance(value, (int, float)) for value in metrics.values())
+
+
+def test_model_info_with_iso_cutoff_from_older_models(client):
+    engine = main.recommendation_engine
+    snapshot = engine.snapshot
+    engine._snapshot = ModelSnapshot(
+        snapshot.model,
+        snapshot.version,
+        snapshot.last_trained,
+        snapshot.last_updated,
+        {**snapshot.validation_metrics, 'eval_cutoff': '2026-02-09T17:42:10'}
+    )
+    try:
+        response = client.get('/v1/model/info')
+    finally:
+        engine._snapshot = snapshot
+    assert response.status_code == 200, response.text
+    assert response.json()['validation_metrics']['eval_cutoff'] == 1770658930.0
@@ -0,0 +1,25 @@
+"""
+CF for users with pending feedback in the user overlay
+"""
+from src import main
+
+
+def test_publish_builds_the_overlay_basis(client):
+    engine = main.recommendation_engine
+    assert engine._overlay_basis is not None
+    assert engine._overlay_basis[0] is engine.model
+
+
+def test_popular_padding_skips_overlay_hides(client):
+    engine = main.recommendation_engine
+    model = engine.model
+    popular = [rec['event_id'] for rec in engine._popularity_recommendations(None, 10)]
+    hidden = next(event_id for event_id in popular if engine._lookup(model['event_idx'], event_id) is not None)
+
+    # A user the published model has never seen: the overlay is their whole row
+    engine.apply_feedback('overlay-hider', hidden, 'hide')
+    overlay = engine._overlay_state(model, 'overlay-hider')
+
+    padded = engine._pad_with_popular([], model, None, overlay, None, 10)
+    assert len(padded) == 10
+    assert hidden not in {rec['event_id'] for rec in padded}
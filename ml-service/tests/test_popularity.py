@@ -0,0 +1,28 @@
+"""
+Live popularity counts from /v1/feedback saves
+"""
+from src import main
+
+
+def save(client, user_id, event_id):
+    response = client.post('/v1/feedback', json={'user_id': user_id, 'event_id': event_id, 'action': 'save'})
+    assert response.status_code == 200, response.text
+
+
+def test_repeat_saves_count_once_without_the_overlay(client, monkeypatch):
+    engine = main.recommendation_engine
+    popularity = engine.popularity
+    # USER_OVERLAY_MAX_USERS=0: nothing remembers the save on the overlay side
+    monkeypatch.setattr(engine.overlay, 'max_users', 0)
+
+    columns = popularity._columns
+    event_id = columns.event_id[0]
+    before = popularity._counts.get(event_id, 0)
+
+    # A user the published model has never seen
+    save(client, 'repeat-saver', str(event_id))
+    save(client, 'repeat-saver', str(event_id))
+    assert popularity._counts.get(event_id, 0) == before + 1
+
+    save(client, 'another-saver', str(event_id))
+    assert popularity._counts.get(event_id, 0) == before + 2
@@ -0,0 +1,62 @@
+"""
+Which recommendation results reach the result cache
+"""
+import time
+
+from src import main
+from src.config import settings
+
+
+def hybrid_experiment(user_id):
+    return {'experiment_id': 'test', 'variant': 'hybrid'}
+
+
+def test_degraded_hybrid_results_are_not_cached(client, monkeypatch):
+    engine = main.recommendation_engine
+    content_based = engine._content_based_recommendations
+
+    def slow_content_based(*args):
+        time.sleep(0.2)
+        return content_based(*args)
+
+    monkeypatch.setattr(main.ab_test_manager, 'assign_experiment', hybrid_experiment)
+    monkeypatch.setattr(engine, '_content_based_recommendations', slow_content_based)
+    main.result_cache.clear_local()
+
+    # Content-based misses the deadline and is dropped from the merge
+    monkeypatch.setattr(settings, 'generator_timeout_ms', 50.0)
+    response = client.post('/v1/recommendations', json={'user_id': '3', 'city': 'dublin', 'limit': 10})
+    assert response.status_code == 200, response.text
+    assert len(main.result_cache.local) == 0
+
+    monkeypatch.setattr(settings, 'generator_timeout_ms', 10000.0)
+    response = client.post('/v1/recommendations', json={'user_id': '3', 'city': 'dublin', 'limit': 10})
+    assert response.status_code == 200, response.text
+    assert len(main.result_cache.local) == 1
+
+
+def test_catalog_refresh_changes_the_cache_key(client):
+    catalog = main.recommendation_engine.catalog
+    main.result_cache.clear_local()
+    body = {'user_id': '3', 'city': 'dublin', 'limit': 10}
+
+    assert client.post('/v1/recommendations', json=body).status_code == 200
+    assert client.post('/v1/recommendations', json=body).status_code == 200
+    assert len(main.result_cache.local) == 1
+
+    # An edited event moves the catalog's watermark on its next refresh
+    fingerprint = catalog.fingerprint
+    conn = main.recommendation_engine.db_pool.connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE events SET updated_at = NOW() WHERE id = (SELECT MIN(id) FROM events WHERE start_time >= NOW())"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    catalog.refresh()
+    assert catalog.fingerprint != fingerprint
+
+    assert client.post('/v1/recommendations', json=body).status_code == 200
+    assert len(main.result_cache.local) == 2
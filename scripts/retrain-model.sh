@@ -43,7 +43,7 @@ echo "Current model: $MODEL_INFO"
 
 # Trigger retraining
 echo "Triggering model retraining..."
-RETRAIN_RESPONSE=$(curl -s -X POST "${ML_SERVICE_URL}/v1/model/retrain")
+RETRAIN_RESPONSE=$(curl -s -X POST "${ML_SERVICE_URL}/v1/model/retrain?wait=true")
 
 # Check if retraining was successful
 if echo "$RETRAIN_RESPONSE" | grep -q '"status":"success"'; then